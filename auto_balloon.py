@@ -0,0 +1,199 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 13:36:12 2026
+
+@author: hendrik
+
+Automatic ballooning: find the characteristics on every page of a drawing
+and propose a bubble and region for each of them.
+"""
+
+import re
+from collections import namedtuple
+
+import fitz  # PyMuPDF
+
+from doc_pipeline import DocumentPipeline, text_layer_lines
+from pdf_regions import DEFAULT_OCR_DPI, is_usable_text, render_region
+
+# kind is one of 'gdt', 'tolerance', 'dimension', 'note'; rect is the
+# text's box in PDF points; source is 'text' or 'ocr'
+Feature = namedtuple('Feature', ['page', 'kind', 'text', 'rect', 'source'])
+
+# A bubble proposal: position in PDF points plus the feature it balloons
+Proposal = namedtuple('Proposal', ['page', 'x', 'y', 'feature'])
+
+BUBBLE_RADIUS = 10
+
+GDT_SYMBOLS = '⌖⏥⌓⌒⏤◎↗⌰⊥∥∠⌭⌯'
+# Diameter signs, all read as Ø
+_DIAMETER_RE = re.compile('[Øø⌀∅]')
+_NUMBER = r'\d+(?:[.,]\d+)?|[.,]\d+'
+_DECIMAL = r'\d*[.,]\d+'
+_GDT_RE = re.compile(rf'[{GDT_SYMBOLS}]|\|\s*(?:{_NUMBER})\s*\|\s*[A-Z]\b')
+_TOLERANCE_RE = re.compile(
+    rf'±\s*(?:{_NUMBER})'                                  # ±0.05
+    rf'|\+\s*(?:{_NUMBER})\s*/?\s*[-−]\s*(?:{_NUMBER})'    # +0.1/-0.05
+    rf'|^(?:Ø\s*)?(?:{_DECIMAL})\s*[-−/]\s*(?:{_DECIMAL})\s*$'  # 12.00-12.05
+    rf'|^(?:Ø\s*)?(?:{_NUMBER})\s*[A-Za-z]{{1,2}}\d{{1,2}}(?:\s*/\s*[a-z]{{1,2}}\d{{1,2}})?\s*$'  # 12 H7/g6
+)
+# A bare number is a dimension only with a decimal, a unit, a prefix or a
+# second size, so sheet, zone and title block numbers aren't ballooned
+_UNITS = r'(?:\s*(?:°|mm|in|"|THRU|DEEP|TYP|REF))*'
+_DIMENSION_RE = re.compile(
+    rf'^(?P<count>\d+\s*[xX]\s*)?(?P<prefix>SØ|SR|Ø|R|M)?\s*(?P<number>{_NUMBER})'
+    rf'(?P<units>{_UNITS})'
+    rf'(?P<by>\s*[xX]\s*(?:{_NUMBER}){_UNITS})?\s*$'     # Ø10 x 20 DEEP
+)
+_NOTE_RE = re.compile(r'^(?:NOTES?\b|\d{1,2}[.)]\s+[A-Z])', re.IGNORECASE)
+
+
+def classify_text(text):
+    """
+    Classify a line of drawing text
+
+    Args:
+        text: one text line from the text layer or OCR
+
+    Returns:
+        str: 'gdt', 'tolerance', 'dimension' or 'note', or None when the
+        text isn't an inspectable characteristic (title block, labels...)
+    """
+    text = _DIAMETER_RE.sub('Ø', text.strip())
+    if not text:
+        return None
+    if _GDT_RE.search(text):
+        return 'gdt'
+    if _TOLERANCE_RE.search(text):
+        return 'tolerance'
+    match = _DIMENSION_RE.match(text)
+    if match and (match['count'] or match['prefix'] or match['units'] or match['by']
+                  or re.search('[.,]', match['number'])):
+        return 'dimension'
+    if _NOTE_RE.match(text):
+        return 'note'
+    return None
+
+
+def features_from_lines(lines, page_number, source):
+    """Features among (text, rect) lines of a page"""
+    features = []
+    for text, rect in lines:
+        kind = classify_text(text)
+        if kind is not None:
+            features.append(Feature(page_number, kind, text.strip(), rect, source))
+    return features
+
+
+def scan_page(page, page_number, dpi=DEFAULT_OCR_DPI):
+    """
+    Find the characteristics on one page
+
+    Args:
+        page: fitz Page
+        page_number: page index stored in the features
+        dpi: OCR resolution for pages without a usable text layer
+
+    Returns:
+        list of Feature
+    """
+    lines = text_layer_lines(page)
+    source = 'text'
+    if not is_usable_text(' '.join(text for text, _ in lines)):
+        from ocr_module import process_image_lines
+        scale = 72 / dpi
+        image = render_region(page, page.rect, dpi)
+        lines = [(text, tuple(v * scale for v in box))
+                 for text, box, _ in process_image_lines(image)]
+        source = 'ocr'
+    return features_from_lines(lines, page_number, source)
+
+
+def scan_document(pdf_path, pages=None, dpi=DEFAULT_OCR_DPI, max_workers=None,
+                  progress=None, on_page=None):
+    """
+    Scan pages of a PDF through a DocumentPipeline: pages render in
+    parallel worker processes and OCR runs as they arrive
+
+    Args:
+        pdf_path: PDF file
+        pages: page indices to scan, default all
+        dpi: OCR resolution for pages without a text layer
+        max_workers: worker processes, default number of cores
+        progress: optional callable(pages_done, pages_total)
+        on_page: optional callable(PageResult) per finished page
+
+    Returns:
+        tuple: (features, stats); features in page order, stats a dict with
+        'pages', 'features', 'errors', 'seconds' and 'pages_per_second'
+
+    Raises:
+        Exception: the first page error, if no page could be scanned
+    """
+    pipeline = DocumentPipeline(pdf_path, pages, dpi, detect=True, workers=max_workers)
+    if on_page:
+        pipeline.subscribe(on_page)
+    by_page, errors = {}, []
+    for result in pipeline.run():
+        if result.error:
+            errors.append(result.error)
+        by_page[result.page] = result.features
+        if progress:
+            progress(len(by_page), len(pipeline.pages))
+    if errors and len(errors) == len(by_page):
+        raise Exception(errors[0])
+
+    features = [f for page_number in sorted(by_page) for f in by_page[page_number]]
+    stats = dict(pipeline.stats, features=len(features))
+    return features, stats
+
+
+def propose_bubbles(features, page_sizes, existing=None):
+    """
+    Place a bubble next to each feature
+
+    Bubbles go left of the text, or right of it when there is no room, and
+    are nudged upwards until they clear the bubbles already on the page.
+    Features are numbered top to bottom, left to right per page.
+
+    Args:
+        features: list of Feature
+        page_sizes: {page_number: (width, height)} in PDF points
+        existing: {page_number: [(x, y), ...]} bubbles to keep clear of
+
+    Returns:
+        list of Proposal in numbering order
+    """
+    taken = {page: list(points) for page, points in (existing or {}).items()}
+    spacing = 2 * BUBBLE_RADIUS + 2
+    proposals = []
+    for feature in sorted(features, key=lambda f: (f.page, round(f.rect[1]), f.rect[0])):
+        width, height = page_sizes[feature.page]
+        x0, y0, x1, y1 = feature.rect
+        y = (y0 + y1) / 2
+        x = x0 - BUBBLE_RADIUS - 2
+        if x < BUBBLE_RADIUS:
+            x = min(x1 + BUBBLE_RADIUS + 2, width - BUBBLE_RADIUS)
+        points = taken.setdefault(feature.page, [])
+        for _ in range(8):
+            if all((x - px) ** 2 + (y - py) ** 2 >= spacing ** 2 for px, py in points):
+                break
+            y -= spacing
+        y = min(max(y, BUBBLE_RADIUS), height - BUBBLE_RADIUS)
+        points.append((x, y))
+        proposals.append(Proposal(feature.page, x, y, feature))
+    return proposals
+
+
+def auto_balloon(pdf_path, existing=None, pages=None, dpi=DEFAULT_OCR_DPI,
+                 max_workers=None, progress=None, on_page=None):
+    """
+    Scan a drawing and propose its bubbles
+
+    Returns:
+        tuple: (proposals, stats) as from propose_bubbles/scan_document
+    """
+    features, stats = scan_document(pdf_path, pages, dpi, max_workers, progress, on_page)
+    with fitz.open(pdf_path) as doc:
+        page_sizes = {i: (page.rect.width, page.rect.height) for i, page in enumerate(doc)}
+    return propose_bubbles(features, page_sizes, existing), stats
@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 16:40:05 2026
+
+@author: hendrik
+
+Export time of bubble_export.export_bubbles against the previous
+PyPDF2/reportlab merge.
+
+A long document is built by repeating the pages of 1.pdf, then bubbles are
+spread over every other page.
+
+    python benchmarks/bench_export.py [--pages 200] [--bubbles 40]
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import fitz  # PyMuPDF
+
+from bubble_export import create_bubble_overlay_pypdf2, export_bubbles
+
+
+def build_document(path, pages):
+    """Write a pages long PDF made of copies of 1.pdf"""
+    with fitz.open(os.path.join(ROOT, '1.pdf')) as src, fitz.open() as doc:
+        while len(doc) < pages:
+            doc.insert_pdf(src, to_page=min(len(src), pages - len(doc)) - 1)
+        doc.save(path, garbage=3, deflate=True)
+        return [(page.rect.width, page.rect.height) for page in doc]
+
+
+def make_bubbles(page_sizes, per_page, every=2, seed=1):
+    rng = random.Random(seed)
+    bubbles = {}
+    for page_number in range(0, len(page_sizes), every):
+        width, height = page_sizes[page_number]
+        bubbles[page_number] = [(rng.uniform(20, width - 20), rng.uniform(20, height - 20))
+                                for _ in range(per_page)]
+    return bubbles
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    func(*args)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[1])
+    parser.add_argument('--pages', type=int, default=200)
+    parser.add_argument('--bubbles', type=int, default=40, help='bubbles per ballooned page')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        source = os.path.join(tmp, 'source.pdf')
+        bubbles = make_bubbles(build_document(source, args.pages), args.bubbles)
+        total = sum(len(points) for points in bubbles.values())
+        print(f'{args.pages} pages, {len(bubbles)} ballooned, {total} bubbles, '
+              f'{os.path.getsize(source) / 1e6:.1f} MB')
+        for name, func in (('pymupdf', export_bubbles),
+                           ('pypdf2', create_bubble_overlay_pypdf2)):
+            output = os.path.join(tmp, f'{name}.pdf')
+            seconds = timed(func, source, output, bubbles)
+            print(f'{name:8s} {seconds:7.2f} s  {args.pages / seconds:7.1f} pages/s  '
+                  f'{os.path.getsize(output) / 1e6:6.1f} MB')
+
+
+if __name__ == '__main__':
+    main()
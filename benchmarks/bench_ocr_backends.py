@@ -0,0 +1,107 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 10:02:17 2026
+
+@author: hendrik
+
+Per-region OCR latency of the available ocr_module backends.
+
+Crops are taken from the bundled drawings the same way the viewer does it
+(2x zoom): text blocks from 1.pdf and a grid of callout sized tiles from
+2.pdf, which has no text layer.
+
+    python benchmarks/bench_ocr_backends.py [--regions 20] [--repeat 3]
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import fitz  # PyMuPDF
+from PIL import Image
+
+import ocr_module
+
+ZOOM = 2
+
+
+def render_crop(page, rect):
+    pix = page.get_pixmap(matrix=fitz.Matrix(ZOOM, ZOOM), clip=rect)
+    return Image.frombytes('RGB', (pix.width, pix.height), pix.samples)
+
+
+def collect_regions(limit):
+    """Crops from 1.pdf text blocks and 2.pdf grid tiles"""
+    crops = []
+    doc = fitz.open(os.path.join(ROOT, '1.pdf'))
+    for page in doc:
+        for block in page.get_text('blocks'):
+            rect = fitz.Rect(block[:4])
+            if rect.width > 4 and rect.height > 4:
+                crops.append(render_crop(page, rect))
+    doc = fitz.open(os.path.join(ROOT, '2.pdf'))
+    for page in doc:
+        for y in range(36, int(page.rect.height) - 72, 144):
+            for x in range(36, int(page.rect.width) - 144, 180):
+                crops.append(render_crop(page, fitz.Rect(x, y, x + 144, y + 48)))
+    # Interleave both sources so a small limit still samples each
+    half = len(crops) // 2
+    mixed = [c for pair in zip(crops[:half], crops[half:]) for c in pair]
+    return mixed[:limit]
+
+
+def bench_backend(name, crops, repeat):
+    start = time.perf_counter()
+    try:
+        backend = ocr_module.create_backend(name)
+        backend.image_to_string(crops[0].convert('L'))
+    except Exception as e:
+        return {'backend': name, 'error': str(e)}
+    first_call = time.perf_counter() - start
+
+    latencies = []
+    for _ in range(repeat):
+        for crop in crops:
+            gray = crop.convert('L')
+            t0 = time.perf_counter()
+            backend.image_to_string(gray)
+            latencies.append(time.perf_counter() - t0)
+    backend.close()
+    latencies.sort()
+    return {
+        'backend': name,
+        'first_call_ms': first_call * 1000,
+        'median_ms': statistics.median(latencies) * 1000,
+        'mean_ms': statistics.mean(latencies) * 1000,
+        'p95_ms': latencies[int(len(latencies) * 0.95) - 1] * 1000,
+        'calls': len(latencies),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[1])
+    parser.add_argument('--regions', type=int, default=20)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--backend', action='append', choices=sorted(ocr_module.BACKENDS),
+                        help='backend to run (default: all)')
+    args = parser.parse_args()
+
+    crops = collect_regions(args.regions)
+    print(f'{len(crops)} regions, {args.repeat} repeats')
+    for name in args.backend or sorted(ocr_module.BACKENDS):
+        result = bench_backend(name, crops, args.repeat)
+        if 'error' in result:
+            print(f"{name:12s} unavailable: {result['error']}")
+            continue
+        print(f"{name:12s} first {result['first_call_ms']:8.1f} ms  "
+              f"median {result['median_ms']:7.1f} ms  mean {result['mean_ms']:7.1f} ms  "
+              f"p95 {result['p95_ms']:7.1f} ms  ({result['calls']} calls)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 19:20:12 2026
+
+@author: hendrik
+
+Cost and accuracy of OCR preprocessing pipelines.
+
+Regions are text blocks of 1.pdf, whose text layer is the ground truth,
+rendered the way capture_selection does. Each pipeline reports the mean
+time of every stage and, when an OCR backend is available, the mean
+similarity of the OCR text to the text layer.
+
+    python benchmarks/bench_preprocess.py [--regions 30] [--dpi 300]
+        [--pipeline 'grayscale' --pipeline 'border,contrast,upscale' ...]
+"""
+
+import argparse
+import difflib
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import fitz  # PyMuPDF
+
+from pdf_regions import render_region
+from preprocess import DEFAULT_PIPELINE, SCAN_PIPELINE, Preprocessor
+
+PIPELINES = (
+    ','.join(DEFAULT_PIPELINE),
+    'contrast',
+    'border,contrast,upscale',
+    'border,contrast,upscale,binarize',
+    ','.join(SCAN_PIPELINE),
+)
+
+
+def collect_regions(limit, dpi):
+    """(image, ground truth text) for text blocks of 1.pdf"""
+    regions = []
+    with fitz.open(os.path.join(ROOT, '1.pdf')) as doc:
+        for page in doc:
+            for x0, y0, x1, y1, text, *_ in page.get_text('blocks'):
+                if x1 - x0 > 4 and y1 - y0 > 4 and text.strip():
+                    rect = fitz.Rect(x0, y0, x1, y1) + (-4, -4, 4, 4)
+                    regions.append((render_region(page, rect, dpi), ' '.join(text.split())))
+                if len(regions) >= limit:
+                    return regions
+    return regions
+
+
+def similarity(a, b):
+    return difflib.SequenceMatcher(None, ' '.join(a.split()), b).ratio()
+
+
+def bench_pipeline(spec, regions, ocr):
+    preprocessor = Preprocessor(spec)
+    scores = []
+    ocr_seconds = 0.0
+    for image, truth in regions:
+        processed = preprocessor(image)
+        if ocr is not None:
+            start = time.perf_counter()
+            scores.append(similarity(ocr(processed), truth))
+            ocr_seconds += time.perf_counter() - start
+    return preprocessor.stats(), scores, ocr_seconds
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[1])
+    parser.add_argument('--regions', type=int, default=30)
+    parser.add_argument('--dpi', type=int, default=300)
+    parser.add_argument('--pipeline', action='append', help='stage spec (default: a set)')
+    args = parser.parse_args()
+
+    regions = collect_regions(args.regions, args.dpi)
+    ocr = None
+    try:
+        import ocr_module
+        ocr_module.get_backend().image_to_string(regions[0][0])
+        ocr = lambda image: ocr_module.process_image(image, use_cache=False)
+    except Exception as e:
+        print(f'OCR unavailable, timing only ({e.__class__.__name__})')
+
+    print(f'{len(regions)} regions at {args.dpi} dpi')
+    for spec in args.pipeline or PIPELINES:
+        stats, scores, ocr_seconds = bench_pipeline(spec, regions, ocr)
+        total = sum(stage['mean_ms'] for stage in stats.values())
+        stages = '  '.join(f"{name} {stage['mean_ms']:.2f}" for name, stage in stats.items())
+        line = f'{spec:40s} {total:7.2f} ms/region  [{stages}]'
+        if scores:
+            line += (f'  accuracy {sum(scores) / len(scores):.3f}'
+                     f'  ocr {ocr_seconds * 1000 / len(scores):.0f} ms/region')
+        print(line)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,102 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 18:31:47 2026
+
+@author: hendrik
+
+Resident memory of a capture session: keeping every region crop (as
+capture_selection used to) against keeping only the PDF rects plus the
+viewer's bounded thumbnail cache.
+
+Each mode runs in its own process on regions spread over a document made
+of copies of 1.pdf, and reports the growth of VmRSS (Linux).
+
+    python benchmarks/bench_region_memory.py [--regions 500] [--dpi 300]
+"""
+
+import argparse
+import os
+import random
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def rss_kb():
+    with open('/proc/self/status') as status:
+        for line in status:
+            if line.startswith('VmRSS:'):
+                return int(line.split()[1])
+    return 0
+
+
+def random_regions(page_sizes, count, seed=1):
+    rng = random.Random(seed)
+    regions = []
+    for _ in range(count):
+        page = rng.randrange(len(page_sizes))
+        width, height = page_sizes[page]
+        w, h = rng.uniform(80, 300), rng.uniform(20, 80)
+        x, y = rng.uniform(0, width - w), rng.uniform(0, height - h)
+        regions.append((page, (x, y, x + w, y + h)))
+    return regions
+
+
+def run_mode(mode, count, dpi):
+    """Capture count regions the given way; returns (rss growth kB, held)"""
+    import fitz  # PyMuPDF
+    from PyQt5.QtWidgets import QApplication
+    from pdf_regions import render_region
+    from raster_cache import RasterCache, render_page
+    import untitled10
+
+    app = QApplication.instance() or QApplication(['bench'])
+    doc = fitz.open(os.path.join(ROOT, '1.pdf'))
+    regions = random_regions([(p.rect.width, p.rect.height) for p in doc], count)
+    thumbnails = RasterCache(max_bytes=untitled10.THUMBNAIL_CACHE_BYTES)
+    # Warm up MuPDF and Qt so their one-off allocations aren't counted
+    render_region(doc[0], (0, 0, 50, 50), dpi)
+    render_page(doc[0], 1, fitz.Rect(0, 0, 50, 50))
+
+    start = rss_kb()
+    held = []
+    for bubble_id, (page, rect) in enumerate(regions):
+        image = render_region(doc[page], rect, dpi)    # what the OCR job gets
+        if mode == 'crops':
+            held.append({'rect': rect, 'page': page, 'image': image})
+        else:
+            held.append({'rect': rect, 'page': page})
+            x0, y0, x1, y1 = rect
+            zoom = untitled10.THUMBNAIL_SIZE / max(x1 - x0, y1 - y0)
+            thumbnails.put((bubble_id, rect), render_page(doc[page], zoom, fitz.Rect(rect)))
+        del image
+    app.processEvents()
+    return rss_kb() - start, len(held)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[1])
+    parser.add_argument('--regions', type=int, default=500)
+    parser.add_argument('--dpi', type=int, default=300)
+    parser.add_argument('--mode', choices=('crops', 'rects'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.mode:
+        growth, held = run_mode(args.mode, args.regions, args.dpi)
+        print(growth)
+        return
+
+    env = dict(os.environ, QT_QPA_PLATFORM=os.environ.get('QT_QPA_PLATFORM', 'offscreen'))
+    print(f'{args.regions} regions at {args.dpi} dpi')
+    for mode, label in (('crops', 'crops kept'), ('rects', 'rects + thumbnails')):
+        out = subprocess.run([sys.executable, __file__, '--mode', mode,
+                              '--regions', str(args.regions), '--dpi', str(args.dpi)],
+                             env=env, capture_output=True, text=True, check=True).stdout
+        growth = int(out.strip().splitlines()[-1])
+        print(f'{label:20s} RSS +{growth / 1024:7.1f} MB')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,141 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 22:03:55 2026
+
+@author: hendrik
+
+Carry-over of a ballooned session to a new drawing revision.
+
+Rev A is a synthetic drawing package with a bubble on every callout.
+Rev B is rev A with every sheet's content shifted, a new sheet inserted
+and some callouts edited. The benchmark reports how long revision.migrate
+takes, how far the mapped bubbles land from where they belong, and how
+many of the edited callouts were flagged (and how many others were).
+
+    python benchmarks/bench_revision.py [--pages 50] [--sheet A1]
+        [--content vector|raster|mixed] [--edits 0.05]
+"""
+
+import argparse
+import math
+import os
+import random
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import fitz  # PyMuPDF
+
+from project_file import ProjectState
+from revision import migrate
+from synthetic_drawing import FONT_SIZE, make_drawing
+
+SHIFT = (6.5, -4.0)
+INSERTED_AT = 2
+
+
+def make_revision(rev_a, rev_b, truth, edits, seed=2):
+    """
+    Write rev B and return which callouts were edited
+
+    Returns:
+        set: (page, callout index) of the edited callouts
+    """
+    rng = random.Random(seed)
+    edited = set()
+    with fitz.open(rev_a) as src, fitz.open() as out:
+        for page_number in range(len(src)):
+            if page_number == INSERTED_AT:
+                # A new sheet with unrelated content
+                extra = out.new_page(width=src[0].rect.width, height=src[0].rect.height)
+                extra.insert_text((100, 100), 'NEW DETAIL SHEET ADDED IN REV B', fontsize=24)
+            rect = src[page_number].rect
+            page = out.new_page(width=rect.width, height=rect.height)
+            page.show_pdf_page(rect + (SHIFT[0], SHIFT[1], SHIFT[0], SHIFT[1]), src, page_number)
+            for index, (text, (x0, y0, x1, y1)) in enumerate(truth[page_number]):
+                if rng.random() >= edits:
+                    continue
+                edited.add((page_number, index))
+                box = fitz.Rect(x0, y0, x1, y1) + (SHIFT[0], SHIFT[1], SHIFT[0], SHIFT[1])
+                page.draw_rect(box, color=None, fill=(1, 1, 1))
+                page.insert_text((box.x0 + 2, box.y1 - 3), 'CHG ' + text[:6],
+                                 fontsize=FONT_SIZE)
+        out.save(rev_b, garbage=1, deflate=True)
+    return edited
+
+
+def session_for(rev_a, truth):
+    """ProjectState with a bubble and region on every callout of rev A"""
+    state = ProjectState()
+    ids, pages, xs, ys = [], [], [], []
+    with fitz.open(rev_a) as doc:
+        raster = {page.number for page in doc if not page.get_text('text').strip()}
+    for page_number in sorted(truth):
+        for index, (text, rect) in enumerate(truth[page_number]):
+            bubble_id = len(ids) + 1
+            ids.append(bubble_id)
+            pages.append(page_number)
+            xs.append(rect[0] - 12)
+            ys.append(rect[1])
+            source = 'ocr' if page_number in raster else 'text'
+            state.regions[bubble_id] = (rect, source)
+            state.texts[bubble_id] = text
+    state.bubbles = (ids, pages, xs, ys)
+    return state
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[1])
+    parser.add_argument('--pages', type=int, default=50)
+    parser.add_argument('--sheet', default='A1')
+    parser.add_argument('--density', type=float, default=10)
+    parser.add_argument('--content', choices=('vector', 'raster', 'mixed'), default='vector')
+    parser.add_argument('--edits', type=float, default=0.05,
+                        help='fraction of callouts edited in rev B')
+    args = parser.parse_args()
+
+    work = tempfile.mkdtemp(prefix='fai-rev-')
+    rev_a, rev_b = os.path.join(work, 'rev_a.pdf'), os.path.join(work, 'rev_b.pdf')
+    truth = make_drawing(rev_a, args.pages, args.sheet, args.density, args.content)
+    edited = make_revision(rev_a, rev_b, truth, args.edits)
+    state = session_for(rev_a, truth)
+
+    start = time.perf_counter()
+    migration = migrate(rev_a, rev_b, state)
+    seconds = time.perf_counter() - start
+
+    # Where each bubble should have gone
+    expected = {}
+    for page_number, callouts in truth.items():
+        new_page = page_number + (page_number >= INSERTED_AT)
+        for index, (text, rect) in enumerate(callouts):
+            expected[len(expected) + 1] = (new_page, rect[0] - 12 + SHIFT[0],
+                                           rect[1] + SHIFT[1], (page_number, index))
+    misplaced = 0
+    errors = []
+    for bubble_id, page, x, y in migration.rows:
+        new_page, ex, ey, _ = expected[bubble_id]
+        if page != new_page:
+            misplaced += 1
+        else:
+            errors.append(math.hypot(x - ex, y - ey))
+    flagged = {expected[b][3] for b in migration.changed}
+    hits = len(flagged & edited)
+
+    print(f'{args.pages} {args.sheet} sheets ({args.content}), {len(state)} bubbles, '
+          f'{len(edited)} callouts edited')
+    print(f"migrate        {seconds:.2f} s  ({migration.stats['pages_matched']} pages matched, "
+          f"{sum(1 for t in migration.transforms.values() if t.method == 'text')} by text)")
+    print(f'wrong page     {misplaced}')
+    if errors:
+        print(f'position error mean {sum(errors) / len(errors):.2f} pt, max {max(errors):.2f} pt')
+    print(f'edits flagged  {hits}/{len(edited)}, false alarms {len(flagged - edited)}, '
+          f're-OCR {len(migration.reocr)}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,128 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Mon Oct 19 01:05:37 2026
+
+@author: hendrik
+
+Search index size and query latency over a large drawing library.
+
+Fills a SearchIndex with --drawings synthetic drawings, each with a text
+layer of callouts and title block lines and a bubble on most callouts,
+then reports the build time, the database size, query latency for typical
+searches, the cost of re-saving one drawing's bubbles, and the text layer
+indexing of one real synthetic PDF.
+
+    python benchmarks/bench_search.py [--drawings 10000] [--pages 3]
+        [--callouts 30] [--db PATH]
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from search_index import SearchIndex
+from synthetic_drawing import callout_text, make_drawing
+
+QUERIES = ('Ø12.00', 'THRU', 'M6*', '±0.05', 'REF 12.5', 'Ø1.5 THRU', 'DRAWING 4711',
+           'NOT PRESENT')
+TITLE_LINES = ('DRAWING {number}', 'SHEET {page} OF {pages}', 'MATERIAL AL 6061-T6',
+               'UNLESS OTHERWISE SPECIFIED', 'DIMENSIONS ARE IN MM', 'FINISH ANODIZE',
+               'DRAWN {initials}', 'REV {rev}')
+
+
+def drawing_content(rng, number, pages, callouts):
+    """(text layer lines, bubbles) of one synthetic drawing"""
+    lines, bubbles = [], []
+    for page in range(pages):
+        for index in range(callouts):
+            x, y = rng.uniform(50, 2300), rng.uniform(50, 1600)
+            text = callout_text(rng)
+            rect = (x, y, x + 6 * len(text), y + 11)
+            lines.append((page, rect, text))
+            if rng.random() < 0.8:
+                bubbles.append((len(bubbles) + 1, page, rect, text))
+        for index, line in enumerate(TITLE_LINES):
+            text = line.format(number=number, page=page + 1, pages=pages,
+                               initials=rng.choice(('HB', 'JS', 'MK')), rev=rng.choice('ABC'))
+            lines.append((page, (2000, 1500 + 12 * index, 2300, 1511 + 12 * index), text))
+    return lines, bubbles
+
+
+def timed_queries(index, queries, runs):
+    """{query: (hits, p50 s, p95 s)}"""
+    results = {}
+    for query in queries:
+        times = []
+        for _ in range(runs):
+            start = time.perf_counter()
+            hits = index.search(query)
+            times.append(time.perf_counter() - start)
+        times.sort()
+        results[query] = (len(hits), statistics.median(times),
+                          times[min(len(times) - 1, int(len(times) * 0.95))])
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[1])
+    parser.add_argument('--drawings', type=int, default=10000)
+    parser.add_argument('--pages', type=int, default=3)
+    parser.add_argument('--callouts', type=int, default=30, help='per page')
+    parser.add_argument('--runs', type=int, default=50, help='per query')
+    parser.add_argument('--db', default=None, help='index file, default a temporary one')
+    args = parser.parse_args()
+
+    work = tempfile.mkdtemp(prefix='fai-search-')
+    db_path = args.db or os.path.join(work, 'search.sqlite3')
+    index = SearchIndex(db_path)
+    rng = random.Random(1)
+    start = time.perf_counter()
+    for number in range(args.drawings):
+        lines, bubbles = drawing_content(rng, number, args.pages, args.callouts)
+        path = os.path.join(work, f'drawing_{number:05d}.pdf')
+        index.set_text_layer(path, lines, args.pages)
+        index.set_bubbles(path, bubbles)
+    build = time.perf_counter() - start
+    stats = index.stats()
+    size = sum(os.path.getsize(db_path + suffix) for suffix in ('', '-wal')
+               if os.path.exists(db_path + suffix))
+    print(f"{stats['documents']} drawings, {stats['hits']} hits: built in {build:.1f} s "
+          f"({build / args.drawings * 1000:.1f} ms per drawing), {size / 2**20:.0f} MB")
+
+    print('query                  hits    p50 ms   p95 ms')
+    for query, (hits, p50, p95) in timed_queries(index, QUERIES, args.runs).items():
+        print(f'{query:20s} {hits:6d}  {p50 * 1000:8.2f} {p95 * 1000:8.2f}')
+
+    # Re-saving one session, as the placer's autosave does
+    lines, bubbles = drawing_content(rng, 0, args.pages, args.callouts)
+    path = os.path.join(work, 'drawing_00000.pdf')
+    times = []
+    for _ in range(args.runs):
+        begin = time.perf_counter()
+        index.set_bubbles(path, bubbles)
+        times.append(time.perf_counter() - begin)
+    print(f'update bubbles of one drawing  {statistics.median(times) * 1000:.2f} ms')
+
+    pdf_path = os.path.join(work, 'real.pdf')
+    make_drawing(pdf_path, pages=args.pages, sheet='A1')
+    begin = time.perf_counter()
+    index.index_pdf(pdf_path)
+    first = time.perf_counter() - begin
+    begin = time.perf_counter()
+    index.index_pdf(pdf_path)
+    again = time.perf_counter() - begin
+    print(f'index {args.pages}-page A1 PDF   {first * 1000:.1f} ms, '
+          f'unchanged {again * 1000:.2f} ms')
+    index.close()
+
+
+if __name__ == '__main__':
+    main()
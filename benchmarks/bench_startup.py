@@ -0,0 +1,159 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 23:17:40 2026
+
+@author: hendrik
+
+Cold start of the bubble placer.
+
+Starts the app in a fresh interpreter with -X importtime and reports the
+time from launch to the first paint of the window, the time to show a
+drawing opened --delay seconds later (the user picking a file), and the
+time from the first region capture to its OCR result. The heavy imports
+are listed from -X importtime, with whether they were already loaded at
+the first paint.
+
+    python benchmarks/bench_startup.py [--runs 3] [--delay 2]
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+# Modules whose import cost is worth watching
+HEAVY = ('PyQt5.QtWidgets', 'fitz', 'numpy', 'PIL.Image', 'pytesseract', 'PyPDF2',
+         'reportlab.pdfgen.canvas', 'ocr_module', 'preprocess', 'untitled10')
+
+
+def child(pdf_path, delay):
+    """Runs in the measured interpreter; prints one JSON line"""
+    result = {}
+    from PyQt5.QtCore import QEvent, QObject, QRectF, QTimer
+    from PyQt5.QtWidgets import QApplication, QMessageBox
+    import untitled10
+    result['imported'] = time.time()
+    # No modal dialogs: tesseract may be missing and its error box would
+    # sit there until the timeout
+    QMessageBox.question = staticmethod(lambda *args, **kwargs: QMessageBox.No)
+    QMessageBox.warning = staticmethod(lambda *args, **kwargs: QMessageBox.Ok)
+    app = QApplication(sys.argv[:1])
+    window = untitled10.InteractivePDFBubblePlacer(
+        os.path.join(os.path.dirname(pdf_path), 'search.sqlite3'))
+
+    def finish(outcome):
+        result['ocr'] = time.time()
+        result['ocr_outcome'] = outcome
+        print(json.dumps(result), flush=True)
+        app.quit()
+
+    def capture_region():
+        result['capture'] = time.time()
+        image = window.pdf_viewer.region_source(0, QRectF(60, 60, 200, 40))
+        window.ocr_pool.result_ready.connect(lambda bubble_id, text: finish('ok'))
+        window.ocr_pool.job_failed.connect(lambda bubble_id, message: finish(message[:60]))
+        window.ocr_pool.submit(1, image)
+
+    def open_drawing():
+        start = time.time()
+        window.open_pdf(pdf_path, restore=False)
+        app.processEvents()
+        result['open_s'] = time.time() - start
+        QTimer.singleShot(0, capture_region)
+
+    class FirstPaint(QObject):
+        def eventFilter(self, obj, event):
+            if event.type() == QEvent.Paint and 'paint' not in result:
+                result['paint'] = time.time()
+                result['at_paint'] = [name for name in HEAVY if name in sys.modules]
+                QTimer.singleShot(int(delay * 1000), open_drawing)
+            return False
+
+    first_paint = FirstPaint()
+    window.pdf_viewer.viewport().installEventFilter(first_paint)
+    window.show()
+    # As main() does
+    QTimer.singleShot(untitled10.WARM_UP_DELAY_MS, window.warm_up)
+    QTimer.singleShot(60000, lambda: finish('timeout'))
+    app.exec_()
+    window.close()
+
+
+def import_times(stderr):
+    """{module: cumulative seconds} from -X importtime output"""
+    times = {}
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or '|' not in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        name = name.strip()
+        if name in HEAVY and cumulative.strip().isdigit():
+            times[name] = int(cumulative) / 1e6
+    return times
+
+
+def run_once(pdf_path, delay):
+    env = dict(os.environ, QT_QPA_PLATFORM=os.environ.get('QT_QPA_PLATFORM', 'offscreen'),
+               PYTHONPATH=ROOT)
+    start = time.time()
+    proc = subprocess.run([sys.executable, '-X', 'importtime', os.path.abspath(__file__),
+                           '--child', pdf_path, '--delay', str(delay)],
+                          capture_output=True, text=True, env=env, cwd=ROOT, timeout=120)
+    lines = [line for line in proc.stdout.splitlines() if line.startswith('{')]
+    if not lines:
+        raise RuntimeError(f'child failed:\n{proc.stderr[-2000:]}')
+    result = json.loads(lines[-1])
+    return {
+        'import_s': result['imported'] - start,
+        'first_paint_s': result['paint'] - start,
+        'open_s': result['open_s'],
+        'first_ocr_s': result['ocr'] - result['capture'],
+        'ocr_outcome': result['ocr_outcome'],
+        'imports': import_times(proc.stderr),
+        'at_paint': result['at_paint'],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[1])
+    parser.add_argument('--runs', type=int, default=3)
+    parser.add_argument('--delay', type=float, default=2.0,
+                        help='seconds between the first paint and opening a drawing')
+    parser.add_argument('--child', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        child(args.child, args.delay)
+        return
+
+    from synthetic_drawing import make_drawing
+    pdf_path = os.path.join(tempfile.mkdtemp(prefix='fai-start-'), 'drawing.pdf')
+    make_drawing(pdf_path, pages=3, sheet='A3')
+    runs = [run_once(pdf_path, args.delay) for _ in range(args.runs)]
+
+    def median(key):
+        return statistics.median(run[key] for run in runs)
+
+    print(f'{args.runs} cold starts, median')
+    print(f"import untitled10   {median('import_s') * 1000:7.0f} ms (from launch)")
+    print(f"first paint         {median('first_paint_s') * 1000:7.0f} ms (from launch)")
+    print(f"open drawing        {median('open_s') * 1000:7.0f} ms ({args.delay:g} s after paint)")
+    print(f"first OCR           {median('first_ocr_s') * 1000:7.0f} ms "
+          f"({runs[-1]['ocr_outcome']})")
+    print('-X importtime, cumulative:')
+    for name in HEAVY:
+        values = [run['imports'][name] for run in runs if name in run['imports']]
+        if values:
+            when = 'before first paint' if name in runs[-1]['at_paint'] else 'later'
+            print(f'  {name:24s} {statistics.median(values) * 1000:7.1f} ms  {when}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,466 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 21:06:40 2026
+
+@author: hendrik
+
+Benchmark suite: scripted viewer scenarios on a synthetic drawing package,
+run headless, with the results saved as JSON for comparing commits.
+
+The drawing comes from synthetic_drawing.make_drawing and is cached in
+the work directory. Every scenario gets a fresh main window on Qt's
+offscreen platform and reports its own numbers plus the instrumentation
+timers it collected:
+
+    navigation  page flips and zoom steps, time to a painted viewport
+    selection   drag-selection band and bubble drag repaints per mouse move
+    ocr         capture_selection -> OCR of N callout regions, end to end
+    export      N bubbles over M pages, full export then incremental update
+
+    python benchmarks/run_suite.py [--pages 30] [--sheet A1]
+        [--content mixed] [--scenario navigation ...] [-o results.json]
+    python benchmarks/run_suite.py --compare base.json new.json
+"""
+
+import argparse
+import difflib
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+RESULTS_DIR = os.path.join(ROOT, 'benchmarks', 'results')
+SUITE_VERSION = 1
+WINDOW_SIZE = (1400, 900)
+
+
+def summarize(seconds):
+    """Latency summary in ms of a list of timings in seconds"""
+    if not seconds:
+        return {'n': 0}
+    ms = sorted(s * 1000 for s in seconds)
+    return {
+        'n': len(ms),
+        'mean_ms': statistics.fmean(ms),
+        'p50_ms': ms[len(ms) // 2],
+        'p95_ms': ms[min(len(ms) - 1, int(len(ms) * 0.95))],
+        'max_ms': ms[-1],
+    }
+
+
+def git_revision():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT,
+                                capture_output=True, text=True, check=True).stdout.strip()
+        dirty = bool(subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'],
+                                    cwd=ROOT, capture_output=True, text=True).stdout.strip())
+        return commit, dirty
+    except Exception:
+        return None, None
+
+
+# -- harness -----------------------------------------------------------------
+
+class Harness:
+    """QApplication on the offscreen platform and a fresh window per scenario"""
+
+    def __init__(self):
+        os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+        from PyQt5.QtWidgets import QApplication, QMessageBox
+        self.app = QApplication.instance() or QApplication(['fai-bench'])
+        # Nobody is there to close a message box; collect them instead
+        self.messages = []
+        # Synthetic drawings stay out of the user's search index
+        self.search_index_path = os.path.join(tempfile.mkdtemp(prefix='fai-bench-'),
+                                              'search.sqlite3')
+
+        def message(kind, default):
+            def show(parent, title, text, *args, **kwargs):
+                self.messages.append((kind, title, text))
+                return default
+            return show
+        QMessageBox.information = message('information', QMessageBox.Ok)
+        QMessageBox.warning = message('warning', QMessageBox.Ok)
+        QMessageBox.critical = message('critical', QMessageBox.Ok)
+        QMessageBox.question = message('question', QMessageBox.No)
+
+    def settle(self, seconds=0.0):
+        """Process events, for at least seconds"""
+        end = time.perf_counter() + seconds
+        while True:
+            self.app.processEvents()
+            if time.perf_counter() >= end:
+                return
+            time.sleep(0.005)
+
+    def wait_until(self, condition, timeout=60.0):
+        end = time.perf_counter() + timeout
+        while not condition():
+            if time.perf_counter() > end:
+                raise TimeoutError('scenario did not finish')
+            self.app.processEvents()
+            time.sleep(0.001)
+
+    def open_window(self, pdf_path):
+        import untitled10
+        window = untitled10.InteractivePDFBubblePlacer(self.search_index_path)
+        window.autosave_timer.stop()
+        window.resize(*WINDOW_SIZE)
+        window.show()
+        window.open_pdf(pdf_path, restore=False)
+        self.settle(0.2)
+        return window
+
+    def close_window(self, window):
+        window.project = None    # don't leave project files next to the drawing
+        window.close()
+        window.deleteLater()
+        self.settle()
+
+    def mouse(self, kind, pos, modifiers=None):
+        from PyQt5.QtCore import QEvent, QPointF, Qt
+        from PyQt5.QtGui import QMouseEvent
+        event_type = {'press': QEvent.MouseButtonPress, 'move': QEvent.MouseMove,
+                      'release': QEvent.MouseButtonRelease}[kind]
+        button = Qt.NoButton if kind == 'move' else Qt.LeftButton
+        return QMouseEvent(event_type, QPointF(pos), button, Qt.LeftButton,
+                           modifiers if modifiers is not None else Qt.NoModifier)
+
+
+def display_point(viewer, x, y):
+    from PyQt5.QtCore import QPoint
+    return QPoint(int(x * viewer.scale_factor), int(y * viewer.scale_factor))
+
+
+# -- scenarios -----------------------------------------------------------------
+
+def scenario_navigation(harness, drawing, args):
+    """Flip through the pages, then step through the zoom levels"""
+    import untitled10
+    window = harness.open_window(drawing['path'])
+    viewer = window.pdf_viewer
+    flips = []
+    for page_number in range(1, drawing['pages']):
+        start = time.perf_counter()
+        window.go_to_page(page_number)
+        viewer.canvas.repaint()
+        flips.append(time.perf_counter() - start)
+        # Reading time, during which the prefetcher works ahead
+        harness.settle(args.dwell / 1000)
+    window.go_to_page(0)
+    harness.settle(args.dwell / 1000)
+    zooms = []
+    for zoom in untitled10.ZOOM_LEVELS + untitled10.ZOOM_LEVELS[::-1]:
+        start = time.perf_counter()
+        viewer.set_zoom(zoom)
+        viewer.canvas.repaint()
+        zooms.append(time.perf_counter() - start)
+        harness.settle(args.dwell / 1000)
+    harness.close_window(window)
+    return {'page_flip': summarize(flips), 'zoom_step': summarize(zooms)}
+
+
+def scenario_selection(harness, drawing, args):
+    """Drag a selection band and a bubble across a page full of bubbles"""
+    from PyQt5.QtCore import Qt
+    window = harness.open_window(drawing['path'])
+    viewer = window.pdf_viewer
+    rng = random.Random(2)
+    width, height = viewer.page_width, viewer.page_height
+    for _ in range(args.page_bubbles):
+        window.bubbles.add(0, rng.uniform(0, width), rng.uniform(0, height))
+    window.update_bubble_list()
+    viewer.canvas.repaint()
+    harness.settle(args.dwell / 1000)
+
+    def drag(start_pos, steps, modifiers=None):
+        times = []
+        viewer.on_mouse_press(harness.mouse('press', start_pos, modifiers))
+        for i in range(1, steps + 1):
+            pos = start_pos + display_point(viewer, i * 2, i * 1.5)
+            start = time.perf_counter()
+            viewer.on_mouse_move(harness.mouse('move', pos))
+            harness.app.processEvents()    # delivers the partial repaints
+            times.append(time.perf_counter() - start)
+        start = time.perf_counter()
+        viewer.on_mouse_release(harness.mouse('release', pos))
+        harness.app.processEvents()
+        return times, time.perf_counter() - start
+
+    # Drags start in the middle of the viewport so their repaints are visible
+    viewer.center_on(width / 2, height / 2)
+    harness.settle(args.dwell / 1000)
+    origin = display_point(viewer, width / 2, height / 2)
+    band, band_release = drag(origin, args.moves, Qt.ShiftModifier)
+    bubble_id = window.bubbles.page_ids(0)[0]
+    viewer.center_on(*window.bubbles.position(bubble_id))
+    harness.settle(args.dwell / 1000)
+    bubble, _ = drag(display_point(viewer, *window.bubbles.position(bubble_id)), args.moves)
+    harness.close_window(window)
+    return {'bubbles_on_page': args.page_bubbles, 'band_move': summarize(band),
+            'band_release_ms': band_release * 1000, 'bubble_drag_move': summarize(bubble)}
+
+
+class _NullBackend:
+    """Stands in for tesseract when none is installed: no text, no time"""
+    name = 'none'
+    lang = 'eng'
+
+    def image_to_string(self, image, config=''):
+        return ''
+
+    def image_to_lines(self, image, config=''):
+        return []
+
+    def close(self):
+        pass
+
+
+def scenario_ocr(harness, drawing, args):
+    """Capture N callout regions like a user drag-selecting them"""
+    import ocr_module
+    from PIL import Image
+    backend = 'none'
+    try:
+        ocr_module.get_backend().image_to_string(Image.new('L', (8, 8)))
+        backend = ocr_module.get_backend().name
+    except Exception:
+        ocr_module.set_backend(_NullBackend())
+    window = harness.open_window(drawing['path'])
+    viewer = window.pdf_viewer
+    window.select_mode_btn.setChecked(True)
+    window.toggle_selection_mode()
+    # Raster pages first: those are the ones that need OCR
+    pages = sorted(drawing['truth'], key=lambda p: (p not in drawing['raster_pages'], p))
+    regions = [(page, text, rect) for page in pages for text, rect in drawing['truth'][page]]
+    regions = regions[:args.regions]
+    captures = []
+    truth = {}
+    start_all = time.perf_counter()
+    for page, text, (x0, y0, x1, y1) in regions:
+        window.go_to_page(page)
+        bubble_id = window.bubble_model.insert_bubble(
+            page, None, lambda: window.bubbles.add(page, x0 - 12, y0))
+        truth[bubble_id] = text
+        viewer.set_selected_bubbles({bubble_id})
+        start = time.perf_counter()
+        viewer.on_mouse_press(harness.mouse('press', display_point(viewer, x0 - 2, y0 - 2)))
+        viewer.on_mouse_release(harness.mouse('release', display_point(viewer, x1 + 2, y1 + 2)))
+        captures.append(time.perf_counter() - start)
+        harness.app.processEvents()
+    harness.wait_until(lambda: not window.ocr_pool.pending_count(), timeout=600)
+    total = time.perf_counter() - start_all
+    ocr_regions = sum(1 for page, _, _ in regions if page in drawing['raster_pages'])
+    result = {'backend': backend, 'regions': len(regions), 'ocr_regions': ocr_regions,
+              'capture': summarize(captures), 'total_s': total,
+              'regions_per_second': len(regions) / total if total else 0.0}
+    if backend != 'none':
+        scores = [difflib.SequenceMatcher(None, window.bubble_text.get(b, ''), text).ratio()
+                  for b, text in truth.items()]
+        result['accuracy'] = statistics.fmean(scores) if scores else 0.0
+    harness.close_window(window)
+    return result
+
+
+def scenario_export(harness, drawing, args):
+    """Export N bubbles over M pages, then re-export after moving one"""
+    window = harness.open_window(drawing['path'])
+    rng = random.Random(3)
+    pages = min(args.export_pages or drawing['pages'], drawing['pages'])
+    width, height = window.pdf_viewer.page_width, window.pdf_viewer.page_height
+    for _ in range(args.bubbles):
+        window.bubbles.add(rng.randrange(pages), rng.uniform(0, width), rng.uniform(0, height))
+    window.update_bubble_list()
+    output = os.path.join(args.work, 'export_out.pdf')
+    if os.path.exists(output):
+        os.remove(output)
+    start = time.perf_counter()
+    window.create_bubble_overlay(drawing['path'], output)
+    full = time.perf_counter() - start
+    full_size = os.path.getsize(output)
+    bubble_id = window.bubbles.page_ids(window.bubbles.pages()[0])[0]
+    x, y = window.bubbles.position(bubble_id)
+    window.bubbles.move(bubble_id, x + 5, y + 5)
+    start = time.perf_counter()
+    mode = window.create_bubble_overlay(drawing['path'], output)
+    incremental = time.perf_counter() - start
+    harness.close_window(window)
+    return {'bubbles': args.bubbles, 'pages': pages, 'full_ms': full * 1000,
+            'full_mb': full_size / 2**20, 'update_mode': mode,
+            'update_ms': incremental * 1000,
+            'update_added_kb': (os.path.getsize(output) - full_size) / 1024}
+
+
+# Arguments that change what the scenarios measure
+SCENARIO_PARAMS = ('dwell', 'page_bubbles', 'moves', 'regions', 'bubbles', 'export_pages')
+
+SCENARIOS = {
+    'navigation': scenario_navigation,
+    'selection': scenario_selection,
+    'ocr': scenario_ocr,
+    'export': scenario_export,
+}
+
+
+def prepare_drawing(args):
+    """Generate the synthetic drawing, or reuse it from the work directory"""
+    from synthetic_drawing import make_drawing
+    name = (f'syn_{args.pages}p_{args.sheet}_{args.content}_d{args.density:g}'
+            f'_r{args.raster_dpi}_s{args.seed}')
+    path = os.path.join(args.work, name + '.pdf')
+    truth_path = os.path.join(args.work, name + '.json')
+    if os.path.exists(path) and os.path.exists(truth_path):
+        with open(truth_path, encoding='utf-8') as f:
+            truth = {int(page): callouts for page, callouts in json.load(f).items()}
+    else:
+        truth = make_drawing(path, args.pages, args.sheet, args.density, args.content,
+                             args.raster_dpi, args.seed)
+        with open(truth_path, 'w', encoding='utf-8') as f:
+            json.dump(truth, f)
+    import fitz  # PyMuPDF
+    with fitz.open(path) as doc:
+        raster_pages = {page.number for page in doc if not page.get_text('text').strip()}
+    return {'path': path, 'pages': args.pages, 'truth': truth, 'raster_pages': raster_pages}
+
+
+def run(args):
+    import instrumentation
+    os.makedirs(args.work, exist_ok=True)
+    drawing = prepare_drawing(args)
+    harness = Harness()
+    commit, dirty = git_revision()
+    results = {
+        'suite': SUITE_VERSION,
+        'commit': commit,
+        'dirty': dirty,
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+        'drawing': {'pages': args.pages, 'sheet': args.sheet, 'content': args.content,
+                    'density': args.density, 'raster_dpi': args.raster_dpi, 'seed': args.seed,
+                    'size_mb': os.path.getsize(drawing['path']) / 2**20},
+        'params': {key: getattr(args, key) for key in SCENARIO_PARAMS},
+        'scenarios': {},
+    }
+    for name in args.scenario or SCENARIOS:
+        instrumentation.reset()
+        start = time.perf_counter()
+        result = SCENARIOS[name](harness, drawing, args)
+        result['wall_s'] = time.perf_counter() - start
+        result['timers'] = instrumentation.snapshot()['timers']
+        if harness.messages:
+            result['messages'] = harness.messages
+            harness.messages = []
+        results['scenarios'][name] = result
+        print(f'{name:12s} {result["wall_s"]:6.1f} s  ' + describe(result))
+    return results
+
+
+def describe(result):
+    parts = []
+    for key, value in result.items():
+        if isinstance(value, dict) and 'p50_ms' in value:
+            parts.append(f"{key} p50 {value['p50_ms']:.1f} / p95 {value['p95_ms']:.1f} ms")
+        elif key.endswith(('_ms', '_s', '_second', 'accuracy')) and key != 'wall_s':
+            parts.append(f'{key} {value:.2f}')
+    return ', '.join(parts)
+
+
+def flatten(results):
+    """{'scenario.metric[.stat]': number} of a results file, timers left out"""
+    flat = {}
+    for scenario, metrics in results.get('scenarios', {}).items():
+        for key, value in metrics.items():
+            if key == 'timers':
+                continue
+            if isinstance(value, dict):
+                for stat, number in value.items():
+                    if isinstance(number, (int, float)) and stat != 'n':
+                        flat[f'{scenario}.{key}.{stat}'] = number
+            elif isinstance(value, (int, float)) and not isinstance(value, bool):
+                flat[f'{scenario}.{key}'] = value
+    return flat
+
+
+def compare(base, new, threshold=10.0):
+    """
+    Print the metrics of two results files side by side
+
+    Returns:
+        int: number of metrics that got worse by more than threshold %
+    """
+    old, current = flatten(base), flatten(new)
+    for key in ('drawing', 'params', 'cpus'):
+        if base.get(key) != new.get(key):
+            print(f'Note: {key} differs, the runs are not directly comparable')
+    print(f"{'metric':45s} {base.get('commit') or 'base':>10s} {new.get('commit') or 'new':>10s}"
+          f"  change")
+    regressions = 0
+    for key in sorted(old.keys() & current.keys()):
+        a, b = old[key], current[key]
+        change = (b - a) / a * 100 if a else 0.0
+        # Throughput and accuracy are better higher, everything else lower
+        worse = -change if key.endswith(('per_second', 'accuracy')) else change
+        flag = ''
+        if worse > threshold and key.endswith(('_ms', '_s', 'per_second', 'accuracy')):
+            flag = '  <-- slower' if not key.endswith('accuracy') else '  <-- worse'
+            regressions += 1
+        print(f'{key:45s} {a:10.2f} {b:10.2f} {change:+7.1f}%{flag}')
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[1])
+    parser.add_argument('--scenario', action='append', choices=list(SCENARIOS))
+    parser.add_argument('--pages', type=int, default=30)
+    parser.add_argument('--sheet', default='A1')
+    parser.add_argument('--density', type=float, default=30)
+    parser.add_argument('--content', choices=('vector', 'raster', 'mixed'), default='mixed')
+    parser.add_argument('--raster-dpi', type=int, default=150)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--dwell', type=float, default=150,
+                        help='ms between navigation steps')
+    parser.add_argument('--page-bubbles', type=int, default=300)
+    parser.add_argument('--moves', type=int, default=150)
+    parser.add_argument('--regions', type=int, default=40)
+    parser.add_argument('--bubbles', type=int, default=2000)
+    parser.add_argument('--export-pages', type=int, help='default all pages')
+    parser.add_argument('--work', default=os.path.join(tempfile.gettempdir(), 'fai-bench'),
+                        help='where drawings are generated and cached')
+    parser.add_argument('-o', '--output', help=f'results JSON (default in {RESULTS_DIR})')
+    parser.add_argument('--compare', nargs=2, metavar=('BASE', 'NEW'),
+                        help='compare two results files instead of running')
+    parser.add_argument('--threshold', type=float, default=10.0,
+                        help='%% change reported as a regression')
+    args = parser.parse_args()
+
+    if args.compare:
+        with open(args.compare[0], encoding='utf-8') as f:
+            base = json.load(f)
+        with open(args.compare[1], encoding='utf-8') as f:
+            new = json.load(f)
+        sys.exit(1 if compare(base, new, args.threshold) else 0)
+
+    results = run(args)
+    output = args.output
+    if output is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        output = os.path.join(RESULTS_DIR, time.strftime('%Y%m%d-%H%M%S')
+                              + f"-{results['commit'] or 'nogit'}.json")
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(results, f, indent=2)
+    print(f'Results written to {output}')
+
+
+if __name__ == '__main__':
+    main()
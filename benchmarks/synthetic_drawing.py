@@ -0,0 +1,238 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 20:52:09 2026
+
+@author: hendrik
+
+Synthetic drawing packages for benchmarking.
+
+Each sheet gets a border with zone marks, a title block, a few part
+views (outlines, holes, centre lines, hatching) and dimension callouts
+('12.50 ±0.05', 'Ø6.4 THRU', 'R3.0', '45°', thread and GD&T notes)
+scattered around the views. Vector sheets keep their text layer; raster
+sheets are the same drawing rendered to a grayscale JPEG, like a scan,
+so they have no text layer and need OCR. The callout texts and rects
+are returned as ground truth.
+
+    python benchmarks/synthetic_drawing.py out.pdf [--pages 50]
+        [--sheet A1] [--density 40] [--content vector|raster|mixed]
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import fitz  # PyMuPDF
+
+# Landscape sheet sizes in PDF points
+SHEETS = {
+    'A4': (842, 595),
+    'A3': (1191, 842),
+    'A2': (1684, 1191),
+    'A1': (2384, 1684),
+    'A0': (3370, 2384),
+    'ANSI-B': (1224, 792),
+    'ANSI-D': (2448, 1584),
+    'ANSI-E': (3168, 2448),
+}
+CONTENT = ('vector', 'raster', 'mixed')
+A4_AREA = 842 * 595
+FONT_SIZE = 9
+
+
+def sheet_size(sheet):
+    """(width, height) in points from a SHEETS name or 'WIDTHxHEIGHT'"""
+    if sheet in SHEETS:
+        return SHEETS[sheet]
+    width, _, height = sheet.lower().partition('x')
+    return float(width), float(height)
+
+
+def callout_text(rng):
+    value = rng.uniform(1, 250)
+    kind = rng.randrange(7)
+    if kind == 0:
+        return f'{value:.2f} ±{rng.choice((0.05, 0.1, 0.2, 0.5)):.2f}'
+    if kind == 1:
+        return f'Ø{value / 10:.1f} THRU'
+    if kind == 2:
+        return f'R{value / 20:.1f}'
+    if kind == 3:
+        return f'{rng.choice((15, 30, 45, 60, 90))}° ±0.5°'
+    if kind == 4:
+        return f'M{rng.choice((3, 4, 5, 6, 8, 10, 12))}x{rng.choice((0.5, 0.7, 1.0, 1.25))} - 6H'
+    if kind == 5:
+        return f'{rng.randint(2, 8)}X Ø{value / 20:.2f} +0.1/-0.0'
+    return f'{value:.1f} REF'
+
+
+def draw_view(shape, rng, rect):
+    """Outline, holes, centre lines and a hatched section inside rect"""
+    inner = rect + (rect.width * 0.1, rect.height * 0.1, -rect.width * 0.1, -rect.height * 0.1)
+    shape.draw_rect(inner)
+    # Chamfered corner and a pocket
+    cut = min(inner.width, inner.height) * 0.15
+    shape.draw_polyline([inner.tl + (0, cut), inner.tl + (cut, 0)])
+    pocket = fitz.Rect(inner.x0 + inner.width * 0.55, inner.y0 + inner.height * 0.2,
+                       inner.x1 - inner.width * 0.1, inner.y0 + inner.height * 0.55)
+    shape.draw_rect(pocket)
+    for _ in range(rng.randint(2, 6)):
+        center = fitz.Point(rng.uniform(inner.x0 + cut, inner.x1 - cut),
+                            rng.uniform(inner.y0 + cut, inner.y1 - cut))
+        radius = rng.uniform(3, cut / 2 + 3)
+        shape.draw_circle(center, radius)
+        shape.draw_line(center - (radius * 1.4, 0), center + (radius * 1.4, 0))
+        shape.draw_line(center - (0, radius * 1.4), center + (0, radius * 1.4))
+    shape.finish(color=(0, 0, 0), width=0.8)
+    # Section hatching
+    step = 6
+    x = pocket.x0 - pocket.height
+    while x < pocket.x1:
+        start = fitz.Point(max(x, pocket.x0), pocket.y1 - max(0, pocket.x0 - x))
+        end_x = min(x + pocket.height, pocket.x1)
+        end = fitz.Point(end_x, pocket.y1 - (end_x - x))
+        shape.draw_line(start, end)
+        x += step
+    shape.finish(color=(0, 0, 0), width=0.3)
+
+
+def draw_sheet(page, rng, page_number, page_count, callouts):
+    """Draw one sheet; returns [(text, (x0, y0, x1, y1)), ...] of its callouts"""
+    width, height = page.rect.width, page.rect.height
+    margin = 20
+    border = fitz.Rect(margin, margin, width - margin, height - margin)
+    shape = page.new_shape()
+    shape.draw_rect(border)
+    shape.draw_rect(border + (10, 10, -10, -10))
+    shape.finish(color=(0, 0, 0), width=1.2)
+    # Zone marks
+    zones = 8
+    for i in range(zones):
+        x = border.x0 + border.width * (i + 0.5) / zones
+        shape.insert_text((x, border.y0 + 8), str(i + 1), fontsize=7)
+    # Title block
+    block = fitz.Rect(border.x1 - 10 - min(360, border.width * 0.4), border.y1 - 10 - 90,
+                      border.x1 - 10, border.y1 - 10)
+    shape.draw_rect(block)
+    for i in range(1, 4):
+        y = block.y0 + block.height * i / 4
+        shape.draw_line((block.x0, y), (block.x1, y))
+    shape.finish(color=(0, 0, 0), width=0.8)
+    lines = (f'DRAWING NO. SYN-{page_number + 1:04d}', 'PART: SYNTHETIC BRACKET',
+             f'SCALE 1:1   SHEET {page_number + 1} OF {page_count}', 'MATERIAL: AL 6061-T6')
+    for i, text in enumerate(lines):
+        shape.insert_text((block.x0 + 6, block.y0 + block.height * i / 4 + 15), text,
+                          fontsize=FONT_SIZE)
+
+    # Views on a grid inside the drawing area
+    area = fitz.Rect(border.x0 + 30, border.y0 + 30, border.x1 - 30, block.y0 - 20)
+    cols = max(1, int(area.width // 500) + 1)
+    rows = max(1, int(area.height // 400) + 1)
+    cells = [fitz.Rect(area.x0 + area.width * c / cols, area.y0 + area.height * r / rows,
+                       area.x0 + area.width * (c + 1) / cols, area.y0 + area.height * (r + 1) / rows)
+             for r in range(rows) for c in range(cols)]
+    for cell in cells:
+        draw_view(shape, rng, cell)
+
+    # Callouts with leaders, kept clear of each other (checked against a
+    # coarse grid of the ones already placed)
+    grid = {}
+    cell_size = 100
+    truth = []
+    attempts = 0
+    while len(truth) < callouts and attempts < callouts * 20:
+        attempts += 1
+        text = callout_text(rng)
+        text_width = fitz.get_text_length(text, fontsize=FONT_SIZE)
+        x = rng.uniform(area.x0, area.x1 - text_width)
+        y = rng.uniform(area.y0 + FONT_SIZE, area.y1)
+        rect = fitz.Rect(x - 2, y - FONT_SIZE, x + text_width + 4, y + 3)
+        clear = rect + (-6, -6, 6, 6)
+        keys = [(i, j) for i in range(int(clear.x0 // cell_size), int(clear.x1 // cell_size) + 1)
+                for j in range(int(clear.y0 // cell_size), int(clear.y1 // cell_size) + 1)]
+        if any(rect.intersects(other + (-6, -6, 6, 6))
+               for key in keys for other in grid.get(key, ())):
+            continue
+        for key in keys:
+            grid.setdefault(key, []).append(rect)
+        shape.insert_text((x, y), text, fontsize=FONT_SIZE)
+        shape.draw_line(rect.bl + (0, 2), rect.bl + (rng.uniform(-30, 30), rng.uniform(8, 30)))
+        truth.append((text, tuple(round(v, 2) for v in rect)))
+    shape.finish(color=(0, 0, 0), width=0.5)
+    shape.commit()
+    return truth
+
+
+def make_drawing(path, pages=20, sheet='A3', density=40, content='vector', raster_dpi=150,
+                 seed=1):
+    """
+    Write a synthetic drawing package
+
+    Args:
+        path: output PDF
+        pages: number of sheets
+        sheet: SHEETS name or 'WIDTHxHEIGHT' in points
+        density: dimension callouts per A4 sized area of sheet
+        content: 'vector', 'raster' (scanned, no text layer) or 'mixed'
+            (every other sheet raster)
+        raster_dpi: resolution of raster sheets
+        seed: random seed, the same arguments give the same file
+
+    Returns:
+        dict: {page: [(text, (x0, y0, x1, y1)), ...]} callouts per page
+    """
+    if content not in CONTENT:
+        raise ValueError(f'content must be one of {CONTENT}')
+    rng = random.Random(seed)
+    width, height = sheet_size(sheet)
+    callouts = max(1, int(round(density * width * height / A4_AREA)))
+    truth = {}
+    with fitz.open() as doc:
+        for page_number in range(pages):
+            raster = content == 'raster' or (content == 'mixed' and page_number % 2)
+            if not raster:
+                page = doc.new_page(width=width, height=height)
+                truth[page_number] = draw_sheet(page, rng, page_number, pages, callouts)
+                continue
+            with fitz.open() as scratch:
+                vector_page = scratch.new_page(width=width, height=height)
+                truth[page_number] = draw_sheet(vector_page, rng, page_number, pages, callouts)
+                pix = vector_page.get_pixmap(dpi=raster_dpi, colorspace=fitz.csGRAY)
+                image = pix.tobytes('jpeg')
+            page = doc.new_page(width=width, height=height)
+            page.insert_image(page.rect, stream=image)
+        doc.save(path, garbage=1, deflate=True)
+    return truth
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[1])
+    parser.add_argument('output')
+    parser.add_argument('--pages', type=int, default=20)
+    parser.add_argument('--sheet', default='A3', help=f"{', '.join(SHEETS)} or WIDTHxHEIGHT")
+    parser.add_argument('--density', type=float, default=40,
+                        help='callouts per A4 sized area')
+    parser.add_argument('--content', choices=CONTENT, default='vector')
+    parser.add_argument('--raster-dpi', type=int, default=150)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--truth', help='also write the callouts as JSON here')
+    args = parser.parse_args()
+
+    truth = make_drawing(args.output, args.pages, args.sheet, args.density, args.content,
+                         args.raster_dpi, args.seed)
+    if args.truth:
+        with open(args.truth, 'w', encoding='utf-8') as f:
+            json.dump(truth, f, indent=1)
+    count = sum(len(callouts) for callouts in truth.values())
+    size = os.path.getsize(args.output)
+    print(f'{args.output}: {args.pages} {args.sheet} sheets ({args.content}), '
+          f'{count} callouts, {size / 2**20:.1f} MB')
+
+
+if __name__ == '__main__':
+    main()
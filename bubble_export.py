@@ -0,0 +1,226 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 16:12:44 2026
+
+@author: hendrik
+"""
+
+import io
+
+import fitz  # PyMuPDF
+
+from instrumentation import timed
+
+BUBBLE_RADIUS = 10
+BUBBLE_FONT_SIZE = 8
+BUBBLE_COLOR = (1, 0, 0)
+# Key set on the content streams holding our bubbles, so a later
+# incremental update can find and replace them without decoding any streams
+BUBBLE_STREAM_KEY = 'FAIBubbles'
+
+
+def iter_page_bubbles(bubbles):
+    """
+    (page_number, [(number, x, y), ...]) for every page with bubbles
+
+    Args:
+        bubbles: BubbleStore, or a {page: [(x, y), ...]} dict numbered in
+            page order
+    """
+    if hasattr(bubbles, 'count_before_page'):
+        for page_number in bubbles.pages():
+            first = bubbles.count_before_page(page_number) + 1
+            yield page_number, [(number, x, y) for number, (x, y)
+                                in enumerate(bubbles.page_bubbles(page_number), first)]
+    else:
+        number = 1
+        for page_number in sorted(bubbles):
+            points = bubbles[page_number]
+            yield page_number, [(number + i, x, y) for i, (x, y) in enumerate(points)]
+            number += len(points)
+
+
+def draw_page_bubbles(page, numbered_bubbles, radius=BUBBLE_RADIUS,
+                      font_size=BUBBLE_FONT_SIZE, color=BUBBLE_COLOR):
+    """
+    Draw numbered bubbles into a page's content stream
+
+    Args:
+        page: fitz Page
+        numbered_bubbles: [(number, x, y), ...] in PDF coordinates (top-left
+            origin, as shown in the viewer)
+    """
+    doc = page.parent
+    before = set(page.get_contents())
+    shape = page.new_shape()
+    for number, x, y in numbered_bubbles:
+        shape.draw_circle(fitz.Point(x, y), radius)
+    shape.finish(color=color, width=1)
+    for number, x, y in numbered_bubbles:
+        label = str(number)
+        width = fitz.get_text_length(label, fontname='helv', fontsize=font_size)
+        shape.insert_text(fitz.Point(x - width / 2, y + 3), label,
+                          fontname='helv', fontsize=font_size, color=color)
+    shape.commit()
+    for xref in set(page.get_contents()) - before:
+        doc.xref_set_key(xref, BUBBLE_STREAM_KEY, 'true')
+
+
+def remove_page_bubbles(page):
+    """
+    Drop the bubble streams a previous export added to a page
+
+    Returns:
+        int: number of streams removed
+    """
+    doc = page.parent
+    contents = page.get_contents()
+    keep = [xref for xref in contents
+            if doc.xref_get_key(xref, BUBBLE_STREAM_KEY)[1] != 'true']
+    if len(keep) != len(contents):
+        doc.xref_set_key(page.xref, 'Contents',
+                         '[' + ' '.join(f'{xref} 0 R' for xref in keep) + ']')
+    return len(contents) - len(keep)
+
+
+def export_bubbles(input_pdf, output_pdf, bubbles, progress=None):
+    """
+    Write a copy of input_pdf with the bubbles drawn on
+
+    The bubbles are added as one extra content stream per ballooned page.
+    Pages without bubbles are copied through without being parsed or
+    rewritten, and the output is streamed to disk in one pass.
+
+    Args:
+        input_pdf: source PDF path
+        output_pdf: destination path
+        bubbles: BubbleStore or {page: [(x, y), ...]}
+        progress: optional callable(pages_done, pages_total)
+
+    Returns:
+        int: number of pages that got bubbles
+    """
+    try:
+        with fitz.open(input_pdf) as doc:
+            pages = [(p, b) for p, b in iter_page_bubbles(bubbles) if p < len(doc)]
+            for done, (page_number, numbered_bubbles) in enumerate(pages, 1):
+                with timed('export.draw_page'):
+                    draw_page_bubbles(doc[page_number], numbered_bubbles)
+                if progress:
+                    progress(done, len(pages))
+            with timed('export.save'):
+                doc.save(output_pdf, garbage=0, deflate=True)
+            return len(pages)
+    except Exception as e:
+        raise Exception(f"PDF Generation Error: {str(e)}")
+
+
+def update_bubbles(output_pdf, bubbles, pages, progress=None):
+    """
+    Redraw the bubbles of some pages of a PDF written by export_bubbles,
+    as an incremental update appended to the file
+
+    Only the changed page objects and the new bubble streams are written,
+    so the cost follows the number of edited pages rather than the size of
+    the document.
+
+    Args:
+        output_pdf: PDF previously written by export_bubbles
+        bubbles: BubbleStore or {page: [(x, y), ...]}
+        pages: page indices whose bubbles changed since that export
+        progress: optional callable(pages_done, pages_total)
+
+    Returns:
+        int: number of pages updated
+    """
+    pages = sorted(pages)
+    by_page = {}
+    if hasattr(bubbles, 'count_before_page'):
+        for page_number in pages:
+            first = bubbles.count_before_page(page_number) + 1
+            by_page[page_number] = [(number, x, y) for number, (x, y)
+                                    in enumerate(bubbles.page_bubbles(page_number), first)]
+    else:
+        by_page = dict(iter_page_bubbles(bubbles))
+    try:
+        with fitz.open(output_pdf) as doc:
+            if not doc.can_save_incrementally():
+                raise ValueError('file cannot be updated incrementally')
+            pages = [p for p in pages if p < len(doc)]
+            for done, page_number in enumerate(pages, 1):
+                page = doc[page_number]
+                with timed('export.draw_page'):
+                    remove_page_bubbles(page)
+                    if by_page.get(page_number):
+                        draw_page_bubbles(page, by_page[page_number])
+                if progress:
+                    progress(done, len(pages))
+            if pages:
+                with timed('export.save_incremental'):
+                    doc.saveIncr()
+            return len(pages)
+    except Exception as e:
+        raise Exception(f"PDF Update Error: {str(e)}")
+
+
+def create_bubble_overlay_pypdf2(input_pdf, output_pdf, bubbles):
+    """
+    Previous export path: a reportlab overlay per page merged with PyPDF2.
+    Kept for comparison in benchmarks/bench_export.py.
+    """
+    import PyPDF2
+    from reportlab.pdfgen import canvas
+
+    by_page = dict(iter_page_bubbles(bubbles))
+    try:
+        with open(input_pdf, 'rb') as file:
+            pdf_reader = PyPDF2.PdfReader(file)
+            pdf_writer = PyPDF2.PdfWriter()
+
+            # Process all pages
+            for page_number in range(len(pdf_reader.pages)):
+                # Get the original page
+                original_page = pdf_reader.pages[page_number]
+
+                # If no bubbles on this page, just add the original page
+                if page_number not in by_page:
+                    pdf_writer.add_page(original_page)
+                    continue
+
+                # Create overlay PDF with same dimensions as input page
+                packet = io.BytesIO()
+                can = canvas.Canvas(packet, pagesize=(original_page.mediabox.width, original_page.mediabox.height))
+
+                # Draw bubbles using PDF coordinates
+                for idx, x, y in by_page[page_number]:
+                    # Flip Y coordinate for PDF
+                    pdf_y = float(original_page.mediabox.height) - float(y)
+
+                    can.setStrokeColorRGB(1, 0, 0)  # Pure red
+                    can.circle(float(x), pdf_y, 10, stroke=1, fill=0)
+
+                    can.setFillColorRGB(1, 0, 0)
+                    can.setFont('Helvetica', 8)
+                    can.drawCentredString(float(x), pdf_y - 3, str(idx))
+
+                can.save()
+                packet.seek(0)
+                overlay_pdf = PyPDF2.PdfReader(packet)
+
+                # Create merged page
+                merged_page = PyPDF2.PageObject.create_blank_page(
+                    width=original_page.mediabox.width,
+                    height=original_page.mediabox.height
+                )
+                merged_page.merge_page(original_page)
+                if overlay_pdf.pages:  # Check if overlay has pages before merging
+                    merged_page.merge_page(overlay_pdf.pages[0])
+
+                pdf_writer.add_page(merged_page)
+
+            # Write the complete PDF
+            with open(output_pdf, 'wb') as output_file:
+                pdf_writer.write(output_file)
+
+    except Exception as e:
+        raise Exception(f"PDF Generation Error: {str(e)}")
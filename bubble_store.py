@@ -0,0 +1,418 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 14:25:50 2026
+
+@author: hendrik
+"""
+
+import itertools
+from array import array
+from bisect import bisect_left, bisect_right, insort
+
+
+class SpatialGrid:
+    """
+    Uniform grid over rectangles (PDF points) for hit-testing.
+
+    Each key is bucketed in every cell its rect touches; a query only looks
+    at the keys in the cells it overlaps, so cost depends on local density
+    rather than on how many items the page holds.
+    """
+
+    def __init__(self, cell_size=32):
+        self.cell_size = cell_size
+        self._rects = {}    # key -> (x0, y0, x1, y1)
+        self._cells = {}    # (cx, cy) -> set of keys
+
+    def __len__(self):
+        return len(self._rects)
+
+    def _cell_range(self, rect):
+        x0, y0, x1, y1 = rect
+        size = self.cell_size
+        return [(cx, cy)
+                for cx in range(int(x0 // size), int(x1 // size) + 1)
+                for cy in range(int(y0 // size), int(y1 // size) + 1)]
+
+    def insert(self, key, rect):
+        if key in self._rects:
+            self.remove(key)
+        x0, y0, x1, y1 = rect
+        rect = (min(x0, x1), min(y0, y1), max(x0, x1), max(y0, y1))
+        self._rects[key] = rect
+        for cell in self._cell_range(rect):
+            self._cells.setdefault(cell, set()).add(key)
+
+    def remove(self, key):
+        rect = self._rects.pop(key, None)
+        if rect is None:
+            return
+        for cell in self._cell_range(rect):
+            bucket = self._cells.get(cell)
+            if bucket is not None:
+                bucket.discard(key)
+                if not bucket:
+                    del self._cells[cell]
+
+    def rect(self, key):
+        return self._rects.get(key)
+
+    def query(self, rect):
+        """Keys whose rect intersects rect"""
+        qx0, qy0, qx1, qy1 = rect
+        found = set()
+        for cell in self._cell_range(rect):
+            for key in self._cells.get(cell, ()):
+                if key in found:
+                    continue
+                x0, y0, x1, y1 = self._rects[key]
+                if x0 <= qx1 and qx0 <= x1 and y0 <= qy1 and qy0 <= y1:
+                    found.add(key)
+        return found
+
+
+class _PageBubbles:
+    """Bubbles of one page as parallel typed arrays, in numbering order"""
+    __slots__ = ('ids', 'xs', 'ys', 'index')
+
+    def __init__(self):
+        self.ids = array('q')
+        self.xs = array('d')
+        self.ys = array('d')
+        self.index = {}    # bubble_id -> position in the arrays
+
+    def __len__(self):
+        return len(self.ids)
+
+    def reindex(self, start):
+        for i in range(start, len(self.ids)):
+            self.index[self.ids[i]] = i
+
+
+class BubbleStore:
+    """
+    All bubbles of a document with stable IDs and global numbering.
+
+    Bubble IDs are integers that never change or get reused, so regions and
+    OCR text can be keyed on them safely. Global numbers (1-based, in page
+    order) come from a prefix sum of per-page counts. An edit on a page only
+    invalidates the prefix entries from that page onwards, and they are
+    recomputed lazily. Appending to the last page, the common case, never
+    invalidates anything.
+    """
+
+    def __init__(self):
+        self._pages = {}           # page -> _PageBubbles
+        self._page_of = {}         # bubble_id -> page
+        self._page_order = []      # pages that have bubbles, sorted
+        self._prefix = [0]         # _prefix[i]: bubbles on _page_order[:i]
+        self._next_id = itertools.count(1)
+        # Per-page spatial indexes over bubble centres and region rects
+        self._centres = {}         # page -> SpatialGrid
+        self._regions = {}         # page -> SpatialGrid
+        # Pages whose bubbles or numbers changed since the last mark_clean()
+        self.dirty_pages = set()
+        # Bumped on every edit, so savers can tell whether anything changed
+        self.version = 0
+
+    def __len__(self):
+        return len(self._page_of)
+
+    def __contains__(self, bubble_id):
+        return bubble_id in self._page_of
+
+    def __iter__(self):
+        """(bubble_id, page, x, y) in global numbering order"""
+        for page in self._page_order:
+            entry = self._pages[page]
+            for i in range(len(entry)):
+                yield entry.ids[i], page, entry.xs[i], entry.ys[i]
+
+    def columns(self):
+        """(ids, pages, xs, ys) arrays of all bubbles in global numbering order"""
+        ids, pages, xs, ys = array('q'), array('i'), array('d'), array('d')
+        for page in self._page_order:
+            entry = self._pages[page]
+            ids.extend(entry.ids)
+            pages.extend(array('i', [page]) * len(entry))
+            xs.extend(entry.xs)
+            ys.extend(entry.ys)
+        return ids, pages, xs, ys
+
+    # -- prefix sums -------------------------------------------------------
+
+    def _invalidate_from(self, order_index):
+        del self._prefix[order_index + 1:]
+        # Every later page's numbers shift
+        self.dirty_pages.update(self._page_order[order_index:])
+
+    def _prefix_upto(self, order_index):
+        prefix = self._prefix
+        while len(prefix) <= order_index:
+            i = len(prefix) - 1
+            prefix.append(prefix[i] + len(self._pages[self._page_order[i]]))
+        return prefix[order_index]
+
+    def _page_entry(self, page, create=False):
+        entry = self._pages.get(page)
+        if entry is None and create:
+            entry = self._pages[page] = _PageBubbles()
+            insort(self._page_order, page)
+        return entry
+
+    def _drop_page_if_empty(self, page):
+        entry = self._pages.get(page)
+        if entry is not None and not len(entry):
+            del self._pages[page]
+            order_index = bisect_left(self._page_order, page)
+            del self._page_order[order_index]
+            del self._prefix[order_index + 1:]
+
+    # -- queries -------------------------------------------------------------
+
+    def pages(self):
+        """Pages that have bubbles, ascending"""
+        return list(self._page_order)
+
+    def count(self, page):
+        entry = self._pages.get(page)
+        return len(entry) if entry is not None else 0
+
+    def count_before_page(self, page):
+        """Number of bubbles on all pages before page"""
+        return self._prefix_upto(bisect_left(self._page_order, page))
+
+    def page_bubbles(self, page):
+        """[(x, y), ...] of a page in numbering order"""
+        entry = self._pages.get(page)
+        if entry is None:
+            return []
+        return list(zip(entry.xs, entry.ys))
+
+    def page_ids(self, page):
+        entry = self._pages.get(page)
+        return list(entry.ids) if entry is not None else []
+
+    def page_of(self, bubble_id):
+        return self._page_of[bubble_id]
+
+    def index_on_page(self, bubble_id):
+        return self._pages[self._page_of[bubble_id]].index[bubble_id]
+
+    def position(self, bubble_id):
+        """(x, y) of a bubble in PDF coordinates"""
+        entry = self._pages[self._page_of[bubble_id]]
+        i = entry.index[bubble_id]
+        return entry.xs[i], entry.ys[i]
+
+    def number(self, bubble_id):
+        """Global 1-based bubble number"""
+        page = self._page_of[bubble_id]
+        return self.count_before_page(page) + self._pages[page].index[bubble_id] + 1
+
+    def id_at(self, index):
+        """ID of the bubble with 0-based global index (number - 1)"""
+        if not 0 <= index < len(self._page_of):
+            raise IndexError(index)
+        order_index = bisect_right(self._prefix, index) - 1
+        # Extend the prefix sums until they pass index
+        while order_index == len(self._prefix) - 1 and order_index < len(self._page_order) - 1 \
+                and self._prefix_upto(order_index + 1) <= index:
+            order_index += 1
+        page = self._page_order[order_index]
+        return self._pages[page].ids[index - self._prefix[order_index]]
+
+    def hit_test(self, page, x, y, radius):
+        """
+        Bubble whose centre is nearest to (x, y) within radius
+
+        Returns:
+            int: bubble ID, or None
+        """
+        grid = self._centres.get(page)
+        if grid is None:
+            return None
+        best, best_d2 = None, radius * radius
+        for bubble_id in grid.query((x - radius, y - radius, x + radius, y + radius)):
+            bx, by = grid.rect(bubble_id)[:2]
+            d2 = (bx - x) ** 2 + (by - y) ** 2
+            if d2 <= best_d2:
+                best, best_d2 = bubble_id, d2
+        return best
+
+    def bubbles_in_rect(self, page, rect):
+        """IDs of the bubbles whose centre lies in rect (x0, y0, x1, y1)"""
+        grid = self._centres.get(page)
+        return grid.query(rect) if grid is not None else set()
+
+    def set_region(self, bubble_id, rect):
+        """Index the region rect (x0, y0, x1, y1) linked to a bubble"""
+        page = self._page_of[bubble_id]
+        self._regions.setdefault(page, SpatialGrid(cell_size=72)).insert(bubble_id, rect)
+
+    def region(self, bubble_id):
+        grid = self._regions.get(self._page_of.get(bubble_id))
+        return grid.rect(bubble_id) if grid is not None else None
+
+    def remove_region(self, bubble_id):
+        grid = self._regions.get(self._page_of.get(bubble_id))
+        if grid is not None:
+            grid.remove(bubble_id)
+
+    def regions_at(self, page, x, y):
+        """IDs of the bubbles whose region contains (x, y)"""
+        grid = self._regions.get(page)
+        return grid.query((x, y, x, y)) if grid is not None else set()
+
+    def regions_in_rect(self, page, rect):
+        grid = self._regions.get(page)
+        return grid.query(rect) if grid is not None else set()
+
+    def last_on_page(self, page):
+        entry = self._pages.get(page)
+        if entry is None or not len(entry):
+            return None
+        return entry.ids[-1]
+
+    # -- edits ---------------------------------------------------------------
+
+    def add(self, page, x, y, bubble_id=None):
+        """Append a bubble to a page and return its ID"""
+        return self.insert(page, None, x, y, bubble_id)
+
+    def insert(self, page, index, x, y, bubble_id=None):
+        """
+        Insert a bubble on a page
+
+        Args:
+            page: page index
+            index: position on the page, None to append
+            x, y: bubble centre in PDF coordinates
+            bubble_id: ID to reuse (e.g. when loading a project), default a
+                new one
+
+        Returns:
+            int: the bubble ID
+        """
+        if bubble_id is None:
+            bubble_id = next(self._next_id)
+        elif bubble_id in self._page_of:
+            raise ValueError(f'Duplicate bubble ID {bubble_id}')
+        else:
+            # Keep generated IDs clear of reused ones
+            self._next_id = itertools.count(max(bubble_id + 1, next(self._next_id)))
+        entry = self._page_entry(page, create=True)
+        if index is None or index >= len(entry):
+            index = len(entry)
+            entry.ids.append(bubble_id)
+            entry.xs.append(x)
+            entry.ys.append(y)
+            entry.index[bubble_id] = index
+        else:
+            index = max(index, 0)
+            entry.ids.insert(index, bubble_id)
+            entry.xs.insert(index, x)
+            entry.ys.insert(index, y)
+            entry.reindex(index)
+        self._page_of[bubble_id] = page
+        self._centres.setdefault(page, SpatialGrid()).insert(bubble_id, (x, y, x, y))
+        self.dirty_pages.add(page)
+        self.version += 1
+        self._invalidate_from(bisect_left(self._page_order, page))
+        return bubble_id
+
+    def move(self, bubble_id, x, y):
+        page = self._page_of[bubble_id]
+        entry = self._pages[page]
+        i = entry.index[bubble_id]
+        entry.xs[i] = x
+        entry.ys[i] = y
+        self._centres[page].insert(bubble_id, (x, y, x, y))
+        self.dirty_pages.add(page)
+        self.version += 1
+
+    def reorder(self, bubble_id, index):
+        """Move a bubble to another position on its page (renumbering)"""
+        page = self._page_of[bubble_id]
+        x, y = self.position(bubble_id)
+        region = self.region(bubble_id)
+        self.remove(bubble_id)
+        self.insert(page, index, x, y, bubble_id)
+        if region is not None:
+            self.set_region(bubble_id, region)
+
+    def remove(self, bubble_id):
+        self.remove_region(bubble_id)
+        page = self._page_of.pop(bubble_id)
+        self._centres[page].remove(bubble_id)
+        entry = self._pages[page]
+        i = entry.index.pop(bubble_id)
+        del entry.ids[i]
+        del entry.xs[i]
+        del entry.ys[i]
+        entry.reindex(i)
+        self.dirty_pages.add(page)
+        self.version += 1
+        self._invalidate_from(bisect_left(self._page_order, page))
+        self._drop_page_if_empty(page)
+
+    def clear_page(self, page):
+        """Remove all bubbles of a page and return their IDs"""
+        entry = self._pages.get(page)
+        if entry is None:
+            return []
+        ids = list(entry.ids)
+        for bubble_id in ids:
+            del self._page_of[bubble_id]
+        self._centres.pop(page, None)
+        self._regions.pop(page, None)
+        entry.ids, entry.xs, entry.ys = array('q'), array('d'), array('d')
+        entry.index.clear()
+        self.dirty_pages.add(page)
+        self.version += 1
+        self._invalidate_from(bisect_left(self._page_order, page))
+        self._drop_page_if_empty(page)
+        return ids
+
+    def clear(self):
+        self.dirty_pages.update(self._page_order)
+        self.version += 1
+        self._pages.clear()
+        self._page_of.clear()
+        self._centres.clear()
+        self._regions.clear()
+        self._page_order.clear()
+        self._prefix = [0]
+
+    def load_columns(self, columns):
+        """
+        Replace all bubbles with (ids, pages, xs, ys) columns as returned by
+        columns(), in numbering order. Builds the page arrays and indexes in
+        one pass instead of bubble by bubble.
+
+        Raises:
+            ValueError: on duplicate IDs, before anything is replaced
+        """
+        ids, pages, xs, ys = columns
+        if len(set(ids)) != len(ids):
+            raise ValueError('Duplicate bubble IDs')
+        self.clear()
+        for i, page in enumerate(pages):
+            entry = self._pages.get(page)
+            if entry is None:
+                entry = self._pages[page] = _PageBubbles()
+                self._centres[page] = SpatialGrid()
+            bubble_id, x, y = ids[i], xs[i], ys[i]
+            entry.index[bubble_id] = len(entry.ids)
+            entry.ids.append(bubble_id)
+            entry.xs.append(x)
+            entry.ys.append(y)
+            self._page_of[bubble_id] = page
+            self._centres[page].insert(bubble_id, (x, y, x, y))
+        self._page_order = sorted(self._pages)
+        # IDs issued before the load stay retired too
+        self._next_id = itertools.count(max(max(ids, default=0) + 1, next(self._next_id)))
+        self.dirty_pages.update(self._page_order)
+
+    def mark_clean(self):
+        self.dirty_pages.clear()
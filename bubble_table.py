@@ -0,0 +1,173 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 15:31:08 2026
+
+@author: hendrik
+"""
+
+from PyQt5.QtCore import Qt, QAbstractTableModel, QModelIndex, QSortFilterProxyModel
+from PyQt5.QtGui import QBrush, QColor
+from PyQt5.QtWidgets import QTableView, QHeaderView, QAbstractItemView
+
+
+class BubbleTableModel(QAbstractTableModel):
+    """
+    Characteristics table over a BubbleStore.
+
+    Source row r is the bubble with global number r + 1, so rows map to
+    bubbles through the store's prefix sums and the model keeps no copy of
+    the data. The view asks only for the rows it shows. Edits are reported
+    as row inserts/removals/changes instead of resetting the model. Rows
+    after an insert or removal keep their bubble and their No. shifts by
+    one along with the row, so they need no dataChanged and keep their
+    relative sort order.
+
+    Bubbles in flags ({bubble_id: reason}, e.g. regions that changed in a
+    new revision) are highlighted with the reason as tooltip.
+    """
+
+    COLUMNS = ('No.', 'Page', 'X', 'Y', 'Text')
+    NUMBER, PAGE, X, Y, TEXT = range(5)
+    FLAG_BRUSH = QBrush(QColor(255, 230, 150))
+
+    def __init__(self, bubbles, bubble_text, flags=None, parent=None):
+        super().__init__(parent)
+        self.bubbles = bubbles
+        self.bubble_text = bubble_text
+        self.flags = {} if flags is None else flags
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.bubbles)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.COLUMNS)
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and orientation == Qt.Horizontal:
+            return self.COLUMNS[section]
+        return None
+
+    def bubble_id(self, row):
+        return self.bubbles.id_at(row)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid() or role not in (Qt.DisplayRole, Qt.UserRole, Qt.ToolTipRole,
+                                               Qt.BackgroundRole):
+            return None
+        row, column = index.row(), index.column()
+        bubble_id = self.bubbles.id_at(row)
+        if role == Qt.BackgroundRole:
+            return self.FLAG_BRUSH if bubble_id in self.flags else None
+        if role == Qt.ToolTipRole and bubble_id in self.flags:
+            return self.flags[bubble_id]
+        if column == self.NUMBER:
+            return row + 1
+        if column == self.PAGE:
+            return self.bubbles.page_of(bubble_id) + 1
+        if column in (self.X, self.Y):
+            value = self.bubbles.position(bubble_id)[column - self.X]
+            return value if role == Qt.UserRole else f'{value:.2f}'
+        text = self.bubble_text.get(bubble_id, '')
+        if role == Qt.DisplayRole:
+            return text.replace('\n', ' ')
+        return text
+
+    # -- incremental updates, called by the owner around store edits ---------
+
+    def insert_bubble(self, page, index, insert):
+        """
+        Add a bubble to the store through insert(), reporting its row to
+        the views
+
+        Args:
+            page: page the bubble goes on
+            index: position on the page, None to append
+            insert: callable doing the store insert and returning the ID
+
+        Returns:
+            int: the new bubble ID
+        """
+        count = self.bubbles.count(page)
+        position = count if index is None else min(max(index, 0), count)
+        row = self.bubbles.count_before_page(page) + position
+        self.beginInsertRows(QModelIndex(), row, row)
+        bubble_id = insert()
+        self.endInsertRows()
+        return bubble_id
+
+    def remove_bubbles(self, bubble_ids, remove):
+        """
+        Remove bubbles from the store through remove(bubble_id), reporting
+        their rows to the views
+        """
+        rows = sorted((self.bubbles.number(b) - 1, b) for b in bubble_ids)
+        for row, bubble_id in reversed(rows):
+            self.beginRemoveRows(QModelIndex(), row, row)
+            remove(bubble_id)
+            self.endRemoveRows()
+
+    def remove_page(self, page, clear):
+        """
+        Remove all bubbles of a page through clear(page), reporting the
+        rows to the views, and return what clear returned
+        """
+        count = self.bubbles.count(page)
+        if not count:
+            return clear(page)
+        first = self.bubbles.count_before_page(page)
+        self.beginRemoveRows(QModelIndex(), first, first + count - 1)
+        removed = clear(page)
+        self.endRemoveRows()
+        return removed
+
+    def bubble_changed(self, bubble_id, columns=None):
+        """After bubble_id's position or text changed"""
+        row = self.bubbles.number(bubble_id) - 1
+        first, last = (min(columns), max(columns)) if columns else (0, len(self.COLUMNS) - 1)
+        self.dataChanged.emit(self.index(row, first), self.index(row, last))
+
+    def page_changed(self, page):
+        """After bubbles of a page were reordered"""
+        first = self.bubbles.count_before_page(page)
+        count = self.bubbles.count(page)
+        if count:
+            self.dataChanged.emit(self.index(first, 0),
+                                  self.index(first + count - 1, len(self.COLUMNS) - 1))
+
+    def reset(self):
+        """Bulk changes (load, clear, auto-balloon)"""
+        self.beginResetModel()
+        self.endResetModel()
+
+
+class BubbleTableView(QTableView):
+    """Sortable view of a BubbleTableModel with fixed-height rows"""
+
+    def __init__(self, model, parent=None):
+        super().__init__(parent)
+        self.source_model = model
+        self.proxy = QSortFilterProxyModel(self)
+        self.proxy.setSourceModel(model)
+        self.proxy.setSortRole(Qt.UserRole)
+        self.setModel(self.proxy)
+        self.setSortingEnabled(True)
+        self.sortByColumn(BubbleTableModel.NUMBER, Qt.AscendingOrder)
+        self.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.setWordWrap(False)
+        # Fixed row heights: no per-row size hints, so only visible rows
+        # are ever asked for data
+        header = self.verticalHeader()
+        header.setSectionResizeMode(QHeaderView.Fixed)
+        header.setDefaultSectionSize(self.fontMetrics().height() + 6)
+        header.hide()
+        self.horizontalHeader().setStretchLastSection(True)
+
+    def bubble_id_at(self, proxy_index):
+        return self.source_model.bubble_id(self.proxy.mapToSource(proxy_index).row())
+
+    def select_bubble(self, bubble_id):
+        row = self.source_model.bubbles.number(bubble_id) - 1
+        index = self.proxy.mapFromSource(self.source_model.index(row, 0))
+        self.selectRow(index.row())
+        self.scrollTo(index)
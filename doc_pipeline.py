@@ -0,0 +1,300 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 19:41:03 2026
+
+@author: hendrik
+
+Streaming document pipeline: pages flow through
+
+    rasterize (worker processes) -> preprocess + OCR / detect (threads)
+
+with bounded queues between the stages. Each worker process opens its own
+fitz handle once, so pages render in parallel on every core. At most
+`capacity` pages are anywhere in the pipeline at a time, which keeps
+memory flat however long the document is. Results are handed to
+subscribers, and yielded by run(), page by page as they complete.
+"""
+
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import Future, ProcessPoolExecutor
+
+import fitz  # PyMuPDF
+from PIL import Image
+
+import instrumentation
+from pdf_regions import DEFAULT_OCR_DPI, is_usable_text, render_region
+
+# lines: [(text, (x0, y0, x1, y1) in PDF points), ...]; source 'text' or
+# 'ocr'; features from auto_balloon.features_from_lines (detect only);
+# image the rendered page when keep_images; timings {stage: seconds};
+# error a string
+PageResult = namedtuple('PageResult', ['page', 'source', 'lines', 'features', 'image',
+                                       'timings', 'error'])
+
+
+def text_layer_lines(page):
+    """(text, rect) per line of the page's text layer"""
+    lines = {}
+    for x0, y0, x1, y1, word, block, line, _ in page.get_text('words'):
+        entry = lines.setdefault((block, line), [[], [x0, y0, x1, y1]])
+        entry[0].append(word)
+        box = entry[1]
+        box[0], box[1] = min(box[0], x0), min(box[1], y0)
+        box[2], box[3] = max(box[2], x1), max(box[3], y1)
+    return [(' '.join(words), tuple(box)) for words, box in lines.values()]
+
+
+# -- rasterize stage (worker processes) --------------------------------------
+
+_doc = None
+
+
+def _raster_init(pdf_path):
+    global _doc
+    _doc = fitz.open(pdf_path)
+
+
+def _raster_page(page_number, dpi, use_text_layer, render):
+    """
+    Text layer lines of a page, or the page rendered for OCR
+
+    Returns:
+        tuple: (page_number, lines or None, (mode, size, bytes) or None,
+        seconds)
+    """
+    start = time.perf_counter()
+    page = _doc[page_number]
+    lines = None
+    if use_text_layer:
+        lines = text_layer_lines(page)
+        if not is_usable_text(' '.join(text for text, _ in lines)):
+            lines = None
+    raster = None
+    if lines is None or render:
+        image = render_region(page, page.rect, dpi)
+        raster = (image.mode, image.size, image.tobytes())
+    return page_number, lines, raster, time.perf_counter() - start
+
+
+class _InProcess:
+    """Executor stand-in for workers=1: rasterize on one thread, no pickling"""
+
+    def __init__(self, pdf_path):
+        self._lock = threading.Lock()
+        _raster_init(pdf_path)
+
+    def submit(self, func, *args):
+        future = Future()
+        with self._lock:
+            try:
+                future.set_result(func(*args))
+            except Exception as e:
+                future.set_exception(e)
+        return future
+
+    def shutdown(self, wait=True, cancel_futures=False):
+        pass
+
+
+class DocumentPipeline:
+    """
+    Run the pages of a PDF through rasterize -> preprocess -> OCR/detect.
+
+    Args:
+        pdf_path: PDF file
+        pages: page indices, default all
+        dpi: raster resolution
+        use_text_layer: take lines from a usable text layer and only
+            rasterize pages without one
+        detect: classify lines into auto_balloon features
+        keep_images: also render text layer pages and pass the images on
+        preprocess: OCR preprocessing stages (see preprocess.parse_stages);
+            keep them to ones that don't move pixels, boxes are mapped
+            back to the page
+        workers: raster processes, default number of cores
+        ocr_threads: threads running preprocess + OCR
+        capacity: pages allowed in the pipeline at once, default
+            2 x workers + ocr_threads
+        ocr_func: callable(image) -> [(text, box, confidence), ...] in
+            image pixels, default ocr_module.process_image_lines
+    """
+
+    def __init__(self, pdf_path, pages=None, dpi=DEFAULT_OCR_DPI, use_text_layer=True,
+                 detect=False, keep_images=False, preprocess=None, workers=None,
+                 ocr_threads=None, capacity=None, ocr_func=None):
+        self.pdf_path = pdf_path
+        if pages is None:
+            with fitz.open(pdf_path) as doc:
+                pages = range(len(doc))
+        self.pages = list(pages)
+        self.dpi = dpi
+        self.use_text_layer = use_text_layer
+        self.detect = detect
+        self.keep_images = keep_images
+        self.preprocess = preprocess
+        if workers is None:
+            workers = os.cpu_count() or 1
+        self.workers = max(1, min(workers, len(self.pages) or 1))
+        self.ocr_threads = ocr_threads or max(1, min(4, os.cpu_count() or 1))
+        self.capacity = capacity or 2 * self.workers + self.ocr_threads
+        self.ocr_func = ocr_func
+        self._subscribers = []
+        self._cancelled = threading.Event()
+        self.stats = {}
+        # Highest number of pages in the pipeline at once, for checking
+        # that backpressure holds
+        self.peak_in_flight = 0
+
+    def subscribe(self, callback):
+        """callback(PageResult), called on the thread iterating run()"""
+        self._subscribers.append(callback)
+
+    def cancel(self):
+        self._cancelled.set()
+
+    def _process(self, page_number, raster_future):
+        """Second stage: preprocess + OCR a rendered page, classify lines"""
+        timings = {}
+        try:
+            _, lines, raster, seconds = raster_future.result()
+        except Exception as e:
+            return PageResult(page_number, None, [], [], None, timings,
+                              f'{type(e).__name__}: {e}')
+        timings['rasterize'] = seconds
+        image = Image.frombuffer(raster[0], raster[1], raster[2], 'raw', raster[0], 0, 1) \
+            if raster else None
+        source, error = 'text', None
+        try:
+            if lines is None:
+                source = 'ocr'
+                start = time.perf_counter()
+                ocr_image = image
+                if self.preprocess:
+                    from preprocess import get_preprocessor
+                    ocr_image = get_preprocessor(self.preprocess)(image)
+                    timings['preprocess'] = time.perf_counter() - start
+                    start = time.perf_counter()
+                ocr_func = self.ocr_func
+                if ocr_func is None:
+                    from ocr_module import process_image_lines as ocr_func
+                scale = 72 / self.dpi
+                lines = [(text, tuple(v * scale for v in box))
+                         for text, box, _ in ocr_func(ocr_image)]
+                timings['ocr'] = time.perf_counter() - start
+            features = []
+            if self.detect:
+                from auto_balloon import features_from_lines
+                start = time.perf_counter()
+                features = features_from_lines(lines, page_number, source)
+                timings['detect'] = time.perf_counter() - start
+        except Exception as e:
+            lines, features, error = [], [], f'{type(e).__name__}: {e}'
+        return PageResult(page_number, source, lines, features,
+                          image if self.keep_images else None, timings, error)
+
+    def run(self):
+        """
+        Process the pages, yielding a PageResult per page as it completes
+        (not in page order) after passing it to the subscribers
+        """
+        start = time.perf_counter()
+        slots = threading.BoundedSemaphore(self.capacity)
+        raster_queue = queue.Queue(maxsize=self.capacity)
+        result_queue = queue.Queue(maxsize=self.capacity)
+        in_flight = [0]
+        in_flight_lock = threading.Lock()
+        done = object()
+
+        if self.workers == 1:
+            pool = _InProcess(self.pdf_path)
+        else:
+            # Spawned, not forked: run() is started from background
+            # threads, and a fork while another thread holds an import
+            # lock deadlocks the children
+            pool = ProcessPoolExecutor(max_workers=self.workers, initializer=_raster_init,
+                                       initargs=(self.pdf_path,),
+                                       mp_context=multiprocessing.get_context('spawn'))
+
+        def feed():
+            try:
+                for page_number in self.pages:
+                    # Blocks while the pipeline is full: backpressure
+                    while not slots.acquire(timeout=0.1):
+                        if self._cancelled.is_set():
+                            return
+                    if self._cancelled.is_set():
+                        slots.release()
+                        return
+                    with in_flight_lock:
+                        in_flight[0] += 1
+                        self.peak_in_flight = max(self.peak_in_flight, in_flight[0])
+                    raster_queue.put((page_number, pool.submit(
+                        _raster_page, page_number, self.dpi, self.use_text_layer,
+                        self.keep_images)))
+            finally:
+                for _ in range(self.ocr_threads):
+                    raster_queue.put(done)
+
+        def work():
+            while True:
+                job = raster_queue.get()
+                if job is done:
+                    result_queue.put(done)
+                    return
+                if not self._cancelled.is_set():
+                    result_queue.put(self._process(*job))
+
+        threads = [threading.Thread(target=feed, name='pipeline-feed', daemon=True)]
+        threads += [threading.Thread(target=work, name=f'pipeline-ocr-{i}', daemon=True)
+                    for i in range(self.ocr_threads)]
+        for thread in threads:
+            thread.start()
+
+        pages_done = errors = 0
+        stage_seconds = {}
+        finished_workers = 0
+        try:
+            while finished_workers < self.ocr_threads:
+                result = result_queue.get()
+                if result is done:
+                    finished_workers += 1
+                    continue
+                with in_flight_lock:
+                    in_flight[0] -= 1
+                slots.release()
+                pages_done += 1
+                errors += result.error is not None
+                for stage, seconds in result.timings.items():
+                    stage_seconds[stage] = stage_seconds.get(stage, 0.0) + seconds
+                    instrumentation.record('pipeline.' + stage, seconds)
+                for callback in self._subscribers:
+                    callback(result)
+                yield result
+        finally:
+            self._cancelled.set()
+            # Unblock the feeder and workers if the consumer stopped early
+            while any(thread.is_alive() for thread in threads):
+                try:
+                    result_queue.get(timeout=0.05)
+                    slots.release()
+                except (queue.Empty, ValueError):
+                    pass
+            pool.shutdown(wait=True, cancel_futures=True)
+            seconds = time.perf_counter() - start
+            self.stats = {
+                'pages': pages_done,
+                'errors': errors,
+                'seconds': seconds,
+                'pages_per_second': pages_done / seconds if seconds else 0.0,
+                'stage_seconds': stage_seconds,
+                'peak_in_flight': self.peak_in_flight,
+            }
+
+    def run_all(self):
+        """Run to completion; returns the PageResults in page order"""
+        return sorted(self.run(), key=lambda result: result.page)
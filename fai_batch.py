@@ -0,0 +1,419 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 17:05:26 2026
+
+@author: hendrik
+
+Headless batch ballooning: bubbles, region text, ballooned PDF and a
+characteristics table for every drawing in a directory, without Qt.
+
+Bubbles for drawing.pdf come from the drawing.faiproj project saved by the
+placer or a drawing.fai.json sidecar next to it, or are detected with
+--auto when there is neither.
+
+    python fai_batch.py DRAWINGS_DIR -o OUTPUT_DIR [--auto] [--workers N]
+        [--index SEARCH_DB] [--tesseract CMD] [--tessdata DIR]
+
+Tesseract is taken from PATH (or its standard Windows install) unless
+--tesseract or $FAI_TESSERACT says otherwise.
+"""
+
+import argparse
+import csv
+import glob
+import json
+import os
+import sys
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import fitz  # PyMuPDF
+
+from auto_balloon import propose_bubbles, scan_page
+from bubble_export import export_bubbles
+from bubble_store import BubbleStore
+from pdf_regions import DEFAULT_OCR_DPI, TextLayerIndex, is_usable_text, render_region
+from project_file import ProjectFile, project_path
+from search_index import BUBBLE_BOX, SearchIndex
+
+SIDECAR_SUFFIX = '.fai.json'
+TABLE_COLUMNS = ('No.', 'Page', 'X', 'Y', 'Text', 'Source')
+
+
+def sidecar_path(pdf_path):
+    return os.path.splitext(pdf_path)[0] + SIDECAR_SUFFIX
+
+
+def load_sidecar(path):
+    """
+    Bubbles of a drawing from a JSON sidecar
+
+    The file holds {"bubbles": [{"page": 0, "x": .., "y": .., "region":
+    [x0, y0, x1, y1], "text": ".."}, ...]} in numbering order; region and
+    text are optional. Pages are 0-based, coordinates in PDF points.
+
+    Returns:
+        list of dict with keys page, x, y, region, text
+    """
+    with open(path, encoding='utf-8') as file:
+        data = json.load(file)
+    bubbles = []
+    for entry in data.get('bubbles', []):
+        region = entry.get('region')
+        bubbles.append({
+            'page': int(entry['page']),
+            'x': float(entry['x']),
+            'y': float(entry['y']),
+            'region': tuple(map(float, region)) if region else None,
+            'text': entry.get('text'),
+        })
+    return bubbles
+
+
+def load_project_bubbles(path):
+    """Bubbles of a drawing from a placer project file, as from load_sidecar"""
+    state = ProjectFile(path).load()
+    bubbles = []
+    for bubble_id, page, x, y in state.rows():
+        region = state.region(bubble_id)
+        bubbles.append({
+            'page': page,
+            'x': x,
+            'y': y,
+            'region': region[0] if region else None,
+            'text': state.texts.get(bubble_id),
+        })
+    return bubbles
+
+
+def save_sidecar(path, bubbles, source_pdf=None):
+    """Write bubbles (as from load_sidecar) to a JSON sidecar"""
+    data = {'source': os.path.basename(source_pdf) if source_pdf else None,
+            'bubbles': [{key: bubble[key] for key in ('page', 'x', 'y', 'region', 'text')}
+                        for bubble in bubbles]}
+    with open(path, 'w', encoding='utf-8') as file:
+        json.dump(data, file, indent=1, ensure_ascii=False)
+
+
+# -- worker side ---------------------------------------------------------------
+
+_docs = OrderedDict()    # pdf_path -> (fitz Document, TextLayerIndex)
+_MAX_OPEN_DOCS = 4
+
+
+def _open_doc(pdf_path):
+    entry = _docs.get(pdf_path)
+    if entry is None:
+        document = fitz.open(pdf_path)
+        entry = _docs[pdf_path] = (document, TextLayerIndex(document))
+        while len(_docs) > _MAX_OPEN_DOCS:
+            _docs.popitem(last=False)[1][0].close()
+    else:
+        _docs.move_to_end(pdf_path)
+    return entry
+
+
+def _page_job(pdf_path, page_number, regions, detect, dpi, preprocess=None, ocr_threads=1):
+    """
+    Work for one page: detect its features and/or read the text of its
+    regions
+
+    Args:
+        regions: [(bubble_index, rect), ...] that still need text
+        detect: scan the page for characteristics
+        preprocess: OCR preprocessing stages for the regions
+        ocr_threads: regions of the page recognised in parallel
+
+    Returns:
+        tuple: (pdf_path, page_number, features, {bubble_index: (text,
+        source)}, error); errors come back as text since not every OCR
+        exception survives pickling
+    """
+    document, text_index = _open_doc(pdf_path)
+    features, error = [], None
+    if detect:
+        try:
+            features = scan_page(document[page_number], page_number, dpi)
+        except Exception as e:
+            error = f'{type(e).__name__}: {e}'
+    texts = {}
+    ocr_indexes, images = [], []
+    for index, rect in regions:
+        text = text_index.text_in(page_number, rect)
+        if is_usable_text(text):
+            texts[index] = (text, 'text')
+            continue
+        try:
+            images.append(render_region(document[page_number], rect, dpi))
+            ocr_indexes.append(index)
+        except Exception as e:
+            texts[index] = ('', f'error: {type(e).__name__}: {e}')
+    if images:
+        # One batch per page through the process's warm OCR threads
+        from ocr_module import process_images
+        results = process_images(images, max_workers=ocr_threads, preprocess=preprocess)
+        for index, result in zip(ocr_indexes, results):
+            if result.error is None:
+                texts[index] = (result.text, 'ocr')
+            else:
+                texts[index] = ('', f'error: {type(result.error).__name__}: {result.error}')
+    return pdf_path, page_number, features, texts, error
+
+
+# -- main side -----------------------------------------------------------------
+
+class _FileJob:
+    """Per drawing state while its pages are being processed"""
+
+    def __init__(self, pdf_path, bubbles, detect, page_sizes):
+        self.pdf_path = pdf_path
+        self.bubbles = bubbles    # sidecar bubbles, [] when detecting
+        self.detect = detect
+        self.page_sizes = page_sizes
+        self.features = []
+        self.sources = {}         # bubble index -> 'text', 'ocr' or 'saved'
+        self.pending = 0
+        self.start = time.perf_counter()
+
+    def page_jobs(self, reocr=False):
+        regions = {}
+        for index, bubble in enumerate(self.bubbles):
+            if bubble['text'] and (not reocr or bubble['region'] is None):
+                self.sources[index] = 'saved'
+                continue
+            if bubble['region'] is None:
+                continue
+            regions.setdefault(bubble['page'], []).append((index, bubble['region']))
+        pages = range(len(self.page_sizes)) if self.detect else sorted(regions)
+        return [(page, regions.get(page, [])) for page in pages]
+
+    def add_result(self, features, texts):
+        self.features.extend(features)
+        for index, (text, source) in texts.items():
+            self.bubbles[index]['text'] = text
+            self.sources[index] = source
+
+    def finish_detection(self):
+        if not self.detect:
+            return
+        existing = {}
+        for bubble in self.bubbles:
+            existing.setdefault(bubble['page'], []).append((bubble['x'], bubble['y']))
+        for proposal in propose_bubbles(self.features, self.page_sizes, existing):
+            feature = proposal.feature
+            self.sources[len(self.bubbles)] = feature.source
+            self.bubbles.append({'page': proposal.page, 'x': proposal.x, 'y': proposal.y,
+                                 'region': tuple(feature.rect), 'text': feature.text})
+
+
+def write_outputs(job, output_dir):
+    """Ballooned PDF, characteristics CSV and (when detected) sidecar of a job"""
+    stem = os.path.splitext(os.path.basename(job.pdf_path))[0]
+    store = BubbleStore()
+    order = sorted(range(len(job.bubbles)), key=lambda i: job.bubbles[i]['page'])
+    for index in order:
+        bubble = job.bubbles[index]
+        store.add(bubble['page'], bubble['x'], bubble['y'])
+    export_bubbles(job.pdf_path, os.path.join(output_dir, f'{stem}_ballooned.pdf'), store)
+
+    with open(os.path.join(output_dir, f'{stem}_characteristics.csv'), 'w',
+              newline='', encoding='utf-8') as file:
+        writer = csv.writer(file)
+        writer.writerow(TABLE_COLUMNS)
+        for number, index in enumerate(order, 1):
+            bubble = job.bubbles[index]
+            writer.writerow([number, bubble['page'] + 1, f"{bubble['x']:.2f}",
+                             f"{bubble['y']:.2f}", bubble['text'] or '',
+                             job.sources.get(index, '')])
+    if job.detect:
+        save_sidecar(os.path.join(output_dir, stem + SIDECAR_SUFFIX),
+                     [job.bubbles[i] for i in order], job.pdf_path)
+
+
+def index_job(job, index):
+    """Add a finished drawing's text layer and bubble text to a SearchIndex"""
+    index.index_pdf(job.pdf_path)
+    rows = []
+    for bubble in job.bubbles:
+        rect = bubble['region']
+        if rect is None:
+            x, y = bubble['x'], bubble['y']
+            rect = (x - BUBBLE_BOX, y - BUBBLE_BOX, x + BUBBLE_BOX, y + BUBBLE_BOX)
+        rows.append((None, bubble['page'], rect, bubble['text']))
+    index.set_bubbles(job.pdf_path, rows)
+
+
+def find_pdfs(inputs):
+    pdfs = []
+    for path in inputs:
+        if os.path.isdir(path):
+            pdfs.extend(sorted(glob.glob(os.path.join(path, '*.pdf'))))
+        else:
+            pdfs.append(path)
+    return pdfs
+
+
+def run_batch(pdfs, output_dir, auto=False, workers=None, dpi=DEFAULT_OCR_DPI,
+              reocr=False, preprocess=None, index=None, log=print):
+    """
+    Balloon a list of drawings
+
+    Page jobs of all files go into one process pool, so a single large
+    package and a directory of small drawings both keep every core busy.
+    A file's outputs are written as soon as its last page is done.
+
+    Args:
+        pdfs: PDF paths
+        output_dir: where ballooned PDFs and tables go
+        auto: detect bubbles for drawings without a project or sidecar
+        workers: worker processes, default number of cores
+        dpi: OCR resolution
+        reocr: read region text again even when the project/sidecar has it
+        preprocess: OCR preprocessing stages for regions, e.g.
+            'border,contrast,upscale'
+        index: SearchIndex that finished drawings are added to
+        log: callable taking a progress line
+
+    Returns:
+        dict: 'files', 'failed', 'pages', 'bubbles', 'page_errors',
+        'seconds', 'pages_per_second'
+    """
+    start = time.perf_counter()
+    os.makedirs(output_dir, exist_ok=True)
+    jobs = {}
+    failed = []
+    for pdf_path in pdfs:
+        project, sidecar = project_path(pdf_path), sidecar_path(pdf_path)
+        try:
+            with fitz.open(pdf_path) as doc:
+                page_sizes = {i: (page.rect.width, page.rect.height)
+                              for i, page in enumerate(doc)}
+            if os.path.exists(project):
+                jobs[pdf_path] = _FileJob(pdf_path, load_project_bubbles(project), False,
+                                          page_sizes)
+            elif os.path.exists(sidecar):
+                jobs[pdf_path] = _FileJob(pdf_path, load_sidecar(sidecar), False, page_sizes)
+            elif auto:
+                jobs[pdf_path] = _FileJob(pdf_path, [], True, page_sizes)
+            else:
+                log(f'skip   {pdf_path}: no project or {SIDECAR_SUFFIX} sidecar (use --auto)')
+        except Exception as e:
+            failed.append(pdf_path)
+            log(f'failed {pdf_path}: {e}')
+
+    totals = {'pages': 0, 'bubbles': 0, 'page_errors': 0}
+
+    def finish(job):
+        try:
+            job.finish_detection()
+            write_outputs(job, output_dir)
+        except Exception as e:
+            failed.append(job.pdf_path)
+            log(f'failed {job.pdf_path}: {e}')
+            return
+        if index is not None:
+            try:
+                index_job(job, index)
+            except Exception as e:
+                log(f'index  {job.pdf_path}: {e}')
+        seconds = time.perf_counter() - job.start
+        pages = len(job.page_sizes)
+        totals['pages'] += pages
+        totals['bubbles'] += len(job.bubbles)
+        elapsed = time.perf_counter() - start
+        log(f'done   {job.pdf_path}: {pages} pages, {len(job.bubbles)} bubbles, '
+            f'{seconds:.1f} s  [{len(done)}/{len(jobs)} files, '
+            f'{totals["pages"] / elapsed:.1f} pages/s]')
+
+    done = []
+    if workers is None:
+        workers = os.cpu_count() or 1
+    # Spare cores (fewer workers than cores) go to OCR threads in each worker
+    ocr_threads = max(1, (os.cpu_count() or 1) // max(1, workers))
+    with ProcessPoolExecutor(max_workers=max(1, workers)) as pool:
+        futures = {}
+        for pdf_path, job in jobs.items():
+            page_jobs = job.page_jobs(reocr)
+            job.pending = len(page_jobs)
+            if not page_jobs:
+                done.append(job)
+                finish(job)
+            for page_number, regions in page_jobs:
+                future = pool.submit(_page_job, pdf_path, page_number, regions,
+                                     job.detect, dpi, preprocess, ocr_threads)
+                futures[future] = (pdf_path, page_number)
+        for future in as_completed(futures):
+            pdf_path, page_number = futures[future]
+            job = jobs[pdf_path]
+            try:
+                _, _, features, texts, error = future.result()
+                job.add_result(features, texts)
+            except Exception as e:
+                error = str(e)
+            if error:
+                totals['page_errors'] += 1
+                log(f'page   {pdf_path} p{page_number + 1}: {error}')
+            job.pending -= 1
+            if not job.pending:
+                done.append(job)
+                finish(job)
+
+    seconds = time.perf_counter() - start
+    return {
+        'files': len(done),
+        'failed': len(failed),
+        'pages': totals['pages'],
+        'bubbles': totals['bubbles'],
+        'page_errors': totals['page_errors'],
+        'seconds': seconds,
+        'pages_per_second': totals['pages'] / seconds if seconds else 0.0,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[1])
+    parser.add_argument('inputs', nargs='+', help='PDF files or directories of PDFs')
+    parser.add_argument('-o', '--output-dir', required=True)
+    parser.add_argument('--auto', action='store_true',
+                        help='detect bubbles for drawings without a project or sidecar')
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--dpi', type=int, default=DEFAULT_OCR_DPI)
+    parser.add_argument('--reocr', action='store_true',
+                        help='read region text again even when the project/sidecar has it')
+    parser.add_argument('--preprocess', default=None,
+                        help="OCR preprocessing stages, e.g. 'border,contrast,upscale,binarize'")
+    parser.add_argument('--tesseract', default=None, metavar='CMD',
+                        help='tesseract executable (default $FAI_TESSERACT or PATH)')
+    parser.add_argument('--tessdata', default=None, metavar='DIR',
+                        help='tessdata directory (default $FAI_TESSDATA or next to tesseract)')
+    parser.add_argument('--index', default=None, metavar='SEARCH_DB',
+                        help='add the drawings and their bubble text to this search index')
+    args = parser.parse_args(argv)
+
+    pdfs = find_pdfs(args.inputs)
+    if args.tesseract or args.tessdata:
+        # Exported to the environment, so the worker processes use it too
+        from ocr_module import configure_tesseract
+        configure_tesseract(args.tesseract, args.tessdata)
+    if args.preprocess:
+        from preprocess import parse_stages
+        try:
+            parse_stages(args.preprocess)
+        except ValueError as e:
+            parser.error(str(e))
+    index = SearchIndex(args.index) if args.index else None
+    try:
+        stats = run_batch(pdfs, args.output_dir, args.auto, args.workers, args.dpi, args.reocr,
+                          args.preprocess, index)
+    finally:
+        if index is not None:
+            index.close()
+    print(f"{stats['files']} files, {stats['pages']} pages, {stats['bubbles']} bubbles "
+          f"in {stats['seconds']:.1f} s ({stats['pages_per_second']:.1f} pages/s), "
+          f"{stats['failed']} failed, {stats['page_errors']} page errors")
+    return 1 if stats['failed'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
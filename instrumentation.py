@@ -0,0 +1,242 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 20:14:52 2026
+
+@author: hendrik
+
+Named timers and counters for the hot paths (page rendering, painting,
+OCR, export), plus an optional profiler capture.
+
+    with timed('render.page'):
+        ...
+    count('paint.tiles', len(tiles))
+
+Timers keep count/total/min/max/last per name, thread-safe, so worker
+threads report into the same registry as the GUI. Recording costs two
+perf_counter calls and a lock; set FAI_INSTRUMENT=0 to switch it off.
+Only this process is measured: work done in worker processes (prefetch,
+document pipeline) is reported by whoever collects their results.
+"""
+
+import csv
+import io
+import json
+import os
+import threading
+import time
+
+enabled = os.environ.get('FAI_INSTRUMENT', '1') != '0'
+
+_lock = threading.Lock()
+_timers = {}      # name -> [count, total, min, max, last] in seconds
+_counters = {}    # name -> int
+_gauges = {}      # name -> callable returning a number, read at snapshot time
+_started = time.time()
+
+
+def record(name, seconds):
+    """Add one timing to a named timer"""
+    if not enabled:
+        return
+    with _lock:
+        timer = _timers.get(name)
+        if timer is None:
+            _timers[name] = [1, seconds, seconds, seconds, seconds]
+            return
+        timer[0] += 1
+        timer[1] += seconds
+        if seconds < timer[2]:
+            timer[2] = seconds
+        if seconds > timer[3]:
+            timer[3] = seconds
+        timer[4] = seconds
+
+
+def count(name, n=1):
+    """Add n to a named counter"""
+    if not enabled:
+        return
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + n
+
+
+def gauge(name, func):
+    """Report func() under name in every snapshot (cache sizes, hit counts...)"""
+    with _lock:
+        _gauges[name] = func
+
+
+class timed:
+    """
+    Time a block, or every call of a function, into a named timer
+
+        with timed('export.save'):
+            doc.save(path)
+
+        @timed('ocr.job')
+        def run(...):
+    """
+    __slots__ = ('name', 'start')
+
+    def __init__(self, name):
+        self.name = name
+        self.start = None
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        record(self.name, time.perf_counter() - self.start)
+        return False
+
+    def __call__(self, func):
+        name = self.name
+
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                record(name, time.perf_counter() - start)
+        wrapper.__name__ = func.__name__
+        wrapper.__doc__ = func.__doc__
+        wrapper.__wrapped__ = func
+        return wrapper
+
+
+def snapshot():
+    """
+    Current values
+
+    Returns:
+        dict: {'timers': {name: {'count', 'total_ms', 'mean_ms', 'min_ms',
+        'max_ms', 'last_ms'}}, 'counters': {name: n}, 'gauges': {name: value},
+        'uptime_s': seconds since start or the last reset}
+    """
+    with _lock:
+        timers = {name: list(values) for name, values in _timers.items()}
+        counters = dict(_counters)
+        gauges = dict(_gauges)
+        started = _started
+    gauge_values = {}
+    for name, func in gauges.items():
+        try:
+            gauge_values[name] = func()
+        except Exception:
+            gauge_values[name] = None
+    return {
+        'timers': {name: {'count': n, 'total_ms': total * 1000,
+                          'mean_ms': total * 1000 / n, 'min_ms': low * 1000,
+                          'max_ms': high * 1000, 'last_ms': last * 1000}
+                   for name, (n, total, low, high, last) in sorted(timers.items())},
+        'counters': dict(sorted(counters.items())),
+        'gauges': dict(sorted(gauge_values.items())),
+        'uptime_s': time.time() - started,
+    }
+
+
+def reset():
+    """Clear timers and counters (gauges stay registered)"""
+    global _started
+    with _lock:
+        _timers.clear()
+        _counters.clear()
+        _started = time.time()
+
+
+CSV_COLUMNS = ('kind', 'name', 'count', 'total_ms', 'mean_ms', 'min_ms', 'max_ms',
+               'last_ms', 'value')
+
+
+def to_csv(data=None):
+    """A snapshot as CSV text, one row per timer, counter and gauge"""
+    data = data or snapshot()
+    out = io.StringIO()
+    writer = csv.writer(out, lineterminator='\n')
+    writer.writerow(CSV_COLUMNS)
+    for name, timer in data['timers'].items():
+        writer.writerow(['timer', name, timer['count']]
+                        + [f'{timer[key]:.3f}' for key in CSV_COLUMNS[3:8]] + [''])
+    for kind in ('counters', 'gauges'):
+        for name, value in data[kind].items():
+            writer.writerow([kind[:-1], name] + [''] * 6 + [value])
+    return out.getvalue()
+
+
+def dump(path, data=None):
+    """Write a snapshot to path, CSV for a .csv file and JSON otherwise"""
+    data = data or snapshot()
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        if path.lower().endswith('.csv'):
+            f.write(to_csv(data))
+        else:
+            json.dump(data, f, indent=2)
+
+
+def profilers():
+    """Profiler engines available here, cProfile first"""
+    engines = ['cProfile']
+    try:
+        import pyinstrument  # noqa: F401
+        engines.append('pyinstrument')
+    except ImportError:
+        pass
+    return engines
+
+
+class ProfileCapture:
+    """
+    Profile the calling thread between start() and stop()
+
+    cProfile records every call (exact, slower); pyinstrument samples
+    (low overhead, readable call tree) when it is installed. Captures are
+    saved as .prof (pstats, snakeviz) or .html respectively.
+    """
+
+    def __init__(self, engine='cProfile'):
+        if engine not in profilers():
+            raise ValueError(f'Profiler {engine!r} is not available')
+        self.engine = engine
+        self._profiler = None
+        self.running = False
+
+    @property
+    def suffix(self):
+        return '.prof' if self.engine == 'cProfile' else '.html'
+
+    def start(self):
+        if self.engine == 'cProfile':
+            import cProfile
+            self._profiler = cProfile.Profile()
+            self._profiler.enable()
+        else:
+            from pyinstrument import Profiler
+            self._profiler = Profiler()
+            self._profiler.start()
+        self.running = True
+
+    def stop(self):
+        if not self.running:
+            return
+        if self.engine == 'cProfile':
+            self._profiler.disable()
+        else:
+            self._profiler.stop()
+        self.running = False
+
+    def summary(self, limit=25):
+        """Text report of the capture"""
+        if self.engine == 'cProfile':
+            import pstats
+            out = io.StringIO()
+            pstats.Stats(self._profiler, stream=out).sort_stats('cumulative').print_stats(limit)
+            return out.getvalue()
+        return self._profiler.output_text()
+
+    def save(self, path):
+        if self.engine == 'cProfile':
+            self._profiler.dump_stats(path)
+        else:
+            with open(path, 'w', encoding='utf-8') as f:
+                f.write(self._profiler.output_html())
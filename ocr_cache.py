@@ -0,0 +1,155 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 10:41:55 2026
+
+@author: hendrik
+"""
+
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+
+class OCRCache:
+    """
+    Content-addressed cache of OCR results.
+
+    Keys are a hash of the preprocessed pixel buffer plus the OCR config, so
+    a redrawn selection or an unchanged callout on a new revision hits the
+    cache no matter where it sits on the page. There is an in-memory LRU tier
+    and an optional SQLite tier on disk, which is trimmed by least recent use
+    once it grows past max_db_bytes. Safe to use from the OCR worker threads.
+    """
+
+    def __init__(self, max_entries=4096, db_path=None, max_db_bytes=64 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_db_bytes = max_db_bytes
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+        self._db_bytes = 0
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.miss_seconds = 0.0
+        if db_path:
+            self._open_db(db_path)
+
+    @staticmethod
+    def make_key(image, config=''):
+        """
+        Hash a preprocessed image and the OCR config
+
+        Args:
+            image: PIL Image object, as it will be handed to the engine
+            config: everything else that changes the OCR output
+                (backend, language, tesseract options)
+
+        Returns:
+            str: hex digest
+        """
+        h = hashlib.blake2b(digest_size=20)
+        h.update(f'{image.mode}|{image.width}x{image.height}|{config}|'.encode())
+        h.update(image.tobytes())
+        return h.hexdigest()
+
+    def _open_db(self, db_path):
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._db = sqlite3.connect(db_path, check_same_thread=False)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute('PRAGMA synchronous=NORMAL')
+        self._db.execute(
+            'CREATE TABLE IF NOT EXISTS ocr_cache ('
+            ' key TEXT PRIMARY KEY, text TEXT NOT NULL,'
+            ' size INTEGER NOT NULL, last_used REAL NOT NULL)')
+        self._db.execute('CREATE INDEX IF NOT EXISTS ocr_cache_last_used ON ocr_cache(last_used)')
+        self._db.commit()
+        self._db_bytes = self._db.execute('SELECT COALESCE(SUM(size), 0) FROM ocr_cache').fetchone()[0]
+
+    def get(self, key):
+        """Return the cached text for key, or None"""
+        with self._lock:
+            text = self._memory.get(key)
+            if text is not None:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                return text
+            if self._db is not None:
+                row = self._db.execute('SELECT text FROM ocr_cache WHERE key = ?', (key,)).fetchone()
+                if row is not None:
+                    self._db.execute('UPDATE ocr_cache SET last_used = ? WHERE key = ?',
+                                     (time.time(), key))
+                    self._db.commit()
+                    self._remember(key, row[0])
+                    self.hits += 1
+                    self.disk_hits += 1
+                    return row[0]
+            self.misses += 1
+            return None
+
+    def put(self, key, text, seconds=0.0):
+        """Store text for key; seconds is the OCR time the entry saves on a hit"""
+        with self._lock:
+            self.miss_seconds += seconds
+            self._remember(key, text)
+            if self._db is not None:
+                size = len(key) + len(text.encode('utf-8'))
+                old = self._db.execute('SELECT size FROM ocr_cache WHERE key = ?', (key,)).fetchone()
+                self._db.execute('INSERT OR REPLACE INTO ocr_cache (key, text, size, last_used) '
+                                 'VALUES (?, ?, ?, ?)', (key, text, size, time.time()))
+                self._db_bytes += size - (old[0] if old else 0)
+                if self._db_bytes > self.max_db_bytes:
+                    self._evict_db()
+                self._db.commit()
+
+    def _remember(self, key, text):
+        self._memory[key] = text
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def _evict_db(self):
+        """Drop least recently used rows until the tier is back under 90 % of its budget"""
+        target = self.max_db_bytes * 0.9
+        rows = self._db.execute('SELECT key, size FROM ocr_cache ORDER BY last_used')
+        doomed = []
+        for key, size in rows:
+            if self._db_bytes <= target:
+                break
+            doomed.append((key,))
+            self._db_bytes -= size
+        self._db.executemany('DELETE FROM ocr_cache WHERE key = ?', doomed)
+
+    def stats(self):
+        """Hit/miss counters and the estimated OCR time saved by hits"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            avg_miss = self.miss_seconds / self.misses if self.misses else 0.0
+            return {
+                'hits': self.hits,
+                'disk_hits': self.disk_hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'memory_entries': len(self._memory),
+                'disk_bytes': self._db_bytes,
+                'seconds_saved': self.hits * avg_miss,
+            }
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            if self._db is not None:
+                self._db.execute('DELETE FROM ocr_cache')
+                self._db.commit()
+                self._db_bytes = 0
+
+    def close(self):
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
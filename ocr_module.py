@@ -5,61 +5,474 @@ Created on Sun Feb  9 13:29:04 2025
 @author: hendrik
 """
 
+import os
+import shlex
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
 import pytesseract
-from PIL import Image
-import numpy as np
 
-pytesseract.pytesseract.tesseract_cmd = r'C:\Program Files\Tesseract-OCR\tesseract.exe'
+import instrumentation
+from ocr_cache import OCRCache
+from preprocess import get_preprocessor
+
+# Where the Windows installer puts tesseract; elsewhere it is found on PATH
+WINDOWS_TESSERACT = r'C:\Program Files\Tesseract-OCR\tesseract.exe'
+# Environment overrides for the tesseract executable and its tessdata
+# directory; configure_tesseract sets them so worker processes inherit them
+TESSERACT_ENV = 'FAI_TESSERACT'
+TESSDATA_ENV = 'FAI_TESSDATA'
+
+# tessdata used by the in-process engine, None for its built-in default
+TESSDATA_PATH = None
+
+
+def configure_tesseract(cmd=None, tessdata=None):
+    """
+    Choose the tesseract executable and tessdata directory
+
+    Args:
+        cmd: tesseract executable; default $FAI_TESSERACT, else the
+            standard Windows install when it exists, else 'tesseract'
+            from PATH
+        tessdata: tessdata directory for the in-process engine; default
+            $FAI_TESSDATA, else the one next to cmd when there is one
+
+    Returns:
+        tuple: (cmd, tessdata) in use
+    """
+    global TESSDATA_PATH
+    if cmd:
+        os.environ[TESSERACT_ENV] = cmd
+    if tessdata:
+        os.environ[TESSDATA_ENV] = tessdata
+    cmd = os.environ.get(TESSERACT_ENV)
+    if not cmd:
+        cmd = WINDOWS_TESSERACT if os.path.isfile(WINDOWS_TESSERACT) else 'tesseract'
+    tessdata = os.environ.get(TESSDATA_ENV)
+    if not tessdata and os.path.dirname(cmd):
+        tessdata = os.path.join(os.path.dirname(cmd), 'tessdata')
+    pytesseract.pytesseract.tesseract_cmd = cmd
+    TESSDATA_PATH = tessdata
+    if _backend is not None:
+        # The in-process engine loaded the old tessdata
+        set_backend(None)
+    return cmd, tessdata
+
+DEFAULT_LANG = 'eng'
+
+
+class OCRBackend:
+    """Base class for OCR engines used by process_image"""
+    name = 'base'
+    lang = DEFAULT_LANG
+
+    def image_to_string(self, image, config=''):
+        raise NotImplementedError
+
+    def image_to_lines(self, image, config=''):
+        """
+        Recognise text with layout
+
+        Returns:
+            list of (text, (x0, y0, x1, y1), confidence) per text line,
+            box in image pixels and confidence 0-100
+        """
+        raise NotImplementedError
+
+    def warm_up(self):
+        """Load whatever the calling thread needs before its first call"""
+
+    def close(self):
+        pass
+
+
+class PytesseractBackend(OCRBackend):
+    """
+    Runs the tesseract executable through pytesseract.
+
+    Every call spawns a new tesseract process and reloads the language model,
+    so this is the slow path. It is always available and used as fallback.
+    """
+    name = 'pytesseract'
+
+    def __init__(self, lang=DEFAULT_LANG):
+        self.lang = lang
+
+    def image_to_string(self, image, config=''):
+        return pytesseract.image_to_string(image, lang=self.lang, config=config)
+
+    def image_to_lines(self, image, config=''):
+        data = pytesseract.image_to_data(image, lang=self.lang, config=config,
+                                         output_type=pytesseract.Output.DICT)
+        lines = {}
+        for i, word in enumerate(data['text']):
+            conf = float(data['conf'][i])
+            if not word.strip() or conf < 0:
+                continue
+            key = (data['block_num'][i], data['par_num'][i], data['line_num'][i])
+            x0, y0 = data['left'][i], data['top'][i]
+            x1, y1 = x0 + data['width'][i], y0 + data['height'][i]
+            line = lines.setdefault(key, [[], [x0, y0, x1, y1], []])
+            line[0].append(word)
+            box = line[1]
+            box[0], box[1] = min(box[0], x0), min(box[1], y0)
+            box[2], box[3] = max(box[2], x1), max(box[3], y1)
+            line[2].append(conf)
+        return [(' '.join(words), tuple(box), sum(confs) / len(confs))
+                for words, box, confs in lines.values()]
 
-def process_image(image):
+
+class TesserocrBackend(OCRBackend):
+    """
+    Keeps libtesseract loaded in-process through tesserocr.
+
+    The language model is loaded once per thread and reused for every call.
+    TessBaseAPI isn't thread safe, so each thread gets its own warm engine;
+    engines of threads that have exited are freed when the next one is
+    created.
+    """
+    name = 'tesserocr'
+
+    def __init__(self, lang=DEFAULT_LANG, path=None):
+        import tesserocr
+        self._tesserocr = tesserocr
+        self.lang = lang
+        if path is None and TESSDATA_PATH and os.path.isdir(TESSDATA_PATH):
+            path = TESSDATA_PATH
+        self.path = path
+        self._local = threading.local()
+        self._apis = []          # (thread, engine)
+        self._lock = threading.Lock()
+        # Fail early (e.g. missing tessdata) so get_backend can fall back
+        self._api()
+
+    def _api(self):
+        api = getattr(self._local, 'api', None)
+        if api is None:
+            kwargs = {'lang': self.lang}
+            if self.path:
+                kwargs['path'] = self.path
+            api = self._tesserocr.PyTessBaseAPI(**kwargs)
+            self._local.api = api
+            with self._lock:
+                live = []
+                for thread, old in self._apis:
+                    if thread.is_alive():
+                        live.append((thread, old))
+                    else:
+                        old.End()
+                live.append((threading.current_thread(), api))
+                self._apis = live
+        return api
+
+    def warm_up(self):
+        self._api()
+
+    def _apply_config(self, api, config):
+        """Translate the pytesseract style config string (--psm N, -c k=v)"""
+        args = shlex.split(config)
+        i = 0
+        while i < len(args):
+            if args[i] == '--psm' and i + 1 < len(args):
+                api.SetPageSegMode(int(args[i + 1]))
+                i += 1
+            elif args[i] == '-c' and i + 1 < len(args):
+                key, _, value = args[i + 1].partition('=')
+                api.SetVariable(key, value)
+                i += 1
+            i += 1
+
+    def _configured_api(self, config):
+        api = self._api()
+        if getattr(self._local, 'config', '') != config:
+            api.SetPageSegMode(self._tesserocr.PSM.AUTO)
+            self._apply_config(api, config)
+            self._local.config = config
+        return api
+
+    def image_to_string(self, image, config=''):
+        api = self._configured_api(config)
+        api.SetImage(image)
+        return api.GetUTF8Text()
+
+    def image_to_lines(self, image, config=''):
+        level = self._tesserocr.RIL.TEXTLINE
+        api = self._configured_api(config)
+        api.SetImage(image)
+        api.Recognize()
+        lines = []
+        for result in self._tesserocr.iterate_level(api.GetIterator(), level):
+            text = result.GetUTF8Text(level)
+            box = result.BoundingBox(level)
+            if text and text.strip() and box:
+                lines.append((text.strip(), tuple(box), result.Confidence(level)))
+        return lines
+
+    def close(self):
+        with self._lock:
+            for _, api in self._apis:
+                api.End()
+            self._apis.clear()
+        self._local = threading.local()
+
+
+BACKENDS = {
+    TesserocrBackend.name: TesserocrBackend,
+    PytesseractBackend.name: PytesseractBackend,
+}
+
+_backend = None
+_backend_lock = threading.Lock()
+
+configure_tesseract()
+
+
+_cache = OCRCache()
+
+
+def get_cache():
+    """Return the shared OCR result cache"""
+    return _cache
+
+
+def configure_cache(max_entries=4096, db_path=None, max_db_bytes=64 * 1024 * 1024):
+    """
+    Replace the shared OCR result cache
+    
+    Args:
+        max_entries: size of the in-memory LRU tier
+        db_path: SQLite file for the on-disk tier, None for memory only
+        max_db_bytes: on-disk tier budget, least recently used rows are
+            evicted beyond it
+        
+    Returns:
+        OCRCache: the new cache
+    """
+    global _cache
+    old, _cache = _cache, OCRCache(max_entries, db_path, max_db_bytes)
+    old.close()
+    return _cache
+
+
+def cache_stats():
+    return _cache.stats()
+
+
+def _recognize(backend, image, config, use_cache):
+    """OCR an already preprocessed image through the cache"""
+    if not use_cache:
+        with instrumentation.timed('ocr.tesseract'):
+            return backend.image_to_string(image, config).strip()
+    cache = _cache
+    key = cache.make_key(image, f'{backend.name}:{backend.lang}|{config}')
+    text = cache.get(key)
+    if text is None:
+        instrumentation.count('ocr.cache_misses')
+        start = time.perf_counter()
+        text = backend.image_to_string(image, config).strip()
+        seconds = time.perf_counter() - start
+        instrumentation.record('ocr.tesseract', seconds)
+        cache.put(key, text, seconds)
+    else:
+        instrumentation.count('ocr.cache_hits')
+    return text
+
+
+def create_backend(name=None):
+    """
+    Create an OCR backend
+
+    Args:
+        name: backend name, or None to prefer the warm in-process engine
+            and fall back to pytesseract
+
+    Returns:
+        OCRBackend: the backend instance
+    """
+    if name is not None:
+        return BACKENDS[name]()
+    try:
+        return TesserocrBackend()
+    except Exception:
+        return PytesseractBackend()
+
+
+def get_backend():
+    """Return the shared OCR backend, created on first use"""
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                _backend = create_backend(os.environ.get('FAI_OCR_BACKEND') or None)
+    return _backend
+
+
+def set_backend(backend):
+    """Replace the shared OCR backend (name or OCRBackend instance)"""
+    global _backend
+    if isinstance(backend, str):
+        backend = create_backend(backend)
+    with _backend_lock:
+        old, _backend = _backend, backend
+    if old is not None and old is not backend:
+        old.close()
+    return backend
+
+def warm_up(preprocess=None):
+    """
+    Create the shared backend, load its engine on the calling thread and
+    build the preprocessing pipeline, so the first OCR job doesn't wait
+    for them
+
+    Args:
+        preprocess: stages the first jobs will likely use
+    """
+    get_backend().warm_up()
+    get_preprocessor(preprocess)
+
+
+def process_image(image, config='', use_cache=True, preprocess=None):
     """
     Process an image and return the OCR text
     
     Args:
         image: PIL Image object containing the region to process
+        config: extra tesseract options, e.g. '--psm 6'
+        use_cache: look the region up in the OCR result cache first
+        preprocess: preprocessing stages (see preprocess.parse_stages) or
+            a Preprocessor, default grayscale only
         
     Returns:
         str: Extracted text from the image
     """
     try:
-        # Preprocess image if needed
-        # Convert to grayscale
-        if image.mode != 'L':
-            image = image.convert('L')
-            image.show()
-            
-        # Optionally enhance image
-        # image = image.point(lambda x: 0 if x < 128 else 255)  # Threshold
-        
-        # Perform OCR
-        text = pytesseract.image_to_string(image)
-        
-        # Clean up text
-        text = text.strip()
+        with instrumentation.timed('ocr.preprocess'):
+            image = get_preprocessor(preprocess)(image)
         
-        print(text)
-        return text
+        # Perform OCR (cleaned up text, cached by pixel content)
+        return _recognize(get_backend(), image, config, use_cache)
     except Exception as e:
         raise Exception(f"OCR processing failed: {str(e)}")
 
-# Optional: Add more image preprocessing functions if needed
-def enhance_image(image):
+def process_image_lines(image, config='', min_confidence=30, preprocess=None):
     """
-    Enhance image for better OCR results
+    Recognise a whole page (or large region) keeping the layout
     
     Args:
         image: PIL Image object
+        config: extra tesseract options
+        min_confidence: drop lines tesseract is less sure about (0-100)
+        preprocess: preprocessing stages; keep them to ones that don't
+            move pixels (contrast, binarize) or the boxes won't match
         
     Returns:
-        PIL Image: Enhanced image
+        list of (text, (x0, y0, x1, y1), confidence), box in image pixels
     """
-    # Convert to numpy array
-    img_array = np.array(image)
+    with instrumentation.timed('ocr.preprocess'):
+        image = get_preprocessor(preprocess)(image)
+    with instrumentation.timed('ocr.tesseract_lines'):
+        lines = get_backend().image_to_lines(image, config)
+    return [line for line in lines if line[2] >= min_confidence]
+
+
+# Result of one region in a batch; seconds covers crop + OCR of that region
+OCRResult = namedtuple('OCRResult', ['text', 'seconds', 'error'])
+
+# Threads of process_images, kept for the life of the process so their
+# engines stay warm from one batch to the next
+_batch_pool = None
+_batch_pool_size = 0
+_batch_pool_lock = threading.Lock()
+
+
+def _batch_executor(max_workers):
+    """The shared batch pool, with at least max_workers threads"""
+    global _batch_pool, _batch_pool_size
+    with _batch_pool_lock:
+        if _batch_pool is None or _batch_pool_size < max_workers:
+            old = _batch_pool
+            _batch_pool_size = max(max_workers, os.cpu_count() or 1)
+            _batch_pool = ThreadPoolExecutor(max_workers=_batch_pool_size,
+                                             thread_name_prefix='ocr-batch')
+            if old is not None:
+                # Its threads exit when idle; their engines are freed then
+                old.shutdown(wait=False)
+        return _batch_pool
+
+
+def process_images(regions, page_image=None, config='', max_workers=None, use_cache=True,
+                   preprocess=None):
+    """
+    Process many regions in one pass and return their OCR results in order
     
-    # Apply various enhancements
-    # Example: Contrast stretching
-    p2, p98 = np.percentile(img_array, (2, 98))
-    img_array = np.interp(img_array, (p2, p98), (0, 255))
+    Args:
+        regions: list of PIL Image objects, or of (x0, y0, x1, y1) pixel
+            rects into page_image
+        page_image: PIL Image the rects refer to, converted to grayscale
+            once for the whole batch
+        config: extra tesseract options, applied to every region
+        max_workers: number of regions recognised in parallel
+            (default: number of cores); 1 runs on the calling thread
+        use_cache: look regions up in the OCR result cache first
+        preprocess: preprocessing stages applied to every region
+        
+    Returns:
+        list of OCRResult(text, seconds, error), one per region. A region
+        that fails has text '' and the exception in error, so one bad crop
+        doesn't lose the rest of the batch.
+    """
+    regions = list(regions)
+    if not regions:
+        return []
+
+    if page_image is not None and page_image.mode != 'L':
+        page_image = page_image.convert('L')
+    backend = get_backend()
+    preprocessor = get_preprocessor(preprocess)
+
+    def run(region):
+        start = time.perf_counter()
+        try:
+            if page_image is not None:
+                image = page_image.crop(tuple(int(round(v)) for v in region))
+            else:
+                image = region
+            image = preprocessor(image)
+            text = _recognize(backend, image, config, use_cache)
+            return OCRResult(text, time.perf_counter() - start, None)
+        except Exception as e:
+            return OCRResult('', time.perf_counter() - start, e)
+
+    if max_workers is None:
+        max_workers = os.cpu_count() or 1
+    max_workers = max(1, min(max_workers, len(regions)))
+    if max_workers == 1:
+        return [run(region) for region in regions]
+    # Both backends release the GIL while recognising (subprocess wait or
+    # libtesseract), and each pool thread keeps its own warm engine. The
+    # regions go out as max_workers interleaved chunks, so a smaller batch
+    # doesn't take every thread of the shared pool.
+    chunks = [range(i, len(regions), max_workers) for i in range(max_workers)]
+    futures = [_batch_executor(max_workers).submit(lambda chunk: [run(regions[i]) for i in chunk],
+                                                   chunk)
+               for chunk in chunks]
+    results = [None] * len(regions)
+    for chunk, future in zip(chunks, futures):
+        for i, result in zip(chunk, future.result()):
+            results[i] = result
+    return results
+
+def enhance_image(image):
+    """
+    Enhance image for better OCR results
     
-    # Convert back to PIL Image
-    return Image.fromarray(img_array.astype(np.uint8))
\ No newline at end of file
+    Args:
+        image: PIL Image object
+        
+    Returns:
+        PIL Image: grayscale image contrast stretched to its 2-98 percentiles
+    """
+    return get_preprocessor(('grayscale', 'contrast'))(image)
\ No newline at end of file
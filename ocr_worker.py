@@ -0,0 +1,219 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 09:12:40 2026
+
+@author: hendrik
+"""
+
+import itertools
+import multiprocessing
+import os
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from PyQt5.QtCore import QObject, pyqtSignal, pyqtSlot
+
+from instrumentation import timed
+from pdf_regions import RegionSource, render_source
+
+
+@timed('ocr.job')
+def _run_ocr(image, preprocess=None):
+    """Worker entry point, runs off the GUI thread"""
+    from ocr_module import process_image
+    return process_image(image, preprocess=preprocess)
+
+
+def _warm_up_renderer():
+    import fitz  # noqa: F401
+
+
+def _run_job(ocr_func, image, preprocess, renderer=None):
+    """
+    Worker entry point: render a RegionSource, then OCR it
+
+    MuPDF holds the GIL while it renders, so a region is rendered in the
+    renderer process when there is one; this thread just waits for it.
+    """
+    if isinstance(image, RegionSource):
+        with timed('render.region'):
+            if renderer is None:
+                image = render_source(image)
+            else:
+                image = renderer.submit(render_source, image).result()
+    if preprocess is None:
+        return ocr_func(image)
+    return ocr_func(image, preprocess)
+
+
+def _warm_up():
+    from ocr_module import warm_up
+    warm_up()
+
+
+class OCRWorkerPool(QObject):
+    """
+    Bounded background OCR pool for bubble regions.
+
+    Jobs are keyed by bubble ID. Submitting a new region for a bubble that
+    already has a job supersedes it, and cancelled jobs never reach the GUI.
+    At most ``max_workers`` jobs run at once; the rest wait in a queue of at
+    most ``max_pending`` entries. Results are delivered on the GUI thread
+    through ``result_ready``/``job_failed``.
+    """
+
+    result_ready = pyqtSignal(object, str)    # bubble_id, text
+    job_failed = pyqtSignal(object, str)      # bubble_id, error message
+    pending_changed = pyqtSignal(int)         # queued + running jobs
+
+    # Internal: emitted from worker threads, delivered queued on GUI thread
+    _job_finished = pyqtSignal(object, object, object, object)
+    _warmed_up = pyqtSignal()
+
+    def __init__(self, parent=None, max_workers=None, max_pending=256,
+                 ocr_func=None):
+        super().__init__(parent)
+        if max_workers is None:
+            max_workers = min(4, os.cpu_count() or 1)
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.ocr_func = ocr_func or _run_ocr
+        self._executor = ThreadPoolExecutor(max_workers=max_workers,
+                                            thread_name_prefix='ocr')
+        # Renders RegionSource jobs, started with the first of them; one
+        # process keeps the document open from one capture to the next
+        self._renderer = None
+        self._job_ids = itertools.count(1)
+        self._queue = OrderedDict()   # bubble_id -> (job_id, image, preprocess)
+        self._running = {}            # bubble_id -> job_id
+        self._futures = {}            # job_id -> Future
+        self._warming = None          # Future of warm_up, jobs wait for it
+        self._job_finished.connect(self._on_job_finished)
+        self._warmed_up.connect(self._dispatch)
+
+    def submit(self, bubble_id, image, preprocess=None):
+        """
+        Queue an image for OCR
+
+        Args:
+            bubble_id: ID of the bubble the result belongs to
+            image: PIL Image of the region, or a pdf_regions.RegionSource
+                rendered on the worker thread
+            preprocess: preprocessing stages for this job, passed on to
+                ocr_func; None for its default
+
+        Returns:
+            int: job ID, or None if the queue is full
+        """
+        self.cancel(bubble_id)
+        if len(self._queue) >= self.max_pending:
+            self.job_failed.emit(bubble_id, 'OCR queue is full')
+            return None
+
+        job_id = next(self._job_ids)
+        self._queue[bubble_id] = (job_id, image, preprocess)
+        self._dispatch()
+        self.pending_changed.emit(self.pending_count())
+        return job_id
+
+    def warm_up(self, func=None):
+        """
+        Run func on a worker ahead of the first job, e.g. to import the OCR
+        engine while the user is still opening a drawing, and start the
+        region renderer. Jobs submitted
+        meanwhile are held until it is done; its errors are ignored, the
+        jobs will report them.
+
+        Args:
+            func: callable, default loads ocr_module's backend
+        """
+        self._warming = self._executor.submit(func or _warm_up)
+        self._warming.add_done_callback(lambda f: self._warmed_up.emit())
+        self._start_renderer().submit(_warm_up_renderer)
+
+    def _start_renderer(self):
+        if self._renderer is None:
+            # Spawned, not forked: a fork while another thread holds an
+            # import lock (the warm-up importing fitz) deadlocks the child
+            self._renderer = ProcessPoolExecutor(
+                max_workers=1, mp_context=multiprocessing.get_context('spawn'))
+        return self._renderer
+
+    def cancel(self, bubble_id):
+        """Cancel any queued or running job for a bubble"""
+        cancelled = False
+        if bubble_id in self._queue:
+            del self._queue[bubble_id]
+            cancelled = True
+        job_id = self._running.pop(bubble_id, None)
+        if job_id is not None:
+            # A running tesseract call can't be interrupted; dropping it from
+            # _running makes its result be discarded when it arrives.
+            future = self._futures.get(job_id)
+            if future is not None:
+                future.cancel()
+            cancelled = True
+        if cancelled:
+            self.pending_changed.emit(self.pending_count())
+        return cancelled
+
+    def cancel_where(self, predicate):
+        """Cancel every job whose bubble ID matches predicate"""
+        bubble_ids = [b for b in list(self._queue) + list(self._running)
+                      if predicate(b)]
+        for bubble_id in bubble_ids:
+            self.cancel(bubble_id)
+        return len(bubble_ids)
+
+    def cancel_all(self):
+        return self.cancel_where(lambda bubble_id: True)
+
+    def pending_count(self):
+        return len(self._queue) + len(self._running)
+
+    def is_pending(self, bubble_id):
+        return bubble_id in self._queue or bubble_id in self._running
+
+    def shutdown(self, wait=False):
+        self._queue.clear()
+        self._running.clear()
+        self._executor.shutdown(wait=wait, cancel_futures=True)
+        if self._renderer is not None:
+            self._renderer.shutdown(wait=wait, cancel_futures=True)
+            self._renderer = None
+
+    @pyqtSlot()
+    def _dispatch(self):
+        if self._warming is not None:
+            if not self._warming.done():
+                return
+            self._warming = None
+        while self._queue and len(self._futures) < self.max_workers:
+            bubble_id, (job_id, image, preprocess) = self._queue.popitem(last=False)
+            self._running[bubble_id] = job_id
+            renderer = self._start_renderer() if isinstance(image, RegionSource) else None
+            future = self._executor.submit(_run_job, self.ocr_func, image, preprocess, renderer)
+            self._futures[job_id] = future
+            future.add_done_callback(
+                lambda f, b=bubble_id, j=job_id: self._emit_finished(b, j, f))
+
+    def _emit_finished(self, bubble_id, job_id, future):
+        # Called on the worker thread; hop back to the GUI thread.
+        if future.cancelled():
+            text, error = None, None
+        else:
+            error = future.exception()
+            text = None if error else future.result()
+        self._job_finished.emit(bubble_id, job_id, text, error)
+
+    @pyqtSlot(object, object, object, object)
+    def _on_job_finished(self, bubble_id, job_id, text, error):
+        self._futures.pop(job_id, None)
+        if self._running.get(bubble_id) == job_id:
+            del self._running[bubble_id]
+            if error is not None:
+                self.job_failed.emit(bubble_id, str(error))
+            elif text is not None:
+                self.result_ready.emit(bubble_id, text)
+        self._dispatch()
+        self.pending_changed.emit(self.pending_count())
@@ -0,0 +1,174 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 12:48:31 2026
+
+@author: hendrik
+"""
+
+import os
+import threading
+from collections import namedtuple
+
+# fitz and PIL are imported where they are used: the viewer imports this
+# module at startup and opens no document until the window is up
+
+# Resolution regions are rendered at for OCR; tesseract does best on
+# glyphs roughly 20-40 px tall, which small drawing text reaches at 300-400
+DEFAULT_OCR_DPI = 300
+
+
+def to_fitz_rect(rect):
+    """Accept a fitz.Rect, an (x0, y0, x1, y1) tuple or a QRectF in PDF points"""
+    import fitz  # PyMuPDF
+    if isinstance(rect, fitz.Rect):
+        return rect
+    if hasattr(rect, 'getCoords'):
+        return fitz.Rect(*rect.getCoords())
+    return fitz.Rect(rect)
+
+
+def render_region(page, rect, dpi=DEFAULT_OCR_DPI, grayscale=True):
+    """
+    Render part of a PDF page straight from its vector content
+
+    Args:
+        page: fitz Page
+        rect: region in PDF points (fitz.Rect, tuple or QRectF)
+        dpi: output resolution
+        grayscale: render a single channel 'L' image, which is what the
+            OCR engine wants anyway
+
+    Returns:
+        PIL Image: 'L' or 'RGB' image of the region
+    """
+    import fitz  # PyMuPDF
+    from PIL import Image
+    zoom = dpi / 72
+    colorspace = fitz.csGRAY if grayscale else fitz.csRGB
+    pix = page.get_pixmap(matrix=fitz.Matrix(zoom, zoom), clip=to_fitz_rect(rect),
+                          colorspace=colorspace, alpha=False)
+    mode = 'L' if pix.n == 1 else 'RGB'
+    # samples is the single copy out of MuPDF; frombuffer wraps it as is
+    return Image.frombuffer(mode, (pix.width, pix.height), pix.samples,
+                            'raw', mode, pix.stride, 1)
+
+
+# A region to be rendered where it is used, e.g. on an OCR worker thread
+# instead of the GUI thread; rect is (x0, y0, x1, y1) in PDF points
+RegionSource = namedtuple('RegionSource', ['pdf_path', 'page', 'rect', 'dpi'])
+
+_thread_docs = threading.local()
+
+
+def render_source(source):
+    """
+    Render a RegionSource with the calling thread's own copy of the
+    document, kept open for the next region of the same file
+
+    Returns:
+        PIL Image: 'L' image of the region
+    """
+    import fitz  # PyMuPDF
+    key = (source.pdf_path, os.stat(source.pdf_path).st_mtime_ns)
+    cached = getattr(_thread_docs, 'entry', None)
+    if cached is None or cached[0] != key:
+        if cached is not None:
+            cached[1].close()
+        cached = _thread_docs.entry = (key, fitz.open(source.pdf_path))
+    return render_region(cached[1][source.page], source.rect, source.dpi)
+
+
+def is_usable_text(text):
+    """Text layer output worth trusting over OCR"""
+    if not text or not text.strip():
+        return False
+    # U+FFFD means the font has no usable ToUnicode map, OCR does better
+    if '\ufffd' in text:
+        return False
+    return any(ch.isalnum() for ch in text)
+
+
+class TextLayerIndex:
+    """
+    Word boxes of a document's text layer, extracted once per page and
+    bucketed on a coarse grid so region lookups only touch nearby words.
+    """
+
+    def __init__(self, document, cell_size=72):
+        self.document = document
+        self.cell_size = cell_size
+        self._pages = {}    # page_number -> (words, grid)
+
+    def _page(self, page_number):
+        entry = self._pages.get(page_number)
+        if entry is None:
+            # (x0, y0, x1, y1, word, block_no, line_no, word_no)
+            words = self.document[page_number].get_text('words')
+            grid = {}
+            for i, word in enumerate(words):
+                for cell in self._cells(word[:4]):
+                    grid.setdefault(cell, []).append(i)
+            entry = self._pages[page_number] = (words, grid)
+        return entry
+
+    def _cells(self, rect):
+        x0, y0, x1, y1 = rect
+        size = self.cell_size
+        return [(cx, cy)
+                for cy in range(int(y0 // size), int(y1 // size) + 1)
+                for cx in range(int(x0 // size), int(x1 // size) + 1)]
+
+    def has_text(self, page_number):
+        return bool(self._page(page_number)[0])
+
+    def words(self, page_number):
+        """All word tuples of a page, as returned by page.get_text('words')"""
+        return self._page(page_number)[0]
+
+    def words_in(self, page_number, rect, min_overlap=0.5):
+        """
+        Words with at least min_overlap of their box inside rect
+
+        Args:
+            page_number: page index
+            rect: region in PDF points (fitz.Rect, tuple or QRectF)
+            min_overlap: fraction of the word box that must be inside
+
+        Returns:
+            list of word tuples as returned by page.get_text('words'),
+            in reading order
+        """
+        words, grid = self._page(page_number)
+        if not words:
+            return []
+        rx0, ry0, rx1, ry1 = to_fitz_rect(rect)
+        hits = set()
+        for cell in self._cells((rx0, ry0, rx1, ry1)):
+            hits.update(grid.get(cell, ()))
+        found = []
+        for i in hits:
+            x0, y0, x1, y1 = words[i][:4]
+            area = (x1 - x0) * (y1 - y0)
+            w = min(x1, rx1) - max(x0, rx0)
+            h = min(y1, ry1) - max(y0, ry0)
+            if w <= 0 or h <= 0:
+                continue
+            if area <= 0 or w * h >= min_overlap * area:
+                found.append(words[i])
+        found.sort(key=lambda word: word[5:8])
+        return found
+
+    def text_in(self, page_number, rect, min_overlap=0.5):
+        """Text of the words inside rect, one output line per text line"""
+        lines = []
+        last_line = None
+        for word in self.words_in(page_number, rect, min_overlap):
+            line = word[5:7]
+            if line != last_line:
+                lines.append([])
+                last_line = line
+            lines[-1].append(word[4])
+        return '\n'.join(' '.join(line) for line in lines)
+
+    def clear(self):
+        self._pages.clear()
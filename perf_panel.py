@@ -0,0 +1,129 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 20:31:17 2026
+
+@author: hendrik
+"""
+
+from PyQt5.QtCore import Qt, QTimer
+from PyQt5.QtWidgets import (QDockWidget, QWidget, QVBoxLayout, QHBoxLayout, QPushButton,
+                             QTableWidget, QTableWidgetItem, QHeaderView, QComboBox,
+                             QFileDialog, QMessageBox, QAbstractItemView)
+
+import instrumentation
+
+REFRESH_INTERVAL_MS = 1000
+
+
+class PerfPanel(QDockWidget):
+    """
+    Debug dock listing the instrumentation timers, counters and gauges.
+
+    Refreshes once a second while it is visible. Save writes the numbers
+    as JSON or CSV, and Profile captures a cProfile/pyinstrument run of
+    the GUI thread until it is pressed again.
+    """
+
+    COLUMNS = ('Name', 'Count', 'Total ms', 'Mean ms', 'Max ms', 'Last ms')
+
+    def __init__(self, parent=None):
+        super().__init__('Performance', parent)
+        self.setObjectName('performance_panel')
+        self.capture = None
+
+        widget = QWidget()
+        layout = QVBoxLayout()
+
+        self.table = QTableWidget(0, len(self.COLUMNS))
+        self.table.setHorizontalHeaderLabels(self.COLUMNS)
+        self.table.verticalHeader().setVisible(False)
+        self.table.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.table.horizontalHeader().setSectionResizeMode(0, QHeaderView.Stretch)
+        layout.addWidget(self.table)
+
+        buttons = QHBoxLayout()
+        reset_btn = QPushButton('Reset')
+        reset_btn.clicked.connect(self.reset)
+        buttons.addWidget(reset_btn)
+        save_btn = QPushButton('Save...')
+        save_btn.clicked.connect(self.save)
+        buttons.addWidget(save_btn)
+        self.profiler_combo = QComboBox()
+        self.profiler_combo.addItems(instrumentation.profilers())
+        buttons.addWidget(self.profiler_combo)
+        self.profile_btn = QPushButton('Profile')
+        self.profile_btn.setCheckable(True)
+        self.profile_btn.toggled.connect(self.toggle_profile)
+        buttons.addWidget(self.profile_btn)
+        layout.addLayout(buttons)
+
+        widget.setLayout(layout)
+        self.setWidget(widget)
+
+        self.refresh_timer = QTimer(self)
+        self.refresh_timer.timeout.connect(self.refresh)
+        self.visibilityChanged.connect(self.on_visibility_changed)
+
+    def on_visibility_changed(self, visible):
+        if visible:
+            self.refresh()
+            self.refresh_timer.start(REFRESH_INTERVAL_MS)
+        else:
+            self.refresh_timer.stop()
+
+    def refresh(self):
+        data = instrumentation.snapshot()
+        rows = [(name, timer['count'], timer['total_ms'], timer['mean_ms'],
+                 timer['max_ms'], timer['last_ms'])
+                for name, timer in data['timers'].items()]
+        rows += [(name, value) for name, value in data['counters'].items()]
+        rows += [(name, value) for name, value in data['gauges'].items()]
+        self.table.setRowCount(len(rows))
+        for row, values in enumerate(rows):
+            for col in range(len(self.COLUMNS)):
+                value = values[col] if col < len(values) else ''
+                if isinstance(value, float):
+                    value = f'{value:.2f}'
+                item = self.table.item(row, col)
+                if item is None:
+                    item = QTableWidgetItem()
+                    if col:
+                        item.setTextAlignment(Qt.AlignRight | Qt.AlignVCenter)
+                    self.table.setItem(row, col, item)
+                item.setText('' if value is None else str(value))
+
+    def reset(self):
+        instrumentation.reset()
+        self.refresh()
+
+    def save(self):
+        path, _ = QFileDialog.getSaveFileName(self, 'Save Timings', 'fai_timings.json',
+                                              'JSON (*.json);;CSV (*.csv)')
+        if not path:
+            return
+        try:
+            instrumentation.dump(path)
+        except Exception as e:
+            QMessageBox.critical(self, 'Error', f'Failed to save timings: {str(e)}')
+
+    def toggle_profile(self, checked):
+        if checked:
+            self.capture = instrumentation.ProfileCapture(self.profiler_combo.currentText())
+            self.capture.start()
+            self.profiler_combo.setEnabled(False)
+            self.profile_btn.setText('Stop Profile')
+            return
+        self.profiler_combo.setEnabled(True)
+        self.profile_btn.setText('Profile')
+        if self.capture is None:
+            return
+        capture, self.capture = self.capture, None
+        capture.stop()
+        path, _ = QFileDialog.getSaveFileName(self, 'Save Profile', 'fai_profile' + capture.suffix,
+                                              f'Profile (*{capture.suffix})')
+        if not path:
+            return
+        try:
+            capture.save(path)
+        except Exception as e:
+            QMessageBox.critical(self, 'Error', f'Failed to save profile: {str(e)}')
@@ -0,0 +1,331 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 18:52:36 2026
+
+@author: hendrik
+
+Image preprocessing for OCR on uint8 NumPy arrays.
+
+Every stage takes a 2-D uint8 array (grayscale takes 3-D too) and returns
+one, working in place or on views where it can. Lookups go through
+256-entry tables and sums through integer accumulators, so no stage makes
+a float64 copy of the image. Stages are chained per job by Preprocessor,
+which also times each of them.
+"""
+
+import math
+import threading
+import time
+
+import numpy as np
+from PIL import Image
+
+
+def grayscale(arr):
+    """Luma (ITU-R 601) of an RGB(A) array, integer weights"""
+    if arr.ndim == 2:
+        return arr
+    # Same fixed point weights as PIL's convert('L'), so results (and OCR
+    # cache keys) match it exactly
+    gray = arr[..., 0].astype(np.uint32)
+    gray *= 19595
+    gray += arr[..., 1].astype(np.uint32) * 38470
+    gray += arr[..., 2].astype(np.uint32) * 7471
+    gray += 0x8000
+    gray >>= 16
+    return gray.astype(np.uint8)
+
+
+def _histogram(arr):
+    return np.bincount(arr.ravel(), minlength=256)
+
+
+def _percentile_levels(hist, low, high):
+    """Gray levels at the low/high percentiles of a 256-bin histogram"""
+    cdf = np.cumsum(hist)
+    total = cdf[-1]
+    # The first level past the low share, so low=0 is the darkest pixel
+    # and not the empty bins below it
+    lo = int(np.searchsorted(cdf, total * low / 100.0, side='right'))
+    hi = int(np.searchsorted(cdf, total * high / 100.0))
+    return lo, max(hi, lo + 1)
+
+
+def contrast_stretch(arr, low=2, high=98):
+    """
+    Map the low..high percentile gray range onto 0..255
+
+    Percentiles come from a 256-bin histogram and the mapping is a lookup
+    table applied in place, instead of np.percentile's sort and
+    np.interp's float64 output.
+    """
+    lo, hi = _percentile_levels(_histogram(arr), low, high)
+    levels = np.arange(256, dtype=np.int32)
+    lut = np.clip((levels - lo) * 255 // (hi - lo), 0, 255).astype(np.uint8)
+    np.take(lut, arr, out=arr)
+    return arr
+
+
+def _box_sum(arr, block):
+    """Sum over a block x block window around each pixel, edge padded"""
+    radius = block // 2
+    padded = np.pad(arr, radius + 1, mode='edge')
+    # Rows first: the running sum fits uint32, the window sum uint16
+    rows = np.cumsum(padded, axis=1, dtype=np.uint32)
+    rows = (rows[:, block:] - rows[:, :-block]).astype(np.uint16 if block <= 257 else np.uint32)
+    cols = np.cumsum(rows, axis=0, dtype=np.uint32)
+    return cols[block:] - cols[:-block]
+
+
+def binarize(arr, block=31, offset=10):
+    """
+    Adaptive (local mean) threshold
+
+    A pixel turns black when it is more than offset gray levels darker
+    than the mean of the block x block window around it, which copes with
+    scan shading and coloured cell fills that a global threshold doesn't.
+    """
+    block |= 1
+    height, width = arr.shape
+    sums = _box_sum(arr, block)[:height, :width]
+    area = block * block
+    # pixel < mean - offset  <=>  pixel * area + offset * area < sum
+    lhs = arr.astype(np.uint32)
+    lhs *= area
+    lhs += offset * area
+    ink = lhs < sums
+    arr.fill(255)
+    arr[ink] = 0
+    return arr
+
+
+def _ink_mask(arr, level=128):
+    return arr < level
+
+
+def deskew(arr, max_angle=5.0, step=0.5, sample=600):
+    """
+    Rotate text lines level
+
+    The angle is the one that makes the row profile of the ink sharpest,
+    searched on a reduced copy; only the final rotation touches the full
+    image.
+    """
+    height, width = arr.shape
+    scale = min(1.0, sample / max(height, width))
+    small = Image.fromarray(arr)
+    if scale < 1.0:
+        small = small.resize((max(1, int(width * scale)), max(1, int(height * scale))),
+                             Image.BILINEAR)
+    best_angle, best_score = 0.0, None
+    steps = int(round(max_angle / step))
+    for i in range(-steps, steps + 1):
+        angle = i * step
+        rotated = np.asarray(small.rotate(angle, resample=Image.NEAREST, fillcolor=255))
+        profile = np.count_nonzero(rotated < 128, axis=1).astype(np.int64)
+        score = int(np.dot(profile, profile))
+        if best_score is None or score > best_score:
+            best_angle, best_score = angle, score
+    if best_angle == 0.0:
+        return arr
+    image = Image.fromarray(arr).rotate(best_angle, resample=Image.BILINEAR,
+                                        expand=True, fillcolor=255)
+    return np.asarray(image).copy()
+
+
+def remove_border(arr, max_ink=0.5, pad=8):
+    """
+    Trim frame lines and blank margins from the edges of a crop
+
+    Edge rows/columns that are mostly ink (table or title block lines the
+    selection caught) are cut off, then the blank margin around the
+    remaining ink, and a white pad is put back for tesseract.
+    """
+    ink = _ink_mask(arr)
+    rows = ink.mean(axis=1, dtype=np.float32)
+    cols = ink.mean(axis=0, dtype=np.float32)
+    top, bottom = 0, len(rows)
+    while top < bottom and rows[top] > max_ink:
+        top += 1
+    while bottom > top and rows[bottom - 1] > max_ink:
+        bottom -= 1
+    left, right = 0, len(cols)
+    while left < right and cols[left] > max_ink:
+        left += 1
+    while right > left and cols[right - 1] > max_ink:
+        right -= 1
+    inner = ink[top:bottom, left:right]
+    ys = np.flatnonzero(inner.any(axis=1))
+    xs = np.flatnonzero(inner.any(axis=0))
+    if not len(ys) or not len(xs):
+        return arr
+    view = arr[top + ys[0]:top + ys[-1] + 1, left + xs[0]:left + xs[-1] + 1]
+    if not pad:
+        return view
+    out = np.full((view.shape[0] + 2 * pad, view.shape[1] + 2 * pad), 255, np.uint8)
+    out[pad:-pad, pad:-pad] = view
+    return out
+
+
+def upscale(arr, min_text_height=30, max_factor=4):
+    """
+    Enlarge crops whose text is too small for tesseract
+
+    Text height is estimated from the tallest run of inked rows; tesseract
+    is most accurate on glyphs roughly 20-40 px tall.
+    """
+    ink_rows = _ink_mask(arr).any(axis=1)
+    if not ink_rows.any():
+        return arr
+    # Longest run of consecutive inked rows
+    edges = np.flatnonzero(np.diff(np.concatenate(([0], ink_rows.view(np.int8), [0]))))
+    text_height = int((edges[1::2] - edges[::2]).max())
+    if text_height >= min_text_height:
+        return arr
+    factor = min(max_factor, math.ceil(min_text_height / max(text_height, 1)))
+    if factor <= 1:
+        return arr
+    height, width = arr.shape
+    image = Image.fromarray(arr).resize((width * factor, height * factor), Image.BICUBIC)
+    return np.asarray(image).copy()
+
+
+STAGES = {
+    'grayscale': grayscale,
+    'contrast': contrast_stretch,
+    'binarize': binarize,
+    'deskew': deskew,
+    'border': remove_border,
+    'upscale': upscale,
+}
+
+# What process_image has always done
+DEFAULT_PIPELINE = ('grayscale',)
+# A reasonable start for scanned drawings
+SCAN_PIPELINE = ('grayscale', 'border', 'contrast', 'deskew', 'upscale', 'binarize')
+# Names for the pipelines above, usable wherever a stage spec is, so
+# callers can pick one without importing this module (and numpy)
+PIPELINES = {'default': DEFAULT_PIPELINE, 'scan': SCAN_PIPELINE}
+
+
+def parse_stages(spec):
+    """
+    Stage list from 'contrast,binarize:block=41', a sequence of names or
+    (name, kwargs) pairs, or a PIPELINES name
+
+    Returns:
+        list of (name, kwargs)
+    """
+    if isinstance(spec, str) and spec in PIPELINES:
+        spec = PIPELINES[spec]
+    if isinstance(spec, str):
+        spec = [part for part in spec.split(',') if part.strip()]
+    stages = []
+    for item in spec:
+        if isinstance(item, str):
+            name, _, args = item.strip().partition(':')
+            kwargs = {}
+            for arg in filter(None, args.split(':')):
+                key, _, value = arg.partition('=')
+                kwargs[key.strip()] = float(value) if '.' in value else int(value)
+            item = (name, kwargs)
+        name, kwargs = item
+        if name not in STAGES:
+            raise ValueError(f'Unknown preprocessing stage {name!r}')
+        stages.append((name, dict(kwargs)))
+    return stages
+
+
+class Preprocessor:
+    """
+    A chain of preprocessing stages with per-stage timing.
+
+    Calling it on a PIL image runs the stages and returns an 'L' image.
+    Timings accumulate in stats() across calls (thread-safe, so one
+    instance can serve a batch), and the timings of the last call on the
+    calling thread are in last_timings().
+    """
+
+    def __init__(self, stages=DEFAULT_PIPELINE):
+        self.stages = parse_stages(stages)
+        if not self.stages or self.stages[0][0] != 'grayscale':
+            self.stages.insert(0, ('grayscale', {}))
+        self.name = ','.join(name for name, _ in self.stages)
+        self._lock = threading.Lock()
+        self._totals = {'load': [0, 0.0]}
+        self._totals.update((name, [0, 0.0]) for name, _ in self.stages)
+        self._local = threading.local()
+
+    def run(self, image):
+        """
+        Returns:
+            tuple: (PIL 'L' image, [(stage, seconds), ...])
+        """
+        timings = []
+        if image.mode == 'L' and len(self.stages) == 1:
+            return image, [('grayscale', 0.0)]
+        start = time.perf_counter()
+        # 'L' images are copied once into a writable array; anything
+        # else is converted by the grayscale stage
+        arr = np.array(image if image.mode in ('L', 'RGB', 'RGBA') else image.convert('RGB'))
+        timings.append(('load', time.perf_counter() - start))
+        for name, kwargs in self.stages:
+            start = time.perf_counter()
+            arr = STAGES[name](arr, **kwargs)
+            timings.append((name, time.perf_counter() - start))
+        return Image.fromarray(arr, 'L'), timings
+
+    def __call__(self, image):
+        image, timings = self.run(image)
+        self._local.timings = timings
+        with self._lock:
+            for name, seconds in timings:
+                total = self._totals.setdefault(name, [0, 0.0])
+                total[0] += 1
+                total[1] += seconds
+        return image
+
+    def last_timings(self):
+        return getattr(self._local, 'timings', [])
+
+    def stats(self):
+        """{stage: {'calls', 'seconds', 'mean_ms'}}"""
+        with self._lock:
+            return {name: {'calls': calls, 'seconds': seconds,
+                           'mean_ms': seconds * 1000 / calls if calls else 0.0}
+                    for name, (calls, seconds) in self._totals.items()}
+
+    def reset_stats(self):
+        with self._lock:
+            for total in self._totals.values():
+                total[:] = [0, 0.0]
+
+
+_pipelines = {}
+_pipelines_lock = threading.Lock()
+
+
+def get_preprocessor(stages=None):
+    """
+    Shared Preprocessor for a stage spec (see parse_stages), so the
+    timings of every job using the same pipeline add up in one place
+
+    Args:
+        stages: spec, a Preprocessor (returned as is), or None for
+            DEFAULT_PIPELINE
+    """
+    if isinstance(stages, Preprocessor):
+        return stages
+    key = repr(parse_stages(DEFAULT_PIPELINE if stages is None else stages))
+    with _pipelines_lock:
+        preprocessor = _pipelines.get(key)
+        if preprocessor is None:
+            preprocessor = _pipelines[key] = Preprocessor(
+                DEFAULT_PIPELINE if stages is None else stages)
+        return preprocessor
+
+
+def pipeline_stats():
+    """Stage timings of every shared pipeline, keyed by pipeline name"""
+    with _pipelines_lock:
+        return {p.name: p.stats() for p in _pipelines.values()}
@@ -0,0 +1,594 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 17:48:10 2026
+
+@author: hendrik
+
+Project files (.faiproj): bubbles, region rects, OCR text and region crops
+of a ballooning session, tied to the source PDF by its SHA-256.
+
+The file is an append-only log of records after an 8 byte magic:
+
+    type (u8) | payload length (u32) | crc32 of payload (u32) | payload
+
+Each save appends only what changed since the previous one. Dragging
+bubbles appends 24 bytes per moved bubble; adding, removing or renumbering
+appends the bubble list of the pages involved, not of the whole session.
+Region and text changes are per bubble. The log is rewritten from scratch
+once it is COMPACT_RATIO times larger than what it holds (and at least
+COMPACT_MIN_BYTES). Coordinates are stored as columns of typed arrays
+rather than per-bubble objects, and crops as PNG blobs that are located on
+load but only read when asked for. A torn record at the end (crash while
+writing) is dropped on the next load.
+"""
+
+import hashlib
+import io
+import json
+import math
+import os
+import struct
+import threading
+import zlib
+from array import array
+
+MAGIC = b'FAIPRJ1\n'
+PROJECT_SUFFIX = '.faiproj'
+# A session that isn't restored is kept under this suffix until the next one
+BACKUP_SUFFIX = '.bak'
+
+_HEADER = struct.Struct('<BII')
+_COUNT = struct.Struct('<I')
+_ID = struct.Struct('<q')
+_PAGE = struct.Struct('<i')
+
+R_META = 1       # JSON: source, sha256, pages
+R_BUBBLES = 2    # snapshot of every bubble: n, ids q[n], pages i[n], xs d[n], ys d[n]
+R_REGIONS = 3    # n, ids q[n], rects d[4n] (NaN = removed), tag lengths H[n], utf-8 tags
+R_TEXT = 4       # n, ids q[n], lengths I[n] (0xFFFFFFFF = removed), utf-8 text
+R_CROP = 5       # id q, PNG bytes (empty = removed)
+R_MOVES = 6      # n, ids q[n], xs d[n], ys d[n]: bubbles that moved on their page
+R_PAGE = 7       # page i, n, ids q[n], xs d[n], ys d[n]: a page's bubbles, in order
+
+_REMOVED_TEXT = 0xFFFFFFFF
+
+# Rewrite the file from scratch once the log is this many times larger
+# than the data it holds
+COMPACT_RATIO = 4
+COMPACT_MIN_BYTES = 1 << 20
+
+
+def project_path(pdf_path):
+    return os.path.splitext(pdf_path)[0] + PROJECT_SUFFIX
+
+
+def file_sha256(path, chunk_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as file:
+        for chunk in iter(lambda: file.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _unpack_array(typecode, data, offset, count):
+    values = array(typecode)
+    end = offset + count * values.itemsize
+    values.frombytes(data[offset:end])
+    return values, end
+
+
+def _encode_bubbles(columns):
+    ids, pages, xs, ys = columns
+    return b''.join((_COUNT.pack(len(ids)), ids.tobytes(), pages.tobytes(),
+                     xs.tobytes(), ys.tobytes()))
+
+
+def _decode_bubbles(payload):
+    (n,), offset = _COUNT.unpack_from(payload), _COUNT.size
+    ids, offset = _unpack_array('q', payload, offset, n)
+    pages, offset = _unpack_array('i', payload, offset, n)
+    xs, offset = _unpack_array('d', payload, offset, n)
+    ys, offset = _unpack_array('d', payload, offset, n)
+    return ids, pages, xs, ys
+
+
+def _page_columns(columns):
+    """{page: (ids, xs, ys)} of (ids, pages, xs, ys) columns"""
+    pages = {}
+    ids, page_numbers, xs, ys = columns
+    for i, page in enumerate(page_numbers):
+        entry = pages.get(page)
+        if entry is None:
+            entry = pages[page] = (array('q'), array('d'), array('d'))
+        entry[0].append(ids[i])
+        entry[1].append(xs[i])
+        entry[2].append(ys[i])
+    return pages
+
+
+def _join_pages(pages):
+    """(ids, pages, xs, ys) columns of {page: (ids, xs, ys)}"""
+    ids, page_numbers, xs, ys = array('q'), array('i'), array('d'), array('d')
+    for page in sorted(pages):
+        page_ids, page_xs, page_ys = pages[page]
+        ids.extend(page_ids)
+        page_numbers.extend(array('i', [page]) * len(page_ids))
+        xs.extend(page_xs)
+        ys.extend(page_ys)
+    return ids, page_numbers, xs, ys
+
+
+def _encode_moves(moves):
+    """moves: [(bubble_id, x, y)]"""
+    ids = array('q', [m[0] for m in moves])
+    xs = array('d', [m[1] for m in moves])
+    ys = array('d', [m[2] for m in moves])
+    return b''.join((_COUNT.pack(len(ids)), ids.tobytes(), xs.tobytes(), ys.tobytes()))
+
+
+def _decode_moves(payload):
+    (n,), offset = _COUNT.unpack_from(payload), _COUNT.size
+    ids, offset = _unpack_array('q', payload, offset, n)
+    xs, offset = _unpack_array('d', payload, offset, n)
+    ys, offset = _unpack_array('d', payload, offset, n)
+    return ids, xs, ys
+
+
+def _encode_page(page, columns):
+    ids, xs, ys = columns
+    return b''.join((_PAGE.pack(page), _COUNT.pack(len(ids)), ids.tobytes(), xs.tobytes(),
+                     ys.tobytes()))
+
+
+def _decode_page(payload):
+    (page,), offset = _PAGE.unpack_from(payload), _PAGE.size
+    (n,) = _COUNT.unpack_from(payload, offset)
+    offset += _COUNT.size
+    ids, offset = _unpack_array('q', payload, offset, n)
+    xs, offset = _unpack_array('d', payload, offset, n)
+    ys, offset = _unpack_array('d', payload, offset, n)
+    return page, (ids, xs, ys)
+
+
+def _bubble_records(old, new):
+    """
+    Records that turn the bubbles {page: (ids, xs, ys)} old into new: moves
+    for pages that kept their bubbles and order, the whole page otherwise
+    """
+    records, moves = [], []
+    for page in sorted(old.keys() | new.keys()):
+        before = old.get(page)
+        after = new.get(page) or (array('q'), array('d'), array('d'))
+        if before is not None and before[0] == after[0]:
+            if before[1] != after[1] or before[2] != after[2]:
+                moves.extend((after[0][i], after[1][i], after[2][i])
+                             for i in range(len(after[0]))
+                             if before[1][i] != after[1][i] or before[2][i] != after[2][i])
+        elif before is not None or len(after[0]):
+            records.append((R_PAGE, _encode_page(page, after), None))
+    if moves:
+        records.insert(0, (R_MOVES, _encode_moves(moves), None))
+    return records
+
+
+def _encode_regions(regions):
+    """regions: {bubble_id: (rect, tag) or None}"""
+    ids, rects, lengths, tags = array('q'), array('d'), array('H'), []
+    for bubble_id, value in regions.items():
+        ids.append(bubble_id)
+        if value is None:
+            rects.extend((math.nan,) * 4)
+            tag = b''
+        else:
+            rects.extend(value[0])
+            tag = (value[1] or '').encode('utf-8')
+        lengths.append(len(tag))
+        tags.append(tag)
+    return b''.join((_COUNT.pack(len(ids)), ids.tobytes(), rects.tobytes(),
+                     lengths.tobytes(), *tags))
+
+
+def _decode_regions(payload):
+    (n,), offset = _COUNT.unpack_from(payload), _COUNT.size
+    ids, offset = _unpack_array('q', payload, offset, n)
+    rects, offset = _unpack_array('d', payload, offset, 4 * n)
+    lengths, offset = _unpack_array('H', payload, offset, n)
+    regions = {}
+    for i, bubble_id in enumerate(ids):
+        rect = tuple(rects[4 * i:4 * i + 4])
+        tag = payload[offset:offset + lengths[i]].decode('utf-8')
+        offset += lengths[i]
+        regions[bubble_id] = None if math.isnan(rect[0]) else (rect, tag)
+    return regions
+
+
+def _encode_text(texts):
+    """texts: {bubble_id: text or None}"""
+    ids, lengths, chunks = array('q'), array('I'), []
+    for bubble_id, text in texts.items():
+        ids.append(bubble_id)
+        if text is None:
+            lengths.append(_REMOVED_TEXT)
+        else:
+            data = text.encode('utf-8')
+            lengths.append(len(data))
+            chunks.append(data)
+    return b''.join((_COUNT.pack(len(ids)), ids.tobytes(), lengths.tobytes(), *chunks))
+
+
+def _decode_text(payload):
+    (n,), offset = _COUNT.unpack_from(payload), _COUNT.size
+    ids, offset = _unpack_array('q', payload, offset, n)
+    lengths, offset = _unpack_array('I', payload, offset, n)
+    texts = {}
+    for bubble_id, length in zip(ids, lengths):
+        if length == _REMOVED_TEXT:
+            texts[bubble_id] = None
+        else:
+            texts[bubble_id] = payload[offset:offset + length].decode('utf-8')
+            offset += length
+    return texts
+
+
+def _encode_crop(image):
+    buffer = io.BytesIO()
+    image.save(buffer, 'PNG', compress_level=1)
+    return buffer.getvalue()
+
+
+class ProjectState:
+    """What a project file holds after replaying its log"""
+
+    def __init__(self):
+        self.meta = {}
+        self.bubbles = (array('q'), array('i'), array('d'), array('d'))
+        self.regions = {}     # bubble_id -> (rect, tag)
+        self.texts = {}       # bubble_id -> text
+        self.crops = {}       # bubble_id -> (offset, length) of the PNG blob
+
+    def __len__(self):
+        return len(self.bubbles[0])
+
+    def rows(self):
+        """(bubble_id, page, x, y) in numbering order"""
+        return zip(*self.bubbles)
+
+    def region(self, bubble_id):
+        """(rect, source, kind) of a bubble's region, or None"""
+        value = self.regions.get(bubble_id)
+        if value is None:
+            return None
+        rect, tag = value
+        source, _, kind = tag.partition(':')
+        return rect, source or None, kind or None
+
+
+class _Records(list):
+    """Records from changes(), tagged with the state of the file they extend"""
+
+    generation = 0
+
+
+class ProjectFile:
+    """
+    An append-only project file.
+
+    save() compares the session against what was last written and appends
+    only the differences. changes() and write() split that in two so the
+    comparison can run on the GUI thread and the encoding and I/O on a
+    background one. Records only extend the file they were compared
+    against: once a write fails, or the file is reloaded, started over or
+    rewritten, records from an earlier changes() are dropped and the next
+    changes() starts from scratch.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._written = None     # what the file holds, None = nothing yet
+        self._crop_index = {}    # bubble_id -> (offset, length)
+        self._end = 0            # end of the last valid record
+        self._live_bytes = 0     # size of the data the last load/rewrite held
+        # Bumped whenever the file stops being what _written describes
+        self._generation = 0
+
+    # -- reading ---------------------------------------------------------------
+
+    def load(self):
+        """
+        Replay the log
+
+        Returns:
+            ProjectState; an empty one if the file doesn't exist
+        """
+        state = ProjectState()
+        if not os.path.exists(self.path):
+            return state
+        size = os.path.getsize(self.path)
+        with open(self.path, 'rb') as file:
+            if file.read(len(MAGIC)) != MAGIC:
+                raise ValueError(f'{self.path} is not a FAI project file')
+            end = len(MAGIC)
+            pages, where = {}, None
+            while True:
+                header = file.read(_HEADER.size)
+                if len(header) < _HEADER.size:
+                    break
+                kind, length, crc = _HEADER.unpack(header)
+                offset = end + _HEADER.size
+                if kind == R_CROP:
+                    # Only the ID now, the image when somebody asks for it
+                    if offset + length > size:
+                        break
+                    payload = file.read(_ID.size)
+                    file.seek(length - _ID.size, os.SEEK_CUR)
+                    (bubble_id,) = _ID.unpack(payload)
+                    if length > _ID.size:
+                        state.crops[bubble_id] = (offset + _ID.size, length - _ID.size)
+                    else:
+                        state.crops.pop(bubble_id, None)
+                else:
+                    payload = file.read(length)
+                    if len(payload) < length or zlib.crc32(payload) != crc:
+                        break
+                    if kind == R_META:
+                        state.meta.update(json.loads(payload.decode('utf-8')))
+                    elif kind == R_BUBBLES:
+                        pages = _page_columns(_decode_bubbles(payload))
+                        where = None
+                    elif kind == R_PAGE:
+                        page, columns = _decode_page(payload)
+                        if len(columns[0]):
+                            pages[page] = columns
+                        else:
+                            pages.pop(page, None)
+                        where = None
+                    elif kind == R_MOVES:
+                        if where is None:
+                            # bubble_id -> (page, position), rebuilt after
+                            # the page lists change
+                            where = {bubble_id: (page, i) for page, columns in pages.items()
+                                     for i, bubble_id in enumerate(columns[0])}
+                        for bubble_id, x, y in zip(*_decode_moves(payload)):
+                            if bubble_id in where:
+                                page, i = where[bubble_id]
+                                pages[page][1][i] = x
+                                pages[page][2][i] = y
+                    elif kind == R_REGIONS:
+                        state.regions.update(_decode_regions(payload))
+                    elif kind == R_TEXT:
+                        state.texts.update(_decode_text(payload))
+                end = offset + length
+            state.bubbles = _join_pages(pages)
+        state.regions = {k: v for k, v in state.regions.items() if v is not None}
+        state.texts = {k: v for k, v in state.texts.items() if v is not None}
+
+        with self._lock:
+            self._end = end
+            self._crop_index = dict(state.crops)
+            self._written = {
+                'meta': dict(state.meta),
+                'version': None,
+                'bubbles': pages,
+                'regions': dict(state.regions),
+                'texts': dict(state.texts),
+                'crops': {bubble_id: None for bubble_id in state.crops},
+            }
+            self._live_bytes = self._estimate_live(state)
+            self._generation += 1
+        return state
+
+    def _estimate_live(self, state):
+        return (_COUNT.size + 28 * len(state)
+                + sum(48 + len(tag) for _, tag in state.regions.values())
+                + sum(12 + len(text) for text in state.texts.values())
+                + sum(length for _, length in state.crops.values()))
+
+    def read_crop(self, bubble_id):
+        """PIL image of a stored crop, read from the file on demand"""
+        from PIL import Image
+        location = self._crop_index.get(bubble_id)
+        if location is None:
+            return None
+        offset, length = location
+        with open(self.path, 'rb') as file:
+            file.seek(offset)
+            image = Image.open(io.BytesIO(file.read(length)))
+            image.load()
+        return image
+
+    # -- writing ---------------------------------------------------------------
+
+    def changes(self, bubbles, regions, texts, crops=None, meta=None):
+        """
+        Records that bring the file up to date with a session, and mark
+        them as written
+
+        Args:
+            bubbles: BubbleStore
+            regions: {bubble_id: (rect, tag)}, tag 'source' or 'source:kind'
+            texts: {bubble_id: text}
+            crops: {bubble_id: PIL image} of crops to keep
+            meta: dict merged into the stored meta (source, sha256, ...)
+
+        Returns:
+            list of (record type, payload or PIL image, bubble_id)
+        """
+        with self._lock:
+            written = self._written or {'meta': {}, 'version': None, 'bubbles': None,
+                                        'regions': {}, 'texts': {}, 'crops': {}}
+            records = _Records()
+            records.generation = self._generation
+            if meta:
+                new_meta = {k: v for k, v in meta.items() if written['meta'].get(k) != v}
+                if new_meta:
+                    records.append((R_META, json.dumps(new_meta).encode('utf-8'), None))
+                    written['meta'].update(new_meta)
+
+            if written['version'] is None or written['version'] != bubbles.version:
+                columns = bubbles.columns()
+                pages = _page_columns(columns)
+                if written['bubbles'] is None:
+                    records.append((R_BUBBLES, _encode_bubbles(columns), None))
+                else:
+                    records.extend(_bubble_records(written['bubbles'], pages))
+                written['bubbles'] = pages
+                written['version'] = bubbles.version
+
+            old = written['regions']
+            changed = {k: v for k, v in regions.items() if old.get(k) != v}
+            changed.update((k, None) for k in old.keys() - regions.keys())
+            if changed:
+                records.append((R_REGIONS, _encode_regions(changed), None))
+                written['regions'] = dict(regions)
+
+            old = written['texts']
+            changed = {k: v for k, v in texts.items() if old.get(k) != v}
+            changed.update((k, None) for k in old.keys() - texts.keys())
+            if changed:
+                records.append((R_TEXT, _encode_text(changed), None))
+                written['texts'] = dict(texts)
+
+            old = written['crops']
+            for bubble_id, image in (crops or {}).items():
+                if image is not None and old.get(bubble_id) is not image:
+                    records.append((R_CROP, image, bubble_id))
+                    old[bubble_id] = image
+            for bubble_id in [k for k in old if k not in regions]:
+                records.append((R_CROP, b'', bubble_id))
+                del old[bubble_id]
+
+            self._written = written
+            return records
+
+    def write(self, records):
+        """
+        Append records from changes() to the file
+
+        Safe to call from a worker thread. On failure the next changes()
+        starts over with a full rewrite, and records it computed before are
+        dropped.
+
+        Returns:
+            int: bytes appended
+        """
+        if not records:
+            return 0
+        with self._lock:
+            if getattr(records, 'generation', self._generation) != self._generation:
+                return 0
+            try:
+                return self._append(records)
+            except Exception:
+                self._reset()
+                raise
+
+    def _reset(self):
+        """Forget what the file holds; call with the lock held"""
+        self._written = None
+        self._crop_index = {}
+        self._end = 0
+        self._generation += 1
+
+    def _append(self, records):
+        new_file = self._end == 0 or not os.path.exists(self.path)
+        with open(self.path, 'wb' if new_file else 'r+b') as file:
+            if new_file:
+                file.write(MAGIC)
+                self._end = len(MAGIC)
+            else:
+                # Drop whatever a crashed write left after the last record
+                file.seek(self._end)
+                file.truncate()
+            start = self._end
+            for kind, payload, bubble_id in records:
+                if kind == R_CROP:
+                    blob = payload if isinstance(payload, bytes) else _encode_crop(payload)
+                    payload = _ID.pack(bubble_id) + blob
+                    if blob:
+                        self._crop_index[bubble_id] = (self._end + _HEADER.size + _ID.size,
+                                                       len(blob))
+                    else:
+                        self._crop_index.pop(bubble_id, None)
+                file.write(_HEADER.pack(kind, len(payload), zlib.crc32(payload)))
+                file.write(payload)
+                self._end += _HEADER.size + len(payload)
+            file.flush()
+            os.fsync(file.fileno())
+        return self._end - start
+
+    def save(self, bubbles, regions, texts, crops=None, meta=None):
+        """
+        Bring the file up to date, appending only what changed, or
+        rewriting it when the log has grown far beyond its content
+
+        Returns:
+            int: bytes written
+        """
+        if self.needs_compaction():
+            return self.rewrite(bubbles, regions, texts, crops, meta)
+        return self.write(self.changes(bubbles, regions, texts, crops, meta))
+
+    def start_over(self):
+        """
+        Begin a new log, keeping the existing file as path + BACKUP_SUFFIX
+        (replacing an older backup) instead of overwriting it
+
+        Returns:
+            str: the backup path, None if there was no file
+        """
+        with self._lock:
+            backup = None
+            if os.path.exists(self.path):
+                backup = self.path + BACKUP_SUFFIX
+                os.replace(self.path, backup)
+            self._reset()
+            self._live_bytes = 0
+        return backup
+
+    def needs_compaction(self):
+        return (self._end > COMPACT_MIN_BYTES
+                and self._end > COMPACT_RATIO * max(self._live_bytes, 1))
+
+    def rewrite(self, bubbles, regions, texts, crops=None, meta=None):
+        """
+        Write the whole session to a fresh file and swap it in atomically.
+        Stored crops the session doesn't hold in memory are copied over
+        without decoding.
+
+        Returns:
+            int: bytes written
+        """
+        with self._lock:
+            old_meta = (self._written or {}).get('meta', {})
+            old_crops = dict(self._crop_index)
+            old_path = self.path if os.path.exists(self.path) else None
+            temp = ProjectFile(self.path + '.tmp')
+            records = temp.changes(bubbles, regions, texts, crops, dict(old_meta, **(meta or {})))
+            held = {bubble_id for _, _, bubble_id in records if bubble_id is not None}
+            if old_path:
+                with open(old_path, 'rb') as file:
+                    for bubble_id, (offset, length) in old_crops.items():
+                        if bubble_id in regions and bubble_id not in held:
+                            file.seek(offset)
+                            records.append((R_CROP, file.read(length), bubble_id))
+                            temp._written['crops'][bubble_id] = None
+            size = temp._append(records)
+            os.replace(temp.path, self.path)
+            self._written = temp._written
+            self._crop_index = temp._crop_index
+            self._end = temp._end
+            self._live_bytes = temp._end
+            self._generation += 1
+        return size
+
+
+def load_project(path):
+    """
+    Open a project file
+
+    Returns:
+        tuple: (ProjectFile, ProjectState)
+    """
+    project = ProjectFile(path)
+    return project, project.load()
@@ -0,0 +1,187 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 11:20:06 2026
+
+@author: hendrik
+"""
+
+import multiprocessing
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
+from PyQt5.QtCore import QObject, pyqtSignal, pyqtSlot
+from PyQt5.QtGui import QImage, QPixmap
+
+import instrumentation
+
+
+def pixmap_nbytes(pixmap):
+    """Approximate memory held by a QPixmap/QImage"""
+    return pixmap.width() * pixmap.height() * max(pixmap.depth(), 8) // 8
+
+
+class RasterCache:
+    """
+    LRU cache of rendered pages/tiles bounded by a memory budget.
+
+    Entries are QPixmaps keyed by whatever identifies the render, e.g.
+    (page_number, zoom). The least recently used entries are evicted once
+    the total size goes over max_bytes, so the budget holds regardless of
+    sheet size. A single entry larger than the budget is still kept, as
+    long as it is the only one.
+    """
+
+    def __init__(self, max_bytes=512 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.bytes_used = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._entries
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, pixmap):
+        size = pixmap_nbytes(pixmap)
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.bytes_used -= old[1]
+            self._entries[key] = (pixmap, size)
+            self.bytes_used += size
+            while self.bytes_used > self.max_bytes and len(self._entries) > 1:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self.bytes_used -= evicted
+
+    def discard_where(self, predicate):
+        with self._lock:
+            for key in [k for k in self._entries if predicate(k)]:
+                self.bytes_used -= self._entries.pop(key)[1]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.bytes_used = 0
+
+
+def render_page(page, zoom, clip=None):
+    """Rasterize a fitz page (or a clip of it) into a QPixmap"""
+    import fitz  # PyMuPDF
+    with instrumentation.timed('render.page'):
+        pix = page.get_pixmap(matrix=fitz.Matrix(zoom, zoom), clip=clip)
+    with instrumentation.timed('render.to_pixmap'):
+        img = QImage(pix.samples, pix.width, pix.height, pix.stride, QImage.Format_RGB888)
+        return QPixmap.fromImage(img)
+
+
+# The prefetch worker runs in its own process with its own document handle:
+# MuPDF holds the GIL while rendering and fitz documents aren't thread safe,
+# so a thread would still stall the GUI.
+_prefetch_doc = None
+
+
+def _prefetch_init(pdf_path):
+    global _prefetch_doc
+    import fitz  # PyMuPDF
+    _prefetch_doc = fitz.open(pdf_path)
+
+
+def _prefetch_render(key, page_number, zoom, clip):
+    import fitz  # PyMuPDF
+    start = time.perf_counter()
+    pix = _prefetch_doc[page_number].get_pixmap(matrix=fitz.Matrix(zoom, zoom),
+                                                clip=fitz.Rect(clip) if clip else None)
+    return key, pix.width, pix.height, pix.stride, pix.samples, time.perf_counter() - start
+
+
+class PagePrefetcher(QObject):
+    """
+    Renders pages ahead of navigation into a RasterCache.
+
+    request() replaces the wanted set: queued renders that are no longer
+    wanted are cancelled, and finished ones are converted to QPixmaps and
+    cached on the GUI thread.
+    """
+
+    prefetched = pyqtSignal(object)    # cache key
+
+    _render_finished = pyqtSignal(object)
+
+    def __init__(self, cache, parent=None):
+        super().__init__(parent)
+        self.cache = cache
+        self._executor = None
+        self._futures = {}    # key -> Future
+        self._render_finished.connect(self._on_render_finished)
+
+    def open(self, pdf_path):
+        self.close()
+        # Spawned, not forked: the window's warm-up imports fitz on a
+        # background thread, and a fork while it holds an import lock
+        # deadlocks the child
+        self._executor = ProcessPoolExecutor(max_workers=1, initializer=_prefetch_init,
+                                             initargs=(pdf_path,),
+                                             mp_context=multiprocessing.get_context('spawn'))
+
+    def close(self):
+        for future in self._futures.values():
+            future.cancel()
+        self._futures.clear()
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def request(self, jobs):
+        """
+        Prefetch renders not already cached
+
+        Args:
+            jobs: list of (key, page_number, zoom, clip) in priority order;
+                clip is a (x0, y0, x1, y1) PDF rect or None for the full page
+        """
+        if self._executor is None:
+            return
+        wanted = {job[0] for job in jobs}
+        for key in [k for k in self._futures if k not in wanted]:
+            if self._futures[key].cancel():
+                del self._futures[key]
+        for key, page_number, zoom, clip in jobs:
+            if key in self._futures or key in self.cache:
+                continue
+            future = self._executor.submit(_prefetch_render, key, page_number, zoom, clip)
+            self._futures[key] = future
+            future.add_done_callback(self._render_finished.emit)
+
+    @pyqtSlot(object)
+    def _on_render_finished(self, future):
+        if future.cancelled() or future.exception() is not None:
+            return
+        key, width, height, stride, samples, seconds = future.result()
+        # The render ran in the worker process, which reports its time here
+        instrumentation.record('render.prefetch', seconds)
+        if self._futures.get(key) is not future:
+            instrumentation.count('render.prefetch_wasted')
+            return
+        del self._futures[key]
+        with instrumentation.timed('render.to_pixmap'):
+            img = QImage(samples, width, height, stride, QImage.Format_RGB888)
+            pixmap = QPixmap.fromImage(img)
+        self.cache.put(key, pixmap)
+        self.prefetched.emit(key)
@@ -0,0 +1,529 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 21:41:26 2026
+
+@author: hendrik
+
+Carry a ballooned session over to a new revision of the drawing.
+
+Pages of the new PDF are aligned to the old ones (text layer word
+overlap, or shift-tolerant correlation of downsampled rasters for
+scanned sheets), keeping the sheet order, then each matched
+pair is registered: scale from the page sizes and translation from words
+that occur once on both pages, or from phase correlation of the rasters.
+Bubbles and region rects are mapped through that transform. A region is
+flagged when its text (text layer) or its pixels (scans) differ between
+the revisions; only flagged OCR regions need OCR again, every other
+bubble keeps its text.
+"""
+
+import re
+import time
+from collections import Counter
+
+import fitz  # PyMuPDF
+import numpy as np
+from PIL import Image, ImageFilter
+
+from pdf_regions import TextLayerIndex, to_fitz_rect
+
+# Pages whose text layer has fewer words are compared by their rasters
+MIN_TEXT_WORDS = 10
+# Below this similarity two pages are not considered the same sheet
+MIN_PAGE_SIMILARITY = 0.3
+# Rasters for page matching / registration and for region comparison
+THUMBNAIL_SIZE = 256
+# Blur radius (px) of the thumbnails compared between revisions
+THUMBNAIL_BLUR = 2
+# Pages of a size needed to take their common template off
+MIN_TEMPLATE_PAGES = 4
+# Largest shift (thumbnail px) between revisions of a sheet, ~5% of it
+MAX_PAGE_SHIFT = 12
+CHANGE_DPI = 75
+# Full-resolution search (px) around the half-resolution raster shift
+REFINE_PIXELS = 2
+# Word anchors must agree with the transform within this many points
+ANCHOR_TOLERANCE = 2.0
+MIN_ANCHORS = 3
+# Fraction of a region's ink that may differ before it counts as changed
+PIXEL_CHANGE_THRESHOLD = 0.06
+
+_space = re.compile(r'\s+')
+
+
+def normalize_text(text):
+    return _space.sub(' ', text or '').strip()
+
+
+class PageInfo:
+    """What alignment and registration need to know about one page"""
+
+    def __init__(self, doc, text_index, page_number):
+        page = doc[page_number]
+        self.doc = doc
+        self.number = page_number
+        self.rect = page.rect
+        self.words = text_index.words(page_number)
+        self.tokens = Counter(word[4] for word in self.words)
+        self.token_count = len(self.words)
+        self.has_text = len(self.words) >= MIN_TEXT_WORDS
+        self._rasters = {}
+        self._thumbnail = None
+
+    def thumbnail(self):
+        """
+        Blurred THUMBNAIL_SIZE raster as a float32 array, cached
+
+        Blurring lets thin lines that moved by a pixel still overlap.
+        """
+        if self._thumbnail is None:
+            image = Image.fromarray(self.raster(size=THUMBNAIL_SIZE))
+            self._thumbnail = np.asarray(
+                image.filter(ImageFilter.GaussianBlur(THUMBNAIL_BLUR)), np.float32)
+        return self._thumbnail
+
+    def raster(self, dpi=None, size=None):
+        """
+        Inverted grayscale raster (ink high) as a uint8 array, cached
+
+        The page is rendered once at CHANGE_DPI and smaller rasters are
+        scaled down from that, since rendering a scanned sheet means
+        decoding its whole image every time.
+
+        Args:
+            dpi: resolution, or
+            size: longest side in pixels
+        """
+        if size is not None:
+            dpi = size * 72 / max(self.rect.width, self.rect.height)
+        key = round(dpi, 3)
+        arr = self._rasters.get(key)
+        if arr is not None:
+            return arr
+        if dpi < CHANGE_DPI:
+            base = self.raster(CHANGE_DPI)
+            width = max(1, int(round(base.shape[1] * dpi / CHANGE_DPI)))
+            height = max(1, int(round(base.shape[0] * dpi / CHANGE_DPI)))
+            arr = np.asarray(Image.fromarray(base).resize((width, height), Image.BOX))
+        else:
+            pix = self.doc[self.number].get_pixmap(dpi=dpi, colorspace=fitz.csGRAY)
+            arr = np.frombuffer(pix.samples, np.uint8).reshape(pix.height, pix.stride)
+            arr = 255 - arr[:, :pix.width]
+        self._rasters[key] = arr
+        return arr
+
+
+def text_similarity(a, b):
+    """Multiset Jaccard overlap of two pages' words"""
+    if len(a.tokens) > len(b.tokens):
+        a, b = b, a
+    other = b.tokens
+    common = sum(min(n, other.get(token, 0)) for token, n in a.tokens.items())
+    union = a.token_count + b.token_count - common
+    return common / union if union else 0.0
+
+
+def _fft_size(n):
+    """Smallest 2^a 3^b 5^c >= n; FFTs of such sizes are many times faster"""
+    best = 1 << (n - 1).bit_length()
+    power5 = 1
+    while power5 < best:
+        power35 = power5
+        while power35 < best:
+            size = power35
+            while size < n:
+                size *= 2
+            best = min(best, size)
+            power35 *= 3
+        power5 *= 5
+    return best
+
+
+def thumbnail_spectra(pages):
+    """
+    Spectra of the page thumbnails, normalised for correlating them
+
+    Sheets of a package share their border and title block, so with
+    enough pages of a size their mean thumbnail is taken off first and
+    only what differs between the sheets is compared.
+
+    Returns:
+        dict: {page: rfft2 of the zero-mean, unit-norm thumbnail}
+    """
+    groups = {}
+    for page in pages:
+        groups.setdefault(page.thumbnail().shape, []).append(page)
+    spectra = {}
+    for shape, group in groups.items():
+        stack = np.stack([page.thumbnail() for page in group])
+        if len(group) >= MIN_TEMPLATE_PAGES:
+            stack -= stack.mean(axis=0)
+        stack -= stack.mean(axis=(1, 2), keepdims=True)
+        norms = np.sqrt(np.einsum('ijk,ijk->i', stack, stack))
+        norms[norms == 0] = 1
+        stack /= norms[:, None, None]
+        # Zero padding keeps shifted content from wrapping around
+        size = (_fft_size(shape[0] + MAX_PAGE_SHIFT), _fft_size(shape[1] + MAX_PAGE_SHIFT))
+        for page, spectrum in zip(group, np.fft.rfft2(stack, s=size)):
+            spectra[page] = spectrum
+    return spectra
+
+
+def shifted_correlation(a, b):
+    """Best correlation of two thumbnail_spectra over shifts up to MAX_PAGE_SHIFT"""
+    corr = np.fft.irfft2(a * np.conj(b))
+    window = np.r_[0:MAX_PAGE_SHIFT + 1, -MAX_PAGE_SHIFT:0]
+    return max(0.0, float(corr[np.ix_(window, window)].max()))
+
+
+def page_similarities(old_pages, new_pages, raster_only=False):
+    """
+    Similarity matrix of old x new pages, 0..1
+
+    Pages that both have a text layer are compared by text, pages that
+    both have none by their rasters. A text page against a scan scores 0
+    unless raster_only; match_pages settles those once the like pages
+    are matched, so vector sheets aren't rendered for every scan.
+    """
+    scans = [page for page in old_pages + new_pages if raster_only or not page.has_text]
+    spectra = thumbnail_spectra(scans)
+    sims = []
+    for a in old_pages:
+        row = []
+        for b in new_pages:
+            if not raster_only and a.has_text and b.has_text:
+                row.append(text_similarity(a, b))
+            elif a in spectra and b in spectra and spectra[a].shape == spectra[b].shape:
+                row.append(shifted_correlation(spectra[a], spectra[b]))
+            else:
+                row.append(0.0)
+        sims.append(row)
+    return sims
+
+
+def align_pages(sims):
+    """
+    Match old pages to new ones, keeping their order (sheets get inserted
+    or dropped between revisions, not shuffled)
+
+    Args:
+        sims: similarity matrix, old x new
+
+    Returns:
+        dict: {old index: (new index, similarity)}
+    """
+    n, m = len(sims), len(sims[0]) if sims else 0
+    # Weighted LCS: best total similarity of an order-preserving matching
+    best = [[0.0] * (m + 1) for _ in range(n + 1)]
+    for i in range(n - 1, -1, -1):
+        for j in range(m - 1, -1, -1):
+            take = sims[i][j] + best[i + 1][j + 1] if sims[i][j] >= MIN_PAGE_SIMILARITY else -1
+            best[i][j] = max(take, best[i + 1][j], best[i][j + 1])
+    matches = {}
+    i = j = 0
+    while i < n and j < m:
+        if sims[i][j] >= MIN_PAGE_SIMILARITY and best[i][j] == sims[i][j] + best[i + 1][j + 1]:
+            matches[i] = (j, sims[i][j])
+            i += 1
+            j += 1
+        elif best[i][j] == best[i + 1][j]:
+            i += 1
+        else:
+            j += 1
+    return matches
+
+
+def match_pages(old_pages, new_pages):
+    """
+    align_pages, then match what is left between the matched pages by
+    their rasters: a scan that picked up a text layer (stamps, notes) or
+    a sheet redrawn in CAD
+
+    Returns:
+        dict: {old page: (new page, similarity)}
+    """
+    matches = align_pages(page_similarities(old_pages, new_pages))
+    anchors = [(-1, -1)] + sorted((i, j) for i, (j, _) in matches.items()) \
+        + [(len(old_pages), len(new_pages))]
+    for (i0, j0), (i1, j1) in zip(anchors, anchors[1:]):
+        olds, news = old_pages[i0 + 1:i1], new_pages[j0 + 1:j1]
+        if olds and news:
+            sims = page_similarities(olds, news, raster_only=True)
+            for i, (j, sim) in align_pages(sims).items():
+                matches[i0 + 1 + i] = (j0 + 1 + j, sim)
+    return matches
+
+
+def _centre(word):
+    return (word[0] + word[2]) / 2, (word[1] + word[3]) / 2
+
+
+def register_by_text(old, new, scale):
+    """
+    Translation from words that occur exactly once on both pages
+
+    Returns:
+        tuple: ((tx, ty), inlier count), or None without enough anchors
+    """
+    old_once = {w[4]: w for w in old.words if old.tokens[w[4]] == 1}
+    new_once = {w[4]: w for w in new.words if new.tokens[w[4]] == 1}
+    pairs = [(_centre(old_once[text]), _centre(new_once[text]))
+             for text in old_once.keys() & new_once.keys()]
+    if len(pairs) < MIN_ANCHORS:
+        return None
+    shifts = np.array([(nx - scale * ox, ny - scale * oy) for (ox, oy), (nx, ny) in pairs])
+    tx, ty = np.median(shifts, axis=0)
+    inliers = np.hypot(shifts[:, 0] - tx, shifts[:, 1] - ty) <= ANCHOR_TOLERANCE
+    if inliers.sum() < MIN_ANCHORS:
+        return None
+    # Refine on the anchors that agree (moved annotations are outliers)
+    tx, ty = shifts[inliers].mean(axis=0)
+    return (float(tx), float(ty)), int(inliers.sum())
+
+
+def _phase_correlate(a, b):
+    """Whole-pixel shift (dx, dy) taking a onto b"""
+    height = _fft_size(max(a.shape[0], b.shape[0]))
+    width = _fft_size(max(a.shape[1], b.shape[1]))
+    fa = np.fft.rfft2(a, s=(height, width))
+    fb = np.fft.rfft2(b, s=(height, width))
+    cross = fb * np.conj(fa)
+    cross /= np.abs(cross) + 1e-9
+    corr = np.fft.irfft2(cross, s=(height, width))
+    dy, dx = np.unravel_index(int(np.argmax(corr)), corr.shape)
+    if dy > height // 2:
+        dy -= height
+    if dx > width // 2:
+        dx -= width
+    return int(dx), int(dy)
+
+
+def _overlap_score(a, b, dx, dy):
+    """Correlation of b with a shifted by (dx, dy), over their overlap"""
+    ya, yb = max(0, -dy), max(0, dy)
+    xa, xb = max(0, -dx), max(0, dx)
+    height = min(a.shape[0] - ya, b.shape[0] - yb)
+    width = min(a.shape[1] - xa, b.shape[1] - xb)
+    if height <= 0 or width <= 0:
+        return 0.0
+    return float(np.einsum('ij,ij->', a[ya:ya + height, xa:xa + width],
+                           b[yb:yb + height, xb:xb + width]))
+
+
+def register_by_raster(old, new, scale):
+    """
+    Translation from the page rasters, to the nearest pixel at
+    CHANGE_DPI (about a point); MuPDF snaps scanned images to whole
+    pixels, so finer fitting gains nothing
+
+    Phase correlation runs at half resolution, a quarter of the FFT
+    work, and the shift is then refined on the full rasters.
+    """
+    # Same pixels per point on both sides, so only a shift remains
+    dpi = CHANGE_DPI
+    b = new.raster(dpi=dpi)
+    a = old.raster(dpi=dpi * scale)
+    coarse = _phase_correlate(old.raster(dpi=dpi * scale / 2).astype(np.float32),
+                              new.raster(dpi=dpi / 2).astype(np.float32))
+    a, b = a.astype(np.float32), b.astype(np.float32)
+    candidates = [(2 * coarse[0] + dx, 2 * coarse[1] + dy)
+                  for dy in range(-REFINE_PIXELS, REFINE_PIXELS + 1)
+                  for dx in range(-REFINE_PIXELS, REFINE_PIXELS + 1)]
+    dx, dy = max(candidates, key=lambda shift: _overlap_score(a, b, *shift))
+    return (dx * 72 / dpi, dy * 72 / dpi)
+
+
+class PageTransform:
+    """new = scale * old + (tx, ty), in PDF points"""
+
+    def __init__(self, scale, tx, ty, method):
+        self.scale = scale
+        self.tx = tx
+        self.ty = ty
+        self.method = method
+
+    def point(self, x, y):
+        return self.scale * x + self.tx, self.scale * y + self.ty
+
+    def rect(self, rect):
+        x0, y0 = self.point(rect[0], rect[1])
+        x1, y1 = self.point(rect[2], rect[3])
+        return (x0, y0, x1, y1)
+
+
+def register_pages(old, new):
+    """PageTransform taking points on old to points on new"""
+    scale = min(new.rect.width / old.rect.width, new.rect.height / old.rect.height)
+    if old.has_text and new.has_text:
+        found = register_by_text(old, new, scale)
+        if found is not None:
+            (tx, ty), _ = found
+            return PageTransform(scale, tx, ty, 'text')
+    tx, ty = register_by_raster(old, new, scale)
+    return PageTransform(scale, tx, ty, 'raster')
+
+
+def _ink_mask(arr, level=96):
+    return arr > level
+
+
+def _dilate(mask):
+    """3 x 3 binary dilation"""
+    out = mask.copy()
+    out[1:] |= mask[:-1]
+    out[:-1] |= mask[1:]
+    grown = out.copy()
+    grown[:, 1:] |= out[:, :-1]
+    grown[:, :-1] |= out[:, 1:]
+    return grown
+
+
+def _crop(arr, rect, dpi, shape=None):
+    scale = dpi / 72
+    x0, y0, x1, y1 = (int(round(v * scale)) for v in rect)
+    x0, y0 = max(x0, 0), max(y0, 0)
+    crop = arr[y0:max(y1, y0 + 1), x0:max(x1, x0 + 1)]
+    if shape is not None and crop.shape != shape:
+        padded = np.zeros(shape, np.uint8)
+        height, width = min(shape[0], crop.shape[0]), min(shape[1], crop.shape[1])
+        padded[:height, :width] = crop[:height, :width]
+        crop = padded
+    return crop
+
+
+def pixels_changed(old, old_rect, new, new_rect, transform):
+    """
+    Whether a region's ink differs between the revisions
+
+    Ink is compared with one pixel of slack either way, so registration
+    and antialiasing differences don't count as changes.
+    """
+    # The old page is rendered scale times finer, so both crops come out
+    # the same size
+    dpi = CHANGE_DPI
+    old_dpi = dpi * transform.scale
+    a = _crop(old.raster(dpi=old_dpi), old_rect, old_dpi)
+    b = _crop(new.raster(dpi=dpi), new_rect, dpi, a.shape)
+    ink_a, ink_b = _ink_mask(a), _ink_mask(b)
+    total = int(ink_a.sum() + ink_b.sum())
+    if not total:
+        return False
+    differ = int((ink_a & ~_dilate(ink_b)).sum() + (ink_b & ~_dilate(ink_a)).sum())
+    return differ / total > PIXEL_CHANGE_THRESHOLD
+
+
+class Migration:
+    """
+    A session mapped onto a new revision
+
+    rows: [(bubble_id, page, x, y)] in numbering order on the new PDF
+    regions: {bubble_id: (rect, tag)} as in ProjectState.regions
+    texts: {bubble_id: text} carried over, or read from the new text layer
+    changed: {bubble_id: 'text' | 'pixels' | 'unmatched'}
+    reocr: bubble IDs whose OCR region changed and needs OCR again
+    page_map: {old page: new page}
+    transforms: {old page: PageTransform}
+    """
+
+    def __init__(self):
+        self.rows = []
+        self.regions = {}
+        self.texts = {}
+        self.changed = {}
+        self.reocr = []
+        self.page_map = {}
+        self.transforms = {}
+        self.stats = {}
+
+    def columns(self):
+        """(ids, pages, xs, ys) for BubbleStore.load_columns"""
+        if not self.rows:
+            return [], [], [], []
+        return tuple(list(column) for column in zip(*self.rows))
+
+
+def migrate(old_pdf, new_pdf, state, progress=None):
+    """
+    Map the bubbles, regions and text of a session on old_pdf to new_pdf
+
+    Args:
+        old_pdf: drawing the session was made on
+        new_pdf: the new revision
+        state: ProjectState of the session
+        progress: optional callable(step, steps)
+
+    Returns:
+        Migration
+    """
+    start = time.perf_counter()
+    migration = Migration()
+    with fitz.open(old_pdf) as old_doc, fitz.open(new_pdf) as new_doc:
+        old_index, new_index = TextLayerIndex(old_doc), TextLayerIndex(new_doc)
+        old_pages = [PageInfo(old_doc, old_index, n) for n in range(len(old_doc))]
+        new_pages = [PageInfo(new_doc, new_index, n) for n in range(len(new_doc))]
+        matches = match_pages(old_pages, new_pages)
+        migration.page_map = {old: new for old, (new, _) in matches.items()}
+
+        used_pages = sorted({page for _, page, _, _ in state.rows()})
+        for step, old_page in enumerate(used_pages, 1):
+            if old_page in matches:
+                migration.transforms[old_page] = register_pages(
+                    old_pages[old_page], new_pages[matches[old_page][0]])
+            if progress:
+                progress(step, len(used_pages) + 1)
+
+        last_page = len(new_doc) - 1
+        rows = []
+        for order, (bubble_id, page, x, y) in enumerate(state.rows()):
+            transform = migration.transforms.get(page)
+            region = state.region(bubble_id)
+            if transform is None:
+                # The sheet is gone or unrecognisable: keep the bubble
+                # where it was so nothing is lost, and flag it
+                new_page = min(page, last_page)
+                migration.changed[bubble_id] = 'unmatched'
+                rows.append((new_page, order, bubble_id, x, y))
+                if region is not None:
+                    migration.regions[bubble_id] = state.regions[bubble_id]
+                if bubble_id in state.texts:
+                    migration.texts[bubble_id] = state.texts[bubble_id]
+                continue
+            new_page = migration.page_map[page]
+            rows.append((new_page, order, bubble_id) + transform.point(x, y))
+            old_text = state.texts.get(bubble_id)
+            if old_text is not None:
+                migration.texts[bubble_id] = old_text
+            if region is None:
+                continue
+            rect, source, _ = region
+            new_rect = transform.rect(rect)
+            migration.regions[bubble_id] = (new_rect, state.regions[bubble_id][1])
+            old_info, new_info = old_pages[page], new_pages[new_page]
+            if old_info.has_text and new_info.has_text:
+                new_text = new_index.text_in(new_page, to_fitz_rect(new_rect))
+                if normalize_text(new_text) != normalize_text(
+                        old_index.text_in(page, to_fitz_rect(rect))):
+                    migration.changed[bubble_id] = 'text'
+                    if source == 'text':
+                        migration.texts[bubble_id] = new_text
+                    else:
+                        migration.reocr.append(bubble_id)
+            elif pixels_changed(old_info, rect, new_info, new_rect, transform):
+                migration.changed[bubble_id] = 'pixels'
+                migration.reocr.append(bubble_id)
+
+        rows.sort()
+        migration.rows = [(bubble_id, page, x, y) for page, _, bubble_id, x, y in rows]
+    if progress:
+        progress(len(used_pages) + 1, len(used_pages) + 1)
+    migration.stats = {
+        'bubbles': len(migration.rows),
+        'pages_matched': len(matches),
+        'old_pages': len(old_pages),
+        'new_pages': len(new_pages),
+        'changed': len(migration.changed),
+        'reocr': len(migration.reocr),
+        'unmatched': sum(1 for reason in migration.changed.values() if reason == 'unmatched'),
+        'seconds': time.perf_counter() - start,
+    }
+    return migration
@@ -0,0 +1,274 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Mon Oct 19 00:12:46 2026
+
+@author: hendrik
+
+Full-text search across every ballooned drawing.
+
+One SQLite file holds each drawing's text layer, line by line, and its
+bubble text (OCR or text layer), each with its page and rect, in an
+FTS5 index. A drawing's text layer is read again only when the file
+changes, and its bubble text is replaced whenever a session is saved or a
+batch finishes with it, so the index stays current without rebuilds.
+
+Drawing text is split for the index so that a query matches the way
+callouts are written: decimals stay whole ('12.00' is one word), the
+diameter signs (Ø, ⌀, ∅) are one word of their own whichever is used,
+and case and full stops don't matter. Every word of a query must occur
+in a hit, and a trailing * matches a prefix: 'Ø12.00 H7', 'M6*'.
+"""
+
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import namedtuple
+
+# path, page, rect (x0, y0, x1, y1) in PDF points, kind 'text' (text layer
+# line) or 'bubble', bubble_id (None from the text layer and from batches)
+# and the text as it appears on the drawing
+SearchHit = namedtuple('SearchHit', 'path page rect kind bubble_id text')
+
+TOKENIZER = "unicode61 remove_diacritics 2 tokenchars '.'"
+# Half size (points) of the box searched around a bubble without a region
+BUBBLE_BOX = 8
+
+_diameter = re.compile('[Øø⌀∅]')
+# Full stops that aren't decimal points
+_stop = re.compile(r'(?<!\d)\.|\.(?!\d)')
+
+
+def normalize(text):
+    """Text as it goes into the index and into queries"""
+    return _stop.sub(' ', _diameter.sub(' Ø ', text))
+
+
+def document_key(pdf_path):
+    """How a drawing's path is stored, and returned in SearchHit.path"""
+    return os.path.normcase(os.path.abspath(pdf_path))
+
+
+def match_query(query):
+    """
+    FTS5 MATCH expression for a plain search string
+
+    Every word is quoted, so punctuation in it can't be taken for query
+    syntax; a trailing * keeps prefix matching.
+
+    Returns:
+        str: the expression, '' when the query has no words
+    """
+    terms = []
+    for word in normalize(query).split():
+        prefix = word.endswith('*')
+        word = word.rstrip('*').replace('"', '""')
+        if word:
+            terms.append(f'"{word}"' + ('*' if prefix else ''))
+    return ' '.join(terms)
+
+
+class SearchIndex:
+    """
+    SQLite FTS5 index of drawing text layers and bubble text.
+
+    Hits live in a plain table keyed by document, and a contentless FTS5
+    table indexes their normalized text, so a drawing's hits can be
+    replaced through the document index instead of a scan of the whole
+    FTS table. Safe to use from several threads; text layers are read
+    outside the lock, so a search never waits for a PDF.
+    """
+
+    def __init__(self, db_path=None):
+        """
+        Args:
+            db_path: SQLite file, None for an in-memory index
+        """
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        if db_path:
+            directory = os.path.dirname(db_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+        self._db = sqlite3.connect(db_path or ':memory:', check_same_thread=False)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute('PRAGMA synchronous=NORMAL')
+        self._db.execute(
+            'CREATE TABLE IF NOT EXISTS documents ('
+            ' id INTEGER PRIMARY KEY, path TEXT UNIQUE NOT NULL,'
+            ' mtime_ns INTEGER, size INTEGER, pages INTEGER, indexed_at REAL)')
+        self._db.execute(
+            'CREATE TABLE IF NOT EXISTS hits ('
+            ' id INTEGER PRIMARY KEY, doc_id INTEGER NOT NULL, kind TEXT NOT NULL,'
+            ' page INTEGER NOT NULL, x0 REAL, y0 REAL, x1 REAL, y1 REAL,'
+            ' bubble_id INTEGER, text TEXT NOT NULL)')
+        self._db.execute('CREATE INDEX IF NOT EXISTS hits_doc ON hits(doc_id, kind)')
+        self._db.execute(
+            'CREATE VIRTUAL TABLE IF NOT EXISTS hits_fts USING fts5('
+            f'text, content=\'\', tokenize="{TOKENIZER}")')
+        self._db.commit()
+
+    def _document_id(self, path, **fields):
+        """ID of a document row, created if missing; fields are updated"""
+        row = self._db.execute('SELECT id FROM documents WHERE path = ?', (path,)).fetchone()
+        if row is None:
+            cursor = self._db.execute('INSERT INTO documents (path) VALUES (?)', (path,))
+            doc_id = cursor.lastrowid
+        else:
+            doc_id = row[0]
+        if fields:
+            assignments = ', '.join(f'{name} = ?' for name in fields)
+            self._db.execute(f'UPDATE documents SET {assignments} WHERE id = ?',
+                             (*fields.values(), doc_id))
+        return doc_id
+
+    def _replace_hits(self, doc_id, kind, hits):
+        """Swap the document's hits of a kind for hits [(page, rect, bubble_id, text)]"""
+        old = self._db.execute('SELECT id, text FROM hits WHERE doc_id = ? AND kind = ?',
+                               (doc_id, kind)).fetchall()
+        if old:
+            # Contentless FTS rows are deleted with the text they were indexed with
+            self._db.executemany("INSERT INTO hits_fts (hits_fts, rowid, text) "
+                                 "VALUES ('delete', ?, ?)",
+                                 [(hit_id, normalize(text)) for hit_id, text in old])
+            self._db.execute('DELETE FROM hits WHERE doc_id = ? AND kind = ?', (doc_id, kind))
+        next_id = self._db.execute('SELECT COALESCE(MAX(id), 0) + 1 FROM hits').fetchone()[0]
+        rows = []
+        for hit_id, (page, rect, bubble_id, text) in enumerate(hits, next_id):
+            x0, y0, x1, y1 = rect if rect is not None else (None,) * 4
+            rows.append((hit_id, doc_id, kind, page, x0, y0, x1, y1, bubble_id, text))
+        self._db.executemany('INSERT INTO hits (id, doc_id, kind, page, x0, y0, x1, y1,'
+                             ' bubble_id, text) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)', rows)
+        self._db.executemany('INSERT INTO hits_fts (rowid, text) VALUES (?, ?)',
+                             [(row[0], normalize(row[-1])) for row in rows])
+
+    def needs_indexing(self, pdf_path):
+        """True when the drawing's text layer isn't indexed as it is on disk"""
+        stat = os.stat(pdf_path)
+        with self._lock:
+            row = self._db.execute('SELECT mtime_ns, size FROM documents WHERE path = ?',
+                                   (document_key(pdf_path),)).fetchone()
+        return row is None or tuple(row) != (stat.st_mtime_ns, stat.st_size)
+
+    def index_pdf(self, pdf_path, force=False):
+        """
+        Index the text layer of a drawing unless it is unchanged since
+
+        Returns:
+            bool: whether it was (re)indexed
+        """
+        if not force and not self.needs_indexing(pdf_path):
+            return False
+        import fitz  # PyMuPDF
+        from doc_pipeline import text_layer_lines
+        stat = os.stat(pdf_path)
+        with fitz.open(pdf_path) as doc:
+            pages = len(doc)
+            lines = [(page.number, rect, text)
+                     for page in doc for text, rect in text_layer_lines(page)]
+        self.set_text_layer(pdf_path, lines, pages, stat)
+        return True
+
+    def set_text_layer(self, pdf_path, lines, pages=None, stat=None):
+        """
+        Replace the text layer of a drawing
+
+        Args:
+            lines: iterable of (page, rect, text)
+            pages: page count
+            stat: os.stat_result of the file the lines came from, so
+                index_pdf can tell when it changes
+        """
+        hits = [(page, rect, None, text) for page, rect, text in lines]
+        fields = {'pages': pages, 'indexed_at': time.time()}
+        if stat is not None:
+            fields.update(mtime_ns=stat.st_mtime_ns, size=stat.st_size)
+        with self._lock, self._db:
+            self._replace_hits(self._document_id(document_key(pdf_path), **fields), 'text', hits)
+
+    def set_bubbles(self, pdf_path, bubbles):
+        """
+        Replace the bubble text of a drawing
+
+        Args:
+            pdf_path: the drawing
+            bubbles: iterable of (bubble_id, page, rect, text), rect in PDF
+                points (see bubble_hits)
+        """
+        hits = []
+        for bubble_id, page, rect, text in bubbles:
+            if text and text.strip():
+                hits.append((page, tuple(rect), bubble_id, text))
+        with self._lock, self._db:
+            self._replace_hits(self._document_id(document_key(pdf_path)), 'bubble', hits)
+
+    def remove(self, pdf_path):
+        """Drop a drawing and its hits"""
+        with self._lock, self._db:
+            row = self._db.execute('SELECT id FROM documents WHERE path = ?',
+                                   (document_key(pdf_path),)).fetchone()
+            if row is None:
+                return
+            for kind in ('text', 'bubble'):
+                self._replace_hits(row[0], kind, [])
+            self._db.execute('DELETE FROM documents WHERE id = ?', (row[0],))
+
+    def search(self, query, limit=100):
+        """
+        Hits whose text has every word of query, most recently indexed
+        first
+
+        Every hit has all the words, so ranking adds little to short
+        drawing text, and FTS5 can stop at limit when it walks rowids
+        instead of scoring every match of a common word like THRU.
+
+        Returns:
+            list of SearchHit
+        """
+        expression = match_query(query)
+        if not expression:
+            return []
+        with self._lock:
+            rows = self._db.execute(
+                'SELECT d.path, h.page, h.x0, h.y0, h.x1, h.y1, h.kind, h.bubble_id, h.text'
+                ' FROM (SELECT rowid FROM hits_fts WHERE hits_fts MATCH ?'
+                '       ORDER BY rowid DESC LIMIT ?) AS f'
+                ' JOIN hits h ON h.id = f.rowid JOIN documents d ON d.id = h.doc_id'
+                ' ORDER BY h.id DESC', (expression, limit)).fetchall()
+        return [SearchHit(path, page, None if x0 is None else (x0, y0, x1, y1), kind,
+                          bubble_id, text)
+                for path, page, x0, y0, x1, y1, kind, bubble_id, text in rows]
+
+    def stats(self):
+        with self._lock:
+            documents = self._db.execute('SELECT COUNT(*) FROM documents').fetchone()[0]
+            hits = self._db.execute('SELECT COUNT(*) FROM hits').fetchone()[0]
+        return {'documents': documents, 'hits': hits}
+
+    def close(self):
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+
+def bubble_hits(bubbles, regions, texts):
+    """
+    (bubble_id, page, rect, text) rows for SearchIndex.set_bubbles
+
+    Args:
+        bubbles: BubbleStore
+        regions: {bubble_id: rect} of the bubbles with a region
+        texts: {bubble_id: text}
+    """
+    rows = []
+    for bubble_id, text in texts.items():
+        if bubble_id not in bubbles:
+            continue
+        rect = regions.get(bubble_id)
+        if rect is None:
+            x, y = bubbles.position(bubble_id)
+            rect = (x - BUBBLE_BOX, y - BUBBLE_BOX, x + BUBBLE_BOX, y + BUBBLE_BOX)
+        rows.append((bubble_id, bubbles.page_of(bubble_id), tuple(rect), text))
+    return rows
@@ -0,0 +1,115 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Mon Oct 19 00:41:09 2026
+
+@author: hendrik
+"""
+
+import os
+import time
+
+from PyQt5.QtCore import Qt, QTimer, pyqtSignal
+from PyQt5.QtWidgets import (QDockWidget, QWidget, QVBoxLayout, QLineEdit, QLabel,
+                             QTableWidget, QTableWidgetItem, QHeaderView, QAbstractItemView)
+
+# Typing pauses this long before the search runs
+SEARCH_DELAY_MS = 150
+MAX_RESULTS = 200
+
+
+class SearchPanel(QDockWidget):
+    """
+    Dock searching the text of every indexed drawing.
+
+    Searches as the query is typed; activating a result emits hit_activated
+    with its search_index.SearchHit.
+    """
+
+    COLUMNS = ('Drawing', 'Page', 'Kind', 'Text')
+
+    hit_activated = pyqtSignal(object)
+
+    def __init__(self, search, parent=None):
+        """
+        Args:
+            search: callable(query, limit) returning SearchHits
+        """
+        super().__init__('Search', parent)
+        self.setObjectName('search_panel')
+        self.search = search
+        self.hits = []
+
+        widget = QWidget()
+        layout = QVBoxLayout()
+
+        self.query_edit = QLineEdit()
+        self.query_edit.setPlaceholderText('Search drawings and bubbles, e.g. Ø12.00 H7 or M6*')
+        self.query_edit.setClearButtonEnabled(True)
+        self.query_edit.textChanged.connect(self.schedule_search)
+        self.query_edit.returnPressed.connect(self.activate_first)
+        layout.addWidget(self.query_edit)
+
+        self.table = QTableWidget(0, len(self.COLUMNS))
+        self.table.setHorizontalHeaderLabels(self.COLUMNS)
+        self.table.verticalHeader().setVisible(False)
+        self.table.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.table.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.table.horizontalHeader().setSectionResizeMode(3, QHeaderView.Stretch)
+        self.table.cellClicked.connect(self.on_cell_clicked)
+        layout.addWidget(self.table)
+
+        self.status_label = QLabel()
+        layout.addWidget(self.status_label)
+
+        widget.setLayout(layout)
+        self.setWidget(widget)
+
+        self.search_timer = QTimer(self)
+        self.search_timer.setSingleShot(True)
+        self.search_timer.timeout.connect(self.run_search)
+
+    def focus_query(self):
+        self.show()
+        self.raise_()
+        self.query_edit.setFocus()
+        self.query_edit.selectAll()
+
+    def schedule_search(self):
+        self.search_timer.start(SEARCH_DELAY_MS)
+
+    def run_search(self):
+        query = self.query_edit.text()
+        start = time.perf_counter()
+        try:
+            self.hits = self.search(query, MAX_RESULTS) if query.strip() else []
+        except Exception as e:
+            self.hits = []
+            self.status_label.setText(f'Search failed: {str(e)}')
+        else:
+            if query.strip():
+                more = '+' if len(self.hits) == MAX_RESULTS else ''
+                self.status_label.setText(f'{len(self.hits)}{more} hits in '
+                                          f'{(time.perf_counter() - start) * 1000:.1f} ms')
+            else:
+                self.status_label.clear()
+        self.table.setRowCount(len(self.hits))
+        for row, hit in enumerate(self.hits):
+            values = (os.path.basename(hit.path), hit.page + 1, hit.kind, hit.text)
+            for col, value in enumerate(values):
+                item = QTableWidgetItem(str(value))
+                if col == 0:
+                    item.setToolTip(hit.path)
+                elif col == 1:
+                    item.setTextAlignment(Qt.AlignRight | Qt.AlignVCenter)
+                self.table.setItem(row, col, item)
+
+    def activate_first(self):
+        self.search_timer.stop()
+        self.run_search()
+        if self.hits:
+            self.table.selectRow(0)
+            self.hit_activated.emit(self.hits[0])
+
+    def on_cell_clicked(self, row, column):
+        if 0 <= row < len(self.hits):
+            self.hit_activated.emit(self.hits[row])
@@ -0,0 +1,23 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Mon Oct 19 09:02:14 2026
+
+@author: hendrik
+"""
+
+import os
+import sys
+
+import pytest
+
+# The modules live at the repository root, next to this directory
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Widgets are created without a display
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+
+@pytest.fixture(scope='session')
+def qapp():
+    from PyQt5.QtWidgets import QApplication
+    return QApplication.instance() or QApplication([])
@@ -0,0 +1,66 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Mon Oct 19 11:52:08 2026
+
+@author: hendrik
+
+What classify_text balloons and what it leaves alone.
+"""
+
+import pytest
+
+from auto_balloon import classify_text, features_from_lines
+
+
+@pytest.mark.parametrize('text', [
+    # Dates
+    '2026-10-18', '18.10.2026', '10/18/2026', '18/10/26', '2026.10.18',
+    # Drawing and part numbers, title block
+    'DWG 4711-002', '4711-002-A', 'PART NO. 12345', '12.345.678', 'REV B', 'A3',
+    'SHEET 2 OF 5', 'SCALE 1:2',
+    # Bare integers: sheet, zone, item numbers
+    '12', '3', '2026', '12-05',
+    '', '   ',
+])
+def test_skipped(text):
+    assert classify_text(text) is None
+
+
+@pytest.mark.parametrize('text', ['Ø12.00', '⌀12.00', '∅12.00', 'ø12.00', '∅ 6 THRU', 'ø6',
+                                  'Ø 12.00 THRU', '4x Ø6.5 THRU', 'Ø10 x 20 DEEP'])
+def test_diameter_signs(text):
+    assert classify_text(text) == 'dimension'
+
+
+@pytest.mark.parametrize('text', ['12.00', '3.2', '12,5', '.250', '25.4 mm', 'R5', 'R2.5 TYP',
+                                  'SR10', 'M6x1', '45°', '2x 45°', '100 x 50'])
+def test_dimensions(text):
+    assert classify_text(text) == 'dimension'
+
+
+@pytest.mark.parametrize('text', [
+    '12.00 ±0.05', '∅25 ±0.1', '+0.1/-0.05', '12.00-12.05', 'Ø12.00-12.05',
+    # Fits
+    'Ø12 H7', '⌀6 H7', '12 H7/g6', '20 g6',
+])
+def test_tolerances(text):
+    assert classify_text(text) == 'tolerance'
+
+
+@pytest.mark.parametrize('text', ['⌖ 0.1 A', '|0.05| A', '⏥ 0.02', '⊥ 0.05 B'])
+def test_gdt(text):
+    assert classify_text(text) == 'gdt'
+
+
+@pytest.mark.parametrize('text', ['NOTES:', 'NOTE 3', '1. DEBURR ALL EDGES',
+                                  '2) BREAK SHARP CORNERS'])
+def test_notes(text):
+    assert classify_text(text) == 'note'
+
+
+def test_features_from_lines():
+    lines = [('  Ø6 ', (0, 0, 1, 1)), ('SHEET 1', (2, 2, 3, 3)), ('12.00 ±0.1', (4, 4, 5, 5))]
+    features = features_from_lines(lines, 2, 'ocr')
+    assert [(f.kind, f.text, f.rect) for f in features] == [
+        ('dimension', 'Ø6', (0, 0, 1, 1)), ('tolerance', '12.00 ±0.1', (4, 4, 5, 5))]
+    assert {(f.page, f.source) for f in features} == {(2, 'ocr')}
@@ -0,0 +1,159 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Mon Oct 19 11:20:16 2026
+
+@author: hendrik
+
+Full and incremental bubble export.
+"""
+
+import os
+
+import fitz  # PyMuPDF
+import pytest
+
+from bubble_export import (BUBBLE_STREAM_KEY, export_bubbles, remove_page_bubbles,
+                           update_bubbles)
+from bubble_store import BubbleStore
+
+
+@pytest.fixture
+def drawing(tmp_path):
+    path = str(tmp_path / 'drawing.pdf')
+    doc = fitz.open()
+    for number in range(3):
+        page = doc.new_page(width=595, height=842)
+        page.insert_text((72, 72), f'SHEET {"ABC"[number]} GENERAL NOTES', fontsize=11)
+        page.draw_rect(fitz.Rect(20, 20, 575, 822), color=(0, 0, 0))
+    doc.save(path)
+    doc.close()
+    return path
+
+
+def streams(path):
+    """{page: [(xref, tagged, stream bytes)]} of a PDF's page contents"""
+    pages = {}
+    with fitz.open(path) as doc:
+        for page in doc:
+            pages[page.number] = [
+                (xref, doc.xref_get_key(xref, BUBBLE_STREAM_KEY)[1] == 'true',
+                 doc.xref_stream(xref))
+                for xref in page.get_contents()]
+    return pages
+
+
+def labels(path):
+    """{page: [(number, x, y)]} of the bubble numbers drawn on each page"""
+    found = {}
+    with fitz.open(path) as doc:
+        for page in doc:
+            found[page.number] = sorted(
+                (int(w[4]), round((w[0] + w[2]) / 2), round((w[1] + w[3]) / 2))
+                for w in page.get_text('words') if w[4].isdigit())
+    return found
+
+
+def untagged(pages):
+    return {page: [s for s in contents if not s[1]] for page, contents in pages.items()}
+
+
+def test_export_tags_one_stream_per_page(drawing, tmp_path):
+    out = str(tmp_path / 'out.pdf')
+    store = BubbleStore()
+    store.add(0, 100, 200)
+    store.add(2, 300, 400)
+    assert export_bubbles(drawing, out, store) == 2
+    pages = streams(out)
+    assert [sum(tagged for _, tagged, _ in pages[p]) for p in range(3)] == [1, 0, 1]
+    assert untagged(pages) == untagged(streams(drawing))
+    assert labels(out) == {0: [(1, 100, 200)], 1: [], 2: [(2, 300, 400)]}
+
+
+def test_update_replaces_only_tagged_streams(drawing, tmp_path):
+    out = str(tmp_path / 'out.pdf')
+    store = BubbleStore()
+    first = store.add(0, 100, 200)
+    moved = store.add(1, 150, 250)
+    store.add(2, 300, 400)
+    export_bubbles(drawing, out, store)
+    with open(out, 'rb') as file:
+        exported = file.read()
+    before = streams(out)
+    store.mark_clean()
+
+    store.move(moved, 160, 300)
+    assert store.dirty_pages == {1}
+    assert update_bubbles(out, store, store.dirty_pages) == 1
+
+    # Appended: the file starts with the previous export byte for byte
+    with open(out, 'rb') as file:
+        assert file.read(len(exported)) == exported
+    after = streams(out)
+    assert after[0] == before[0] and after[2] == before[2]
+    assert untagged(after) == untagged(before) == untagged(streams(drawing))
+    tagged = [s for s in after[1] if s[1]]
+    assert len(tagged) == 1 and tagged[0] not in before[1]
+    assert labels(out) == {0: [(1, 100, 200)], 1: [(2, 160, 300)], 2: [(3, 300, 400)]}
+
+    # Deleting renumbers every later page; emptied pages lose their stream
+    store.mark_clean()
+    store.remove(first)
+    assert update_bubbles(out, store, store.dirty_pages) == 3
+    after = streams(out)
+    assert not any(tagged for _, tagged, _ in after[0])
+    assert untagged(after) == untagged(streams(drawing))
+    assert labels(out) == {0: [], 1: [(1, 160, 300)], 2: [(2, 300, 400)]}
+
+
+def test_update_with_dict_and_no_pages(drawing, tmp_path):
+    out = str(tmp_path / 'out.pdf')
+    export_bubbles(drawing, out, {0: [(50, 60)], 1: [(70, 80)]})
+    size = os.path.getsize(out)
+    assert update_bubbles(out, {0: [(50, 60)], 1: [(70, 80)]}, []) == 0
+    assert os.path.getsize(out) == size
+    update_bubbles(out, {1: [(90, 100)]}, [0, 1, 7])
+    assert labels(out) == {0: [], 1: [(1, 90, 100)], 2: []}
+
+
+def test_remove_page_bubbles_keeps_drawing(drawing, tmp_path):
+    out = str(tmp_path / 'out.pdf')
+    export_bubbles(drawing, out, {0: [(50, 60), (80, 90)]})
+    with fitz.open(out) as doc:
+        assert remove_page_bubbles(doc[0]) == 1
+        assert remove_page_bubbles(doc[0]) == 0
+        assert remove_page_bubbles(doc[1]) == 0
+        assert 'SHEET A' in doc[0].get_text()
+
+
+def test_placer_falls_back_to_full_export(qapp, drawing, tmp_path):
+    from untitled10 import InteractivePDFBubblePlacer
+    window = InteractivePDFBubblePlacer(search_index_path=str(tmp_path / 'search.sqlite3'))
+    try:
+        out = str(tmp_path / 'out.pdf')
+        bubble_id = window.bubbles.add(0, 100, 200)
+        window.bubbles.add(1, 120, 220)
+        assert not window.can_update_export(drawing, out)
+        assert window.create_bubble_overlay(drawing, out) == 'full'
+        assert window.can_update_export(drawing, out)
+
+        window.bubbles.move(bubble_id, 110, 210)
+        assert window.create_bubble_overlay(drawing, out) == 'incremental'
+        assert labels(out)[0] == [(1, 110, 210)]
+
+        # Somebody else changed the file: it is written from scratch
+        with fitz.open(out) as doc:
+            doc[2].insert_text((72, 300), 'STAMPED')
+            doc.saveIncr()
+        assert not window.can_update_export(drawing, out)
+        window.bubbles.move(bubble_id, 130, 230)
+        assert window.create_bubble_overlay(drawing, out) == 'full'
+        with open(out, 'rb') as file:
+            assert file.read().count(b'%%EOF') == 1
+        assert labels(out)[0] == [(1, 130, 230)]
+        with fitz.open(out) as doc:
+            assert 'STAMPED' not in doc[2].get_text()
+
+        # A different source drawing also needs a full export
+        assert not window.can_update_export(str(tmp_path / 'other.pdf'), out)
+    finally:
+        window.close()
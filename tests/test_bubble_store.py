@@ -0,0 +1,206 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Mon Oct 19 09:05:40 2026
+
+@author: hendrik
+
+BubbleStore against a plain list-of-lists model of the same edits.
+"""
+
+import random
+
+import pytest
+
+from bubble_store import BubbleStore, SpatialGrid
+
+
+class Model:
+    """The bubbles as {page: [[id, x, y], ...]}, numbering by page then position"""
+
+    def __init__(self):
+        self.pages = {}
+
+    def rows(self):
+        return [(bubble_id, page, x, y) for page in sorted(self.pages)
+                for bubble_id, x, y in self.pages[page]]
+
+    def find(self, bubble_id):
+        for page, bubbles in self.pages.items():
+            for i, bubble in enumerate(bubbles):
+                if bubble[0] == bubble_id:
+                    return page, i
+        raise KeyError(bubble_id)
+
+    def insert(self, page, index, bubble_id, x, y):
+        bubbles = self.pages.setdefault(page, [])
+        if index is None or index >= len(bubbles):
+            index = len(bubbles)
+        bubbles.insert(max(index, 0), [bubble_id, x, y])
+
+    def remove(self, bubble_id):
+        page, i = self.find(bubble_id)
+        bubble = self.pages[page].pop(i)
+        if not self.pages[page]:
+            del self.pages[page]
+        return page, bubble
+
+
+def check(store, model):
+    rows = model.rows()
+    assert list(store) == rows
+    assert len(store) == len(rows)
+    ids, pages, xs, ys = store.columns()
+    assert list(zip(ids, pages, xs, ys)) == rows
+    assert store.pages() == sorted(model.pages)
+    for number, (bubble_id, page, x, y) in enumerate(rows, 1):
+        assert bubble_id in store
+        assert store.page_of(bubble_id) == page
+        assert store.position(bubble_id) == (x, y)
+        assert store.number(bubble_id) == number
+        assert store.id_at(number - 1) == bubble_id
+    for page in range(6):
+        before = sum(len(b) for p, b in model.pages.items() if p < page)
+        assert store.count_before_page(page) == before
+        assert store.page_ids(page) == [b[0] for b in model.pages.get(page, [])]
+    with pytest.raises(IndexError):
+        store.id_at(len(rows))
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_random_edits_match_model(seed):
+    rng = random.Random(seed)
+    store, model = BubbleStore(), Model()
+    issued = set()
+    for step in range(400):
+        ids = [row[0] for row in model.rows()]
+        op = rng.random()
+        if op < 0.35 or not ids:
+            page = rng.randrange(5)
+            index = rng.choice([None, 0, 1, 5])
+            x, y = rng.uniform(0, 500), rng.uniform(0, 500)
+            bubble_id = store.insert(page, index, x, y)
+            # IDs are never reused, not even after a removal
+            assert bubble_id not in issued
+            issued.add(bubble_id)
+            model.insert(page, index, bubble_id, x, y)
+        elif op < 0.55:
+            bubble_id = rng.choice(ids)
+            x, y = rng.uniform(0, 500), rng.uniform(0, 500)
+            store.move(bubble_id, x, y)
+            page, i = model.find(bubble_id)
+            model.pages[page][i][1:] = [x, y]
+        elif op < 0.7:
+            bubble_id = rng.choice(ids)
+            store.remove(bubble_id)
+            model.remove(bubble_id)
+        elif op < 0.85:
+            bubble_id = rng.choice(ids)
+            index = rng.randrange(6)
+            store.reorder(bubble_id, index)
+            page, bubble = model.remove(bubble_id)
+            model.insert(page, index, *bubble)
+        elif op < 0.9:
+            page = rng.randrange(5)
+            removed = store.clear_page(page)
+            assert removed == [b[0] for b in model.pages.pop(page, [])]
+        else:
+            # Only the numbering is asked for, which extends the lazy prefix sums
+            if ids:
+                store.number(rng.choice(ids))
+        if step % 20 == 0:
+            check(store, model)
+    check(store, model)
+
+
+def test_reorder_keeps_id_and_region():
+    store = BubbleStore()
+    a, b, c = (store.add(0, x, 10) for x in (10, 20, 30))
+    store.set_region(c, (25, 5, 35, 15))
+    store.reorder(c, 0)
+    assert [row[0] for row in store] == [c, a, b]
+    assert store.number(c) == 1
+    assert store.region(c) == (25, 5, 35, 15)
+    assert store.regions_at(0, 30, 10) == {c}
+
+
+def test_version_and_dirty_pages():
+    store = BubbleStore()
+    version = store.version
+    bubble_id = store.add(2, 1, 1)
+    assert store.version > version and store.dirty_pages == {2}
+    store.mark_clean()
+    store.add(1, 1, 1)
+    # Every later page's numbers shift
+    assert store.dirty_pages == {1, 2}
+    store.mark_clean()
+    store.move(bubble_id, 5, 5)
+    assert store.dirty_pages == {2}
+
+
+def test_load_columns_round_trip_and_fresh_ids():
+    store = BubbleStore()
+    for i in range(10):
+        store.add(i % 3, i, i * 2)
+    store.remove(store.id_at(4))
+    loaded = BubbleStore()
+    loaded.load_columns(store.columns())
+    assert list(loaded) == list(store)
+    assert loaded.add(0, 0, 0) > max(row[0] for row in store)
+    with pytest.raises(ValueError):
+        loaded.insert(0, None, 0, 0, bubble_id=loaded.id_at(0))
+
+
+def test_load_columns_never_reuses_issued_ids():
+    store = BubbleStore()
+    ids = [store.add(0, i, i) for i in range(5)]
+    # The highest bubble is deleted, and the session reloaded in place
+    store.remove(ids[-1])
+    store.load_columns(store.columns())
+    assert store.add(0, 9, 9) > ids[-1]
+    store.load_columns(([], [], [], []))
+    assert store.add(0, 9, 9) > ids[-1] + 1
+
+
+def test_load_columns_rejects_duplicates_before_replacing():
+    store = BubbleStore()
+    kept = [store.add(0, 1, 1), store.add(1, 2, 2)]
+    rows = list(store)
+    version = store.version
+    with pytest.raises(ValueError):
+        store.load_columns(([7, 8, 7], [0, 0, 1], [0.0] * 3, [0.0] * 3))
+    assert list(store) == rows and store.version == version
+    assert store.hit_test(0, 1, 1, 1) == kept[0]
+
+
+def test_hit_test_and_rect_queries_match_brute_force():
+    rng = random.Random(7)
+    store = BubbleStore()
+    points = {store.add(0, rng.uniform(0, 300), rng.uniform(0, 300)): None for _ in range(300)}
+    for bubble_id in points:
+        points[bubble_id] = store.position(bubble_id)
+    for _ in range(100):
+        x, y, radius = rng.uniform(0, 300), rng.uniform(0, 300), rng.uniform(1, 20)
+        near = {b: (px - x) ** 2 + (py - y) ** 2 for b, (px, py) in points.items()}
+        within = {b: d for b, d in near.items() if d <= radius * radius}
+        hit = store.hit_test(0, x, y, radius)
+        if within:
+            assert near[hit] == min(within.values())
+        else:
+            assert hit is None
+        rect = (x, y, x + radius * 3, y + radius * 2)
+        assert store.bubbles_in_rect(0, rect) == {
+            b for b, (px, py) in points.items()
+            if rect[0] <= px <= rect[2] and rect[1] <= py <= rect[3]}
+    assert store.hit_test(1, 0, 0, 10) is None
+
+
+def test_spatial_grid_reinsert_and_remove():
+    grid = SpatialGrid(cell_size=10)
+    grid.insert('a', (5, 5, 25, 25))
+    grid.insert('a', (50, 50, 40, 40))     # moved, corners in any order
+    assert grid.rect('a') == (40, 40, 50, 50)
+    assert grid.query((0, 0, 30, 30)) == set()
+    assert grid.query((45, 45, 45, 45)) == {'a'}
+    grid.remove('a')
+    grid.remove('a')
+    assert len(grid) == 0 and grid.query((0, 0, 100, 100)) == set()
@@ -0,0 +1,108 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Mon Oct 19 12:40:51 2026
+
+@author: hendrik
+
+OCRCache memory and SQLite tiers.
+"""
+
+import itertools
+
+import pytest
+from PIL import Image
+
+import ocr_cache
+from ocr_cache import OCRCache
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """A time.time() that ticks once per call, so LRU order is exact"""
+    ticks = itertools.count(1000)
+    monkeypatch.setattr(ocr_cache.time, 'time', lambda: float(next(ticks)))
+
+
+def test_make_key_follows_pixels_and_config():
+    image = Image.new('L', (20, 10), 255)
+    same = Image.new('L', (20, 10), 255)
+    assert OCRCache.make_key(image) == OCRCache.make_key(same)
+    assert OCRCache.make_key(image, 'psm 6') != OCRCache.make_key(image, 'psm 7')
+    assert OCRCache.make_key(image) != OCRCache.make_key(Image.new('L', (10, 20), 255))
+    assert OCRCache.make_key(image) != OCRCache.make_key(image.convert('RGB'))
+    same.putpixel((3, 3), 0)
+    assert OCRCache.make_key(image) != OCRCache.make_key(same)
+
+
+def test_memory_lru_eviction():
+    cache = OCRCache(max_entries=3)
+    for key in 'abc':
+        cache.put(key, key.upper())
+    assert cache.get('a') == 'A'          # a is now the most recent
+    cache.put('d', 'D')                   # evicts b
+    assert cache.get('b') is None
+    assert [cache.get(k) for k in 'acd'] == ['A', 'C', 'D']
+    assert cache.stats()['memory_entries'] == 3
+
+
+def test_counters():
+    cache = OCRCache()
+    assert cache.stats()['hit_rate'] == 0.0
+    cache.get('x')
+    cache.put('x', 'Ø6 THRU', seconds=0.2)
+    cache.put('y', '', seconds=0.4)
+    assert cache.get('x') == 'Ø6 THRU'
+    assert cache.get('y') == ''           # an empty result is still a hit
+    cache.get('z')
+    stats = cache.stats()
+    assert (stats['hits'], stats['misses'], stats['disk_hits']) == (2, 2, 0)
+    assert stats['hit_rate'] == 0.5
+    # Each hit saves the mean OCR time of the misses
+    assert stats['seconds_saved'] == pytest.approx(2 * 0.6 / 2)
+
+
+def test_disk_tier_persists_across_instances(tmp_path):
+    path = str(tmp_path / 'cache' / 'ocr.sqlite3')
+    cache = OCRCache(db_path=path)
+    cache.put('k1', 'M6x1 - 6H')
+    cache.put('k1', '12.00 ±0.05')        # replaced, not counted twice
+    cache.put('k2', 'R5')
+    size = cache.stats()['disk_bytes']
+    assert size == 2 * len('k1') + len('12.00 ±0.05'.encode()) + len('R5')
+    cache.close()
+
+    reopened = OCRCache(db_path=path)
+    assert reopened.stats()['disk_bytes'] == size
+    assert reopened.get('k1') == '12.00 ±0.05'
+    assert reopened.get('k1') == '12.00 ±0.05'
+    stats = reopened.stats()
+    # The first lookup came from disk, the second from memory
+    assert (stats['hits'], stats['disk_hits'], stats['misses']) == (2, 1, 0)
+
+    reopened.clear()
+    assert reopened.get('k2') is None and reopened.stats()['disk_bytes'] == 0
+    reopened.close()
+    assert OCRCache(db_path=path).get('k2') is None
+
+
+def test_disk_tier_bounded_by_least_recent_use(tmp_path, clock):
+    path = str(tmp_path / 'ocr.sqlite3')
+    # Entries of 10 bytes (2 byte key, 8 byte text), room for 5
+    cache = OCRCache(max_entries=1, db_path=path, max_db_bytes=50)
+    for i in range(5):
+        cache.put(f'k{i}', f'text{i:04d}')
+    assert cache.stats()['disk_bytes'] == 50
+    # k0 read again from disk, so k1 is now the least recent
+    cache.get('k0')
+    cache.put('k5', 'text0005')
+    # Trimmed to 90 % of the budget: the two least recent rows go
+    assert cache.stats()['disk_bytes'] == 40
+    cache.close()
+
+    reopened = OCRCache(db_path=path, max_db_bytes=50)
+    assert {k for k in ('k0', 'k1', 'k2', 'k3', 'k4', 'k5') if reopened.get(k)} == {
+        'k0', 'k3', 'k4', 'k5'}
+    for _ in range(50):
+        reopened.put(f'n{_:02d}', 'x' * 20)
+        assert reopened.stats()['disk_bytes'] <= 50
+    reopened.close()
@@ -0,0 +1,179 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Mon Oct 19 12:14:37 2026
+
+@author: hendrik
+
+OCRWorkerPool with a fake OCR function that waits for the test.
+"""
+
+import threading
+import time
+
+import pytest
+
+from ocr_worker import OCRWorkerPool
+
+
+class FakeOCR:
+    """Upper-cases its 'image'; images named in hold wait for release()"""
+
+    def __init__(self, hold=()):
+        self.hold = set(hold)
+        self.calls = []
+        self.running = 0
+        self.peak = 0
+        self._lock = threading.Lock()
+        self._gate = threading.Event()
+
+    def __call__(self, image, preprocess=None):
+        with self._lock:
+            self.calls.append((image, preprocess))
+            self.running += 1
+            self.peak = max(self.peak, self.running)
+        try:
+            if image in self.hold:
+                assert self._gate.wait(10)
+            if image == 'bad':
+                raise RuntimeError('engine crashed')
+            return image.upper()
+        finally:
+            with self._lock:
+                self.running -= 1
+
+    def started(self, image):
+        with self._lock:
+            return any(call[0] == image for call in self.calls)
+
+    def release(self):
+        self._gate.set()
+
+
+def wait_for(qapp, predicate, timeout=5):
+    end = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < end, 'timed out'
+        qapp.processEvents()
+        time.sleep(0.002)
+
+
+def settle(qapp, pool):
+    """Run until nothing is queued or running, then deliver what's left"""
+    wait_for(qapp, lambda: not pool._futures and not pool._queue)
+    for _ in range(5):
+        qapp.processEvents()
+
+
+@pytest.fixture
+def make_pool(qapp):
+    pools = []
+
+    def make(ocr, **kwargs):
+        pool = OCRWorkerPool(ocr_func=ocr, **kwargs)
+        results, failures = [], []
+        pool.result_ready.connect(lambda b, text: results.append((b, text)))
+        pool.job_failed.connect(lambda b, error: failures.append((b, error)))
+        pools.append((pool, ocr))
+        return pool, results, failures
+    yield make
+    for pool, ocr in pools:
+        ocr.release()
+        pool.shutdown(wait=True)
+
+
+def test_resubmitted_bubble_emits_latest_only(qapp, make_pool):
+    ocr = FakeOCR(hold={'old', 'new'})
+    pool, results, failures = make_pool(ocr, max_workers=2)
+    pool.submit(1, 'old')
+    wait_for(qapp, lambda: ocr.started('old'))
+    pool.submit(1, 'new')
+    wait_for(qapp, lambda: ocr.started('new'))
+    # The superseded job still runs (tesseract can't be interrupted) but
+    # no longer counts
+    assert pool.pending_count() == 1 and ocr.running == 2
+    ocr.release()
+    settle(qapp, pool)
+    assert results == [(1, 'NEW')] and failures == []
+
+
+def test_resubmitted_queued_job_never_runs(qapp, make_pool):
+    ocr = FakeOCR(hold={'busy'})
+    pool, results, _ = make_pool(ocr, max_workers=1)
+    pool.submit(9, 'busy')
+    wait_for(qapp, lambda: ocr.started('busy'))
+    pool.submit(1, 'first')
+    pool.submit(1, 'second', preprocess='scan')
+    assert pool.is_pending(1) and pool.pending_count() == 2
+    ocr.release()
+    settle(qapp, pool)
+    assert [call for call in ocr.calls if call[0] != 'busy'] == [('second', 'scan')]
+    assert sorted(results) == [(1, 'SECOND'), (9, 'BUSY')]
+
+
+def test_cancelled_bubbles_emit_nothing(qapp, make_pool):
+    ocr = FakeOCR(hold={'running'})
+    pool, results, failures = make_pool(ocr, max_workers=1)
+    pool.submit(1, 'running')
+    wait_for(qapp, lambda: ocr.started('running'))
+    pool.submit(2, 'queued')
+    pool.submit(3, 'kept')
+    assert pool.cancel(1) and pool.cancel(2)
+    assert not pool.cancel(2)
+    assert not pool.is_pending(1) and not pool.is_pending(2) and pool.is_pending(3)
+    ocr.release()
+    settle(qapp, pool)
+    wait_for(qapp, lambda: ocr.running == 0)
+    for _ in range(5):
+        qapp.processEvents()
+    assert results == [(3, 'KEPT')] and failures == []
+    assert not ocr.started('queued')
+    assert pool.pending_count() == 0
+
+
+def test_cancel_where(qapp, make_pool):
+    ocr = FakeOCR(hold={'hold'})
+    pool, results, _ = make_pool(ocr, max_workers=1)
+    pool.submit(0, 'hold')
+    wait_for(qapp, lambda: ocr.started('hold'))
+    for bubble_id in range(1, 7):
+        pool.submit(bubble_id, f'b{bubble_id}')
+    assert pool.cancel_where(lambda b: b % 2 == 0) == 4
+    ocr.release()
+    settle(qapp, pool)
+    assert sorted(results) == [(1, 'B1'), (3, 'B3'), (5, 'B5')]
+
+
+def test_pool_stays_bounded(qapp, make_pool):
+    ocr = FakeOCR(hold={f'b{i}' for i in range(10)})
+    pool, results, failures = make_pool(ocr, max_workers=2, max_pending=3)
+    job_ids = [pool.submit(i, f'b{i}') for i in range(10)]
+    wait_for(qapp, lambda: ocr.running == 2)
+    # Two running, three queued, the rest refused
+    assert job_ids[5:] == [None] * 5 and None not in job_ids[:5]
+    assert pool.pending_count() == 5
+    assert failures == [(i, 'OCR queue is full') for i in range(5, 10)]
+    ocr.release()
+    settle(qapp, pool)
+    assert ocr.peak == 2
+    assert sorted(results) == [(i, f'B{i}') for i in range(5)]
+
+
+def test_errors_reach_job_failed(qapp, make_pool):
+    pool, results, failures = make_pool(FakeOCR())
+    pool.submit(4, 'bad')
+    settle(qapp, pool)
+    assert results == [] and failures == [(4, 'engine crashed')]
+
+
+def test_jobs_wait_for_warm_up(qapp, make_pool):
+    ocr = FakeOCR()
+    pool, results, _ = make_pool(ocr, max_workers=2)
+    warm = threading.Event()
+    pool.warm_up(lambda: warm.wait(10))
+    pool.submit(1, 'a')
+    time.sleep(0.05)
+    qapp.processEvents()
+    assert ocr.calls == [] and pool.is_pending(1)
+    warm.set()
+    wait_for(qapp, lambda: results)
+    assert results == [(1, 'A')]
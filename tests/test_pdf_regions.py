@@ -0,0 +1,107 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Mon Oct 19 13:18:44 2026
+
+@author: hendrik
+
+Text layer lookups and region rendering.
+"""
+
+import os
+import random
+
+import fitz  # PyMuPDF
+import pytest
+
+from pdf_regions import (RegionSource, TextLayerIndex, is_usable_text, render_region,
+                         render_source)
+
+
+@pytest.fixture
+def document():
+    doc = fitz.open()
+    page = doc.new_page(width=595, height=842)
+    page.insert_text((100, 100), 'Ø12.00 H7 THRU', fontsize=10)
+    page.insert_text((100, 114), '4x M6 - 6H', fontsize=10)
+    page.insert_text((400, 100), 'SEE NOTE 3', fontsize=10)
+    # Words spread over many grid cells
+    for i in range(60):
+        page.insert_text((20 + 9 * i, 300 + 7 * (i % 20)), f'W{i}', fontsize=6)
+    doc.new_page(width=595, height=842)
+    yield doc
+    doc.close()
+
+
+@pytest.mark.parametrize('text, usable', [
+    ('Ø12.00 H7', True), ('R5', True), ('±', False), ('', False), ('  \n ', False),
+    (None, False), ('�� 12', False), ('- / .', False),
+])
+def test_is_usable_text(text, usable):
+    assert is_usable_text(text) is usable
+
+
+def test_text_in_lines_and_order(document):
+    index = TextLayerIndex(document)
+    assert index.text_in(0, (90, 85, 300, 120)) == 'Ø12.00 H7 THRU\n4x M6 - 6H'
+    assert index.text_in(0, (90, 85, 300, 103)) == 'Ø12.00 H7 THRU'
+    assert index.text_in(0, (390, 85, 500, 103)) == 'SEE NOTE 3'
+    assert index.text_in(0, (0, 0, 50, 50)) == ''
+    assert index.text_in(1, (0, 0, 595, 842)) == ''
+    assert index.has_text(0) and not index.has_text(1)
+
+
+def test_text_in_accepts_qrectf(document):
+    from PyQt5.QtCore import QRectF
+    index = TextLayerIndex(document)
+    assert index.text_in(0, QRectF(90, 85, 210, 18)) == 'Ø12.00 H7 THRU'
+
+
+def test_min_overlap(document):
+    index = TextLayerIndex(document)
+    (x0, y0, x1, y1), = [w[:4] for w in index.words(0) if w[4] == 'THRU']
+    # Half of THRU is inside the rect
+    rect = (90, 85, (x0 + x1) / 2, 103)
+    assert index.text_in(0, rect, min_overlap=0.4).endswith('THRU')
+    assert index.text_in(0, rect, min_overlap=0.6) == 'Ø12.00 H7'
+
+
+@pytest.mark.parametrize('cell_size', [20, 72, 1000])
+def test_words_in_matches_brute_force(document, cell_size):
+    index = TextLayerIndex(document, cell_size=cell_size)
+    words = document[0].get_text('words')
+    rng = random.Random(cell_size)
+    for _ in range(200):
+        x0, y0 = rng.uniform(0, 595), rng.uniform(0, 842)
+        rect = (x0, y0, x0 + rng.uniform(1, 300), y0 + rng.uniform(1, 300))
+        expected = []
+        for word in words:
+            w = min(word[2], rect[2]) - max(word[0], rect[0])
+            h = min(word[3], rect[3]) - max(word[1], rect[1])
+            if w > 0 and h > 0 and w * h >= 0.5 * (word[2] - word[0]) * (word[3] - word[1]):
+                expected.append(word)
+        expected.sort(key=lambda word: word[5:8])
+        assert index.words_in(0, rect) == expected
+
+
+def test_render_region_size_and_mode(document):
+    image = render_region(document[0], (100, 100, 172, 136), dpi=144)
+    assert image.mode == 'L' and image.size == (144, 72)
+    rgb = render_region(document[0], fitz.Rect(0, 0, 72, 72), dpi=72, grayscale=False)
+    assert rgb.mode == 'RGB' and rgb.size == (72, 72)
+    # Text is dark on white
+    assert image.getextrema()[0] < 128 and image.getextrema()[1] == 255
+
+
+def test_render_source_reopens_changed_file(document, tmp_path):
+    path = str(tmp_path / 'd.pdf')
+    document.save(path)
+    source = RegionSource(path, 0, (95, 88, 200, 104), 150)
+    first = render_source(source)
+    assert first.tobytes() == render_region(document[0], source.rect, 150).tobytes()
+
+    with fitz.open() as doc:
+        doc.new_page(width=595, height=842)
+        doc.save(path)
+    os.utime(path, ns=(1, 1))
+    blank = render_source(source)
+    assert blank.size == first.size and blank.getextrema() == (255, 255)
@@ -0,0 +1,160 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Mon Oct 19 09:58:21 2026
+
+@author: hendrik
+
+Preprocessing stages against straightforward float versions, and the
+shapes and types every pipeline hands to tesseract.
+"""
+
+import numpy as np
+import pytest
+from PIL import Image, ImageDraw
+
+import preprocess
+from preprocess import (PIPELINES, STAGES, Preprocessor, binarize, contrast_stretch,
+                        get_preprocessor, grayscale, parse_stages, remove_border, upscale)
+
+
+def drawing_crop(width=240, height=60, seed=0):
+    """RGB crop with shaded paper, a frame and a line of text-like marks"""
+    rng = np.random.default_rng(seed)
+    arr = np.empty((height, width, 3), np.uint8)
+    arr[:] = np.linspace(170, 235, width, dtype=np.uint8)[None, :, None]
+    arr += rng.integers(0, 10, arr.shape, dtype=np.uint8)
+    image = Image.fromarray(arr)
+    draw = ImageDraw.Draw(image)
+    draw.rectangle((0, 0, width - 1, height - 1), outline=(0, 0, 0), width=3)
+    for x in range(30, width - 40, 18):
+        draw.rectangle((x, 22, x + 10, 34), fill=(20, 20, 20))
+    return image
+
+
+def test_grayscale_matches_pil():
+    image = drawing_crop()
+    expected = np.asarray(image.convert('L'))
+    assert np.array_equal(grayscale(np.asarray(image)), expected)
+    rgba = image.convert('RGBA')
+    assert np.array_equal(grayscale(np.asarray(rgba)), expected)
+
+
+def test_contrast_stretch_spans_full_range():
+    arr = np.linspace(100, 150, 5000).astype(np.uint8).reshape(50, 100)
+    out = contrast_stretch(arr.copy(), low=0, high=100)
+    assert out.dtype == np.uint8
+    assert out.min() == 0 and out.max() == 255
+    # Monotonic: the order of gray levels is kept
+    flat = out.ravel()
+    assert np.all(np.diff(flat.astype(int)) >= 0)
+
+
+@pytest.mark.parametrize('block', [3, 15, 31])
+def test_box_sum_matches_brute_force(block):
+    rng = np.random.default_rng(block)
+    arr = rng.integers(0, 256, (23, 37), dtype=np.uint8)
+    sums = preprocess._box_sum(arr, block)[:23, :37]
+    radius = block // 2
+    padded = np.pad(arr.astype(np.int64), radius, mode='edge')
+    expected = np.array([[padded[y:y + block, x:x + block].sum() for x in range(37)]
+                         for y in range(23)])
+    assert np.array_equal(sums.astype(np.int64), expected)
+
+
+def test_binarize_matches_float_threshold():
+    gray = grayscale(np.asarray(drawing_crop()))
+    block, offset = 15, 10
+    out = binarize(gray.copy(), block=block, offset=offset)
+    assert set(np.unique(out)) <= {0, 255}
+    radius = block // 2
+    padded = np.pad(gray.astype(np.float64), radius, mode='edge')
+    height, width = gray.shape
+    means = np.array([[padded[y:y + block, x:x + block].mean() for x in range(width)]
+                      for y in range(height)])
+    assert np.array_equal(out == 0, gray < means - offset)
+
+
+def test_remove_border_trims_frame_and_margin():
+    arr = np.full((60, 200), 255, np.uint8)
+    arr[:2, :] = arr[-2:, :] = 0
+    arr[:, :2] = arr[:, -2:] = 0
+    arr[20:30, 50:90] = 0
+    out = remove_border(arr, pad=4)
+    assert out.shape == (10 + 8, 40 + 8)
+    assert (out[4:-4, 4:-4] == 0).all()
+    assert (out[:4] == 255).all()
+    blank = np.full((20, 20), 255, np.uint8)
+    assert remove_border(blank) is blank
+
+
+def test_upscale_small_text_only():
+    arr = np.full((40, 100), 255, np.uint8)
+    arr[10:20, 10:50] = 0
+    out = upscale(arr, min_text_height=30, max_factor=4)
+    assert out.shape == (120, 300) and out.dtype == np.uint8
+    tall = np.full((80, 100), 255, np.uint8)
+    tall[5:60, 10:50] = 0
+    assert upscale(tall) is tall
+
+
+def test_deskew_levels_rotated_lines():
+    image = Image.new('L', (400, 200), 255)
+    draw = ImageDraw.Draw(image)
+    for y in range(30, 180, 30):
+        draw.rectangle((40, y, 360, y + 6), fill=0)
+    tilted = np.asarray(image.rotate(3, resample=Image.BILINEAR, fillcolor=255)).copy()
+    out = preprocess.deskew(tilted, max_angle=5, step=0.5)
+    assert out.dtype == np.uint8 and out.ndim == 2
+    # Rotated back by the same angle: rows are either ink or paper again
+    profile = np.count_nonzero(out < 128, axis=1)
+    before = np.count_nonzero(tilted < 128, axis=1)
+    assert np.dot(profile, profile) > np.dot(before, before)
+
+
+@pytest.mark.parametrize('pipeline', sorted(PIPELINES))
+@pytest.mark.parametrize('mode', ['RGB', 'RGBA', 'L', 'P'])
+def test_pipelines_return_grayscale_images(pipeline, mode):
+    image = drawing_crop().convert(mode)
+    out = Preprocessor(pipeline)(image)
+    assert out.mode == 'L'
+    arr = np.asarray(out)
+    assert arr.ndim == 2 and arr.dtype == np.uint8
+    if pipeline == 'default':
+        assert out.size == image.size
+
+
+@pytest.mark.parametrize('name', sorted(STAGES))
+def test_every_stage_keeps_2d_uint8(name):
+    arr = grayscale(np.asarray(drawing_crop()))
+    out = STAGES[name](arr.copy())
+    assert out.ndim == 2 and out.dtype == np.uint8
+
+
+def test_parse_stages():
+    assert parse_stages('contrast, binarize:block=41:offset=12') == [
+        ('contrast', {}), ('binarize', {'block': 41, 'offset': 12})]
+    assert parse_stages('deskew:max_angle=2.5') == [('deskew', {'max_angle': 2.5})]
+    assert parse_stages([('upscale', {'max_factor': 2}), 'border']) == [
+        ('upscale', {'max_factor': 2}), ('border', {})]
+    assert [name for name, _ in parse_stages('scan')] == list(PIPELINES['scan'])
+    with pytest.raises(ValueError):
+        parse_stages('contrast,sharpen')
+
+
+def test_preprocessor_always_starts_with_grayscale():
+    preprocessor = Preprocessor('contrast')
+    assert preprocessor.name == 'grayscale,contrast'
+    preprocessor(drawing_crop())
+    stats = preprocessor.stats()
+    assert stats['contrast']['calls'] == 1 and stats['load']['calls'] == 1
+    assert [name for name, _ in preprocessor.last_timings()] == ['load', 'grayscale',
+                                                                 'contrast']
+    preprocessor.reset_stats()
+    assert preprocessor.stats()['contrast']['calls'] == 0
+
+
+def test_shared_preprocessors():
+    assert get_preprocessor(None) is get_preprocessor('grayscale')
+    assert get_preprocessor('scan') is get_preprocessor(list(PIPELINES['scan']))
+    own = Preprocessor('binarize')
+    assert get_preprocessor(own) is own
@@ -0,0 +1,351 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Mon Oct 19 09:31:52 2026
+
+@author: hendrik
+
+ProjectFile save -> load round trips, torn tails and compaction.
+"""
+
+import os
+import random
+import threading
+import zlib
+
+import pytest
+
+import project_file
+from bubble_store import BubbleStore
+from project_file import (MAGIC, R_BUBBLES, R_MOVES, R_PAGE, BACKUP_SUFFIX, ProjectFile,
+                          load_project)
+
+
+def loaded(path):
+    """(rows, regions, texts, meta) of the file at path"""
+    state = ProjectFile(path).load()
+    return list(state.rows()), state.regions, state.texts, state.meta
+
+
+def session(store, regions, texts):
+    return list(store), regions, texts
+
+
+def random_edit(rng, store, regions, texts):
+    ids = [row[0] for row in store]
+    op = rng.random()
+    if op < 0.3 or not ids:
+        bubble_id = store.insert(rng.randrange(4), rng.choice([None, 0, 2]),
+                                 rng.uniform(0, 500), rng.uniform(0, 500))
+        if rng.random() < 0.5:
+            regions[bubble_id] = ((1.0, 2.0, 3.0, 4.0), rng.choice(['ocr', 'text:dimension']))
+            texts[bubble_id] = rng.choice(['Ø12.00 H7', '25 ±0.1', 'Ra 3.2', ''])
+    elif op < 0.6:
+        for bubble_id in rng.sample(ids, min(len(ids), 3)):
+            store.move(bubble_id, rng.uniform(0, 500), rng.uniform(0, 500))
+    elif op < 0.7:
+        bubble_id = rng.choice(ids)
+        store.remove(bubble_id)
+        regions.pop(bubble_id, None)
+        texts.pop(bubble_id, None)
+    elif op < 0.8:
+        store.reorder(rng.choice(ids), rng.randrange(4))
+    elif op < 0.85:
+        for bubble_id in store.clear_page(rng.randrange(4)):
+            regions.pop(bubble_id, None)
+            texts.pop(bubble_id, None)
+    else:
+        bubble_id = rng.choice(ids)
+        texts[bubble_id] = f'edited {rng.randrange(100)}'
+
+
+@pytest.mark.parametrize('seed', range(4))
+def test_random_sessions_round_trip(tmp_path, seed):
+    rng = random.Random(seed)
+    path = str(tmp_path / 'drawing.faiproj')
+    project = ProjectFile(path)
+    store, regions, texts = BubbleStore(), {}, {}
+    for step in range(120):
+        random_edit(rng, store, regions, texts)
+        project.save(store, regions, texts, meta={'source': 'drawing.pdf', 'pages': 4})
+        if step % 10 == 0:
+            rows, got_regions, got_texts, meta = loaded(path)
+            assert rows == list(store)
+            assert got_regions == regions and got_texts == texts
+            assert meta == {'source': 'drawing.pdf', 'pages': 4}
+
+    # A reopened file keeps appending where the session left off
+    reopened = ProjectFile(path)
+    state = reopened.load()
+    store = BubbleStore()
+    store.load_columns(state.bubbles)
+    regions, texts = dict(state.regions), dict(state.texts)
+    for step in range(30):
+        random_edit(rng, store, regions, texts)
+        reopened.save(store, regions, texts)
+    assert loaded(path)[:3] == session(store, regions, texts)
+
+
+def records(path):
+    """[(type, length)] of the records in a file"""
+    found = []
+    with open(path, 'rb') as file:
+        data = file.read()
+    offset = len(MAGIC)
+    while offset < len(data):
+        kind, length, _ = project_file._HEADER.unpack_from(data, offset)
+        found.append((kind, length))
+        offset += project_file._HEADER.size + length
+    return found
+
+
+def test_moves_and_page_edits_append_deltas(tmp_path):
+    path = str(tmp_path / 'p.faiproj')
+    project = ProjectFile(path)
+    store = BubbleStore()
+    ids = [store.add(page, i, i) for page in range(3) for i in range(100)]
+    project.save(store, {}, {})
+    assert records(path) == [(R_BUBBLES, 4 + 28 * 300)]
+
+    store.move(ids[5], 50, 60)
+    project.save(store, {}, {})
+    assert records(path)[-1] == (R_MOVES, 4 + 24)
+
+    # Only the page whose order changed is written again
+    store.remove(ids[150])
+    project.save(store, {}, {})
+    assert records(path)[-1] == (R_PAGE, 8 + 24 * 99)
+    assert len(records(path)) == 3
+
+    # An unchanged session appends nothing
+    assert project.save(store, {}, {}) == 0
+    assert loaded(path)[0] == list(store)
+
+
+def test_truncated_tail_is_dropped_and_overwritten(tmp_path):
+    path = str(tmp_path / 'p.faiproj')
+    project = ProjectFile(path)
+    store = BubbleStore()
+    first = store.add(0, 1, 2)
+    project.save(store, {}, {first: 'kept'})
+    good_size = os.path.getsize(path)
+    store.add(0, 3, 4)
+    project.save(store, {}, {first: 'lost'})
+    # A crash in the middle of the second save
+    with open(path, 'r+b') as file:
+        file.truncate(good_size + 7)
+
+    project, state = load_project(path)
+    assert list(state.rows()) == [(first, 0, 1.0, 2.0)]
+    assert state.texts == {first: 'kept'}
+    restored = BubbleStore()
+    restored.load_columns(state.bubbles)
+    second = restored.add(1, 5, 6)
+    project.save(restored, {}, {first: 'kept', second: 'new'})
+    rows, _, texts, _ = loaded(path)
+    assert rows == list(restored)
+    assert texts == {first: 'kept', second: 'new'}
+
+
+def test_corrupt_last_record_is_dropped(tmp_path):
+    path = str(tmp_path / 'p.faiproj')
+    project = ProjectFile(path)
+    store = BubbleStore()
+    bubble_id = store.add(0, 1, 2)
+    project.save(store, {}, {})
+    store.move(bubble_id, 9, 9)
+    project.save(store, {}, {})
+    with open(path, 'r+b') as file:
+        file.seek(-1, os.SEEK_END)
+        last = file.read(1)
+        file.seek(-1, os.SEEK_END)
+        file.write(bytes([last[0] ^ 0xFF]))
+
+    project, state = load_project(path)
+    assert list(state.rows()) == [(bubble_id, 0, 1.0, 2.0)]
+    store = BubbleStore()
+    store.load_columns(state.bubbles)
+    store.move(bubble_id, 7, 8)
+    project.save(store, {}, {})
+    assert loaded(path)[0] == [(bubble_id, 0, 7.0, 8.0)]
+    kinds = [kind for kind, _ in records(path)]
+    assert kinds == [R_BUBBLES, R_MOVES]
+
+
+def test_not_a_project_file(tmp_path):
+    path = tmp_path / 'p.faiproj'
+    path.write_bytes(b'%PDF-1.7\n')
+    with pytest.raises(ValueError):
+        ProjectFile(str(path)).load()
+    assert len(ProjectFile(str(tmp_path / 'missing.faiproj')).load()) == 0
+
+
+def test_compaction_keeps_session(tmp_path, monkeypatch):
+    monkeypatch.setattr(project_file, 'COMPACT_MIN_BYTES', 4096)
+    PIL = pytest.importorskip('PIL.Image')
+    path = str(tmp_path / 'p.faiproj')
+    project = ProjectFile(path)
+    store = BubbleStore()
+    ids = [store.add(0, i, i) for i in range(20)]
+    regions = {ids[0]: ((0.0, 0.0, 10.0, 10.0), 'ocr'), ids[1]: ((5.0, 5.0, 9.0, 9.0), 'text')}
+    texts = {ids[0]: 'Ø6 THRU', ids[1]: 'M6x1'}
+    crop = PIL.new('L', (12, 8), 200)
+    project.save(store, regions, texts, crops={ids[0]: crop}, meta={'sha256': 'abc'})
+
+    rng = random.Random(3)
+    sizes = []
+    for _ in range(200):
+        store.move(rng.choice(ids), rng.uniform(0, 99), rng.uniform(0, 99))
+        project.save(store, regions, texts)
+        sizes.append(os.path.getsize(path))
+    # The log was rewritten (the file shrank) at least once
+    assert any(after < before for before, after in zip(sizes, sizes[1:]))
+    assert not project.needs_compaction()
+
+    state = ProjectFile(path).load()
+    assert list(state.rows()) == list(store)
+    assert state.regions == regions and state.texts == texts
+    assert state.meta == {'sha256': 'abc'}
+    assert set(state.crops) == {ids[0]}
+
+    reader = ProjectFile(path)
+    reader.load()
+    image = reader.read_crop(ids[0])
+    assert image.size == (12, 8) and image.getpixel((0, 0)) == 200
+
+
+def test_rewrite_drops_removed_crops(tmp_path):
+    PIL = pytest.importorskip('PIL.Image')
+    path = str(tmp_path / 'p.faiproj')
+    project = ProjectFile(path)
+    store = BubbleStore()
+    a, b = store.add(0, 1, 1), store.add(0, 2, 2)
+    regions = {a: ((0.0, 0.0, 1.0, 1.0), 'ocr'), b: ((0.0, 0.0, 2.0, 2.0), 'ocr')}
+    project.save(store, regions, {}, crops={a: PIL.new('L', (4, 4)), b: PIL.new('L', (4, 4))})
+    del regions[b]
+    store.remove(b)
+    project.rewrite(store, regions, {})
+    state = ProjectFile(path).load()
+    assert set(state.crops) == {a}
+    assert state.region(a) == ((0.0, 0.0, 1.0, 1.0), 'ocr', None)
+
+
+def test_start_over_keeps_backup(tmp_path):
+    path = str(tmp_path / 'p.faiproj')
+    project = ProjectFile(path)
+    store = BubbleStore()
+    store.add(0, 1, 1)
+    project.save(store, {}, {})
+    with open(path, 'rb') as file:
+        old = file.read()
+
+    assert project.start_over() == path + BACKUP_SUFFIX
+    assert not os.path.exists(path)
+    with open(path + BACKUP_SUFFIX, 'rb') as file:
+        assert file.read() == old
+
+    fresh = BubbleStore()
+    fresh.add(2, 5, 5)
+    project.save(fresh, {}, {})
+    assert loaded(path)[0] == list(fresh)
+    assert [kind for kind, _ in records(path)] == [R_BUBBLES]
+
+
+def test_record_crc_matches_payload(tmp_path):
+    path = str(tmp_path / 'p.faiproj')
+    store = BubbleStore()
+    store.add(0, 1, 1)
+    ProjectFile(path).save(store, {}, {})
+    with open(path, 'rb') as file:
+        data = file.read()
+    kind, length, crc = project_file._HEADER.unpack_from(data, len(MAGIC))
+    start = len(MAGIC) + project_file._HEADER.size
+    assert zlib.crc32(data[start:start + length]) == crc
+
+
+def test_failed_write_drops_stale_records(tmp_path, monkeypatch):
+    path = str(tmp_path / 'p.faiproj')
+    project = ProjectFile(path)
+    store = BubbleStore()
+    a = store.add(0, 1, 1)
+    regions, texts = {a: ((0.0, 0.0, 5.0, 5.0), 'ocr')}, {a: 'R5'}
+    project.save(store, regions, texts)
+
+    # Two autosaves computed back to back, the first of which fails
+    store.move(a, 2, 2)
+    first = project.changes(store, regions, texts)
+    b = store.add(0, 3, 3)
+    texts[b] = 'M6'
+    second = project.changes(store, regions, texts)
+    real_append = ProjectFile._append
+
+    def failing_append(self, records):
+        raise OSError('disk full')
+    monkeypatch.setattr(ProjectFile, '_append', failing_append)
+    with pytest.raises(OSError):
+        project.write(first)
+    monkeypatch.setattr(ProjectFile, '_append', real_append)
+
+    # The next changes() starts over; the second batch, computed against
+    # the file as it was, must not land in the new one
+    del texts[a]
+    third = project.changes(store, regions, texts)
+    assert third[0][0] == R_BUBBLES
+    assert project.write(second) == 0
+    project.write(third)
+    assert loaded(path)[:3] == session(store, regions, texts)
+    assert [kind for kind, _ in records(path)][0] == R_BUBBLES
+
+
+def test_reload_and_rewrite_drop_older_records(tmp_path):
+    path = str(tmp_path / 'p.faiproj')
+    project = ProjectFile(path)
+    store = BubbleStore()
+    a = store.add(0, 1, 1)
+    project.save(store, {}, {})
+    store.move(a, 5, 5)
+    stale = project.changes(store, {}, {})
+    project.rewrite(store, {}, {})
+    assert project.write(stale) == 0
+    store.move(a, 6, 6)
+    stale = project.changes(store, {}, {})
+    project.load()
+    assert project.write(stale) == 0
+    project.save(store, {}, {})
+    assert loaded(path)[0] == [(a, 0, 6.0, 6.0)]
+
+
+def test_concurrent_changes_and_failing_writes(tmp_path, monkeypatch):
+    path = str(tmp_path / 'p.faiproj')
+    project = ProjectFile(path)
+    rng = random.Random(5)
+    real_append = ProjectFile._append
+
+    def flaky_append(self, records):
+        if rng.random() < 0.2:
+            raise OSError('flaky disk')
+        return real_append(self, records)
+    monkeypatch.setattr(ProjectFile, '_append', flaky_append)
+
+    batches = []
+    done = threading.Event()
+
+    def writer():
+        while not done.is_set() or batches:
+            if batches:
+                try:
+                    project.write(batches.pop(0))
+                except OSError:
+                    pass
+    thread = threading.Thread(target=writer)
+    thread.start()
+    store, regions, texts = BubbleStore(), {}, {}
+    try:
+        for _ in range(300):
+            random_edit(rng, store, regions, texts)
+            batches.append(project.changes(store, regions, texts))
+    finally:
+        done.set()
+        thread.join(10)
+    monkeypatch.setattr(ProjectFile, '_append', real_append)
+    project.save(store, regions, texts)
+    assert loaded(path)[:3] == session(store, regions, texts)
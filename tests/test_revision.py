@@ -0,0 +1,202 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Mon Oct 19 10:24:07 2026
+
+@author: hendrik
+
+Page alignment, registration and a small end-to-end migration.
+"""
+
+import multiprocessing
+import random
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+
+import fitz  # PyMuPDF
+import numpy as np
+import pytest
+
+import revision
+from bubble_store import BubbleStore
+from project_file import ProjectFile
+from revision import (MIN_PAGE_SIMILARITY, PageTransform, align_pages, migrate,
+                      register_by_text, text_similarity)
+
+
+class FakePage:
+    """Words (x0, y0, x1, y1, text) like TextLayerIndex.words, nothing rendered"""
+
+    def __init__(self, words):
+        self.words = words
+        self.tokens = Counter(word[4] for word in words)
+        self.token_count = len(words)
+
+
+def words(texts, dx=0.0, dy=0.0):
+    return [(10.0 * i + dx, 5.0 * (i % 7) + dy, 10.0 * i + 8 + dx, 5.0 * (i % 7) + 4 + dy, text)
+            for i, text in enumerate(texts)]
+
+
+def brute_force_alignment(sims):
+    """Best total similarity over every order-keeping matching"""
+    n, m = len(sims), len(sims[0])
+
+    def best(i, j):
+        if i == n or j == m:
+            return 0.0
+        options = [best(i + 1, j), best(i, j + 1)]
+        if sims[i][j] >= MIN_PAGE_SIMILARITY:
+            options.append(sims[i][j] + best(i + 1, j + 1))
+        return max(options)
+    return best(0, 0)
+
+
+def test_align_identity():
+    sims = [[1.0 if i == j else 0.1 for j in range(4)] for i in range(4)]
+    assert align_pages(sims) == {i: (i, 1.0) for i in range(4)}
+
+
+def test_align_inserted_and_deleted_sheets():
+    # New sheet at index 1; old sheet 3 dropped
+    sims = [[0.9, 0.2, 0.1, 0.1],
+            [0.1, 0.2, 0.8, 0.1],
+            [0.1, 0.1, 0.1, 0.95],
+            [0.1, 0.1, 0.2, 0.2]]
+    assert align_pages(sims) == {0: (0, 0.9), 1: (2, 0.8), 2: (3, 0.95)}
+
+
+def test_align_keeps_order_over_crossed_match():
+    # Swapped sheets: only one of the two pairs can be kept in order
+    sims = [[0.1, 0.9], [0.6, 0.1]]
+    assert align_pages(sims) == {0: (1, 0.9)}
+
+
+def test_align_ignores_weak_matches():
+    sims = [[MIN_PAGE_SIMILARITY - 0.01, 0.0], [0.0, 0.5]]
+    assert align_pages(sims) == {1: (1, 0.5)}
+    assert align_pages([]) == {}
+
+
+@pytest.mark.parametrize('seed', range(20))
+def test_align_is_optimal_and_ordered(seed):
+    rng = random.Random(seed)
+    n, m = rng.randint(1, 6), rng.randint(1, 6)
+    sims = [[rng.choice([0.0, 0.2, rng.random()]) for _ in range(m)] for _ in range(n)]
+    matches = align_pages(sims)
+    pairs = sorted((i, j) for i, (j, _) in matches.items())
+    assert all(a[1] < b[1] for a, b in zip(pairs, pairs[1:]))
+    assert all(sims[i][j] >= MIN_PAGE_SIMILARITY for i, j in pairs)
+    total = sum(sim for _, sim in matches.values())
+    assert total == pytest.approx(brute_force_alignment(sims))
+
+
+def test_text_similarity():
+    a = FakePage(words(['A', 'B', 'B', 'C']))
+    b = FakePage(words(['B', 'C', 'D']))
+    # common A..: B once, C once = 2; union 4 + 3 - 2 = 5
+    assert text_similarity(a, b) == pytest.approx(2 / 5)
+    assert text_similarity(b, a) == text_similarity(a, b)
+    assert text_similarity(a, a) == 1.0
+    assert text_similarity(FakePage([]), FakePage([])) == 0.0
+
+
+def test_register_by_text_ignores_moved_annotations():
+    texts = [f'W{i}' for i in range(20)]
+    old = FakePage(words(texts))
+    moved = words(texts, dx=12.0, dy=-3.0)
+    # Two notes moved somewhere else on the new sheet
+    moved[3] = (300.0, 300.0, 308.0, 304.0, 'W3')
+    moved[7] = (0.0, 400.0, 8.0, 404.0, 'W7')
+    (tx, ty), inliers = register_by_text(old, FakePage(moved), 1.0)
+    assert (tx, ty) == pytest.approx((12.0, -3.0))
+    assert inliers == 18
+    assert register_by_text(old, FakePage(words(['X', 'Y'])), 1.0) is None
+
+
+def test_phase_correlate_finds_shift():
+    rng = np.random.default_rng(1)
+    a = np.zeros((90, 120), np.float32)
+    a[20:70, 30:100] = rng.random((50, 70))
+    b = np.roll(np.roll(a, 7, axis=0), -11, axis=1)
+    assert revision._phase_correlate(a, b) == (-11, 7)
+
+
+def test_fft_size():
+    for n in (1, 7, 97, 256, 257, 1000):
+        size = revision._fft_size(n)
+        assert size >= n
+        rest = size
+        for factor in (2, 3, 5):
+            while rest % factor == 0:
+                rest //= factor
+        assert rest == 1
+    assert revision._fft_size(257) == 270
+
+
+def test_page_transform():
+    transform = PageTransform(2.0, 10.0, -5.0, 'text')
+    assert transform.point(1, 2) == (12.0, -1.0)
+    assert transform.rect((0, 0, 4, 4)) == (10.0, -5.0, 18.0, 3.0)
+
+
+def write_sheets(path, sheets):
+    """PDF with one A4 page per sheet: [(dx, dy, lines)]"""
+    doc = fitz.open()
+    for dx, dy, lines in sheets:
+        page = doc.new_page(width=595, height=842)
+        for i, line in enumerate(lines):
+            page.insert_text((60 + dx, 80 + 20 * i + dy), line, fontsize=10)
+    doc.save(path)
+    doc.close()
+
+
+def sheet_lines(name, count=14):
+    return [f'{name} NOTE {i} DIM {i * 3 + 1}.50 TOL {i}' for i in range(count)]
+
+
+@pytest.fixture
+def revisions(tmp_path):
+    """(old pdf, new pdf, ProjectState, bubble IDs, sheet texts)"""
+    old_pdf, new_pdf = str(tmp_path / 'rev_a.pdf'), str(tmp_path / 'rev_b.pdf')
+    first, second = sheet_lines('HOUSING'), sheet_lines('COVER')
+    changed = list(second)
+    changed[3] = 'COVER NOTE 3 DIM 99.00 TOL 3'
+    write_sheets(old_pdf, [(0, 0, first), (0, 0, second)])
+    write_sheets(new_pdf, [(0, 0, first), (0, 0, sheet_lines('BRACKET')), (15, 10, changed)])
+
+    store = BubbleStore()
+    ids = store.add(0, 100, 80), store.add(1, 100, 140), store.add(1, 100, 140)
+    kept, moved, edited = ids
+    project = ProjectFile(str(tmp_path / 'rev_a.faiproj'))
+    regions = {moved: ((55.0, 110.0, 300.0, 124.0), 'text'),
+               edited: ((55.0, 130.0, 300.0, 144.0), 'ocr')}
+    project.save(store, regions, {moved: second[2], edited: second[3]})
+    return old_pdf, new_pdf, ProjectFile(project.path).load(), ids, second
+
+
+def test_migrate_inserted_sheet_and_shift(revisions):
+    old_pdf, new_pdf, state, (kept, moved, edited), second = revisions
+    migration = migrate(old_pdf, new_pdf, state)
+    assert migration.page_map == {0: 0, 1: 2}
+    rows = {bubble_id: (page, x, y) for bubble_id, page, x, y in migration.rows}
+    assert rows[kept] == pytest.approx((0, 100, 80))
+    assert rows[moved] == pytest.approx((2, 115, 150), abs=1.0)
+    assert migration.regions[moved][0] == pytest.approx((70, 120, 315, 134), abs=1.0)
+    # Only the OCR region whose text changed needs OCR again
+    assert migration.changed == {edited: 'text'}
+    assert migration.reocr == [edited]
+    assert migration.texts[moved] == second[2]
+
+
+def test_migrate_in_spawned_process(revisions):
+    # The placer runs carry-overs in a spawned process: the session and
+    # the Migration have to survive pickling
+    old_pdf, new_pdf, state, _, _ = revisions
+    with ProcessPoolExecutor(max_workers=1,
+                             mp_context=multiprocessing.get_context('spawn')) as pool:
+        migration = pool.submit(migrate, old_pdf, new_pdf, state).result(timeout=120)
+    local = migrate(old_pdf, new_pdf, state)
+    assert migration.rows == local.rows
+    assert migration.regions == local.regions and migration.texts == local.texts
+    assert migration.changed == local.changed and migration.reocr == local.reocr
+    assert migration.transforms.keys() == local.transforms.keys()
@@ -0,0 +1,107 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Mon Oct 19 10:47:33 2026
+
+@author: hendrik
+
+Query normalization and an in-memory SearchIndex.
+"""
+
+import os
+
+import pytest
+
+from bubble_store import BubbleStore
+from search_index import (BUBBLE_BOX, SearchIndex, bubble_hits, document_key, match_query,
+                          normalize)
+
+
+@pytest.mark.parametrize('text, words', [
+    ('Ø12.00 H7', ['Ø', '12.00', 'H7']),
+    ('⌀12.00', ['Ø', '12.00']),
+    ('∅12.00', ['Ø', '12.00']),
+    ('ø6 THRU.', ['Ø', '6', 'THRU']),
+    ('NOTE 1. SEE DWG.4711', ['NOTE', '1', 'SEE', 'DWG', '4711']),
+    ('.5 R.25', ['5', 'R', '25']),
+    ('25.4±0.05', ['25.4±0.05']),
+])
+def test_normalize(text, words):
+    assert normalize(text).split() == words
+
+
+def test_match_query():
+    assert match_query('⌀12.00 H7') == '"Ø" "12.00" "H7"'
+    assert match_query('M6*') == '"M6"*'
+    assert match_query('say "THRU"') == '"say" """THRU"""'
+    assert match_query('AND OR NOT') == '"AND" "OR" "NOT"'
+    assert match_query('  * . ') == ''
+
+
+@pytest.fixture
+def index():
+    index = SearchIndex()
+    yield index
+    index.close()
+
+
+def test_search_text_and_bubbles(index):
+    index.set_text_layer('a.pdf', [(0, (0, 0, 50, 10), 'Ø12.00 H7 THRU'),
+                                   (1, (0, 0, 50, 10), 'M6x1 - 6H'),
+                                   (1, (0, 20, 50, 30), 'NOTE 4. DEBURR')], pages=2)
+    index.set_bubbles('b.pdf', [(3, 0, (1, 2, 3, 4), '⌀12.00 THRU'),
+                                (4, 0, (5, 6, 7, 8), '   ')])
+    hits = index.search('∅12.00')
+    # Newest first; the blank bubble text isn't indexed
+    assert [(os.path.basename(h.path), h.kind, h.bubble_id) for h in hits] == [
+        ('b.pdf', 'bubble', 3), ('a.pdf', 'text', None)]
+    assert hits[0].rect == (1, 2, 3, 4) and hits[0].text == '⌀12.00 THRU'
+    assert hits[1].path == document_key('a.pdf')
+    assert [h.page for h in index.search('m6*')] == [1]
+    assert [h.text for h in index.search('note 4')] == ['NOTE 4. DEBURR']
+    assert index.search('12.00 H8') == []
+    assert index.search('12') == []
+    assert index.search('   ') == []
+    assert index.search('"') == []
+    assert len(index.search('THRU', limit=1)) == 1
+    assert index.stats() == {'documents': 2, 'hits': 4}
+
+
+def test_replace_and_remove(index):
+    index.set_bubbles('a.pdf', [(1, 0, (0, 0, 1, 1), 'R5'), (2, 0, (0, 0, 1, 1), 'R6')])
+    index.set_text_layer('a.pdf', [(0, (0, 0, 9, 9), 'R5 TYP')])
+    index.set_bubbles('a.pdf', [(2, 0, (0, 0, 1, 1), 'R7')])
+    assert [h.kind for h in index.search('R5')] == ['text']
+    assert index.search('R6') == []
+    assert [h.bubble_id for h in index.search('R7')] == [2]
+    index.set_text_layer('a.pdf', [])
+    assert index.search('R5') == []
+    index.remove('a.pdf')
+    index.remove('a.pdf')
+    assert index.search('R7') == []
+    assert index.stats() == {'documents': 0, 'hits': 0}
+
+
+def test_needs_indexing(tmp_path):
+    pdf = tmp_path / 'drawing.pdf'
+    pdf.write_bytes(b'%PDF-1.7 one')
+    index = SearchIndex(str(tmp_path / 'index' / 'search.sqlite3'))
+    assert index.needs_indexing(str(pdf))
+    index.set_text_layer(str(pdf), [(0, (0, 0, 1, 1), 'A')], 1, os.stat(pdf))
+    assert not index.needs_indexing(str(pdf))
+    pdf.write_bytes(b'%PDF-1.7 second')
+    assert index.needs_indexing(str(pdf))
+    index.close()
+
+    # Kept on disk
+    reopened = SearchIndex(str(tmp_path / 'index' / 'search.sqlite3'))
+    assert [h.text for h in reopened.search('A')] == ['A']
+    reopened.close()
+
+
+def test_bubble_hits():
+    store = BubbleStore()
+    a, b, gone = store.add(0, 10, 20), store.add(2, 30, 40), 99
+    rows = bubble_hits(store, {a: (1, 2, 3, 4)}, {a: 'Ø6', b: 'R2', gone: 'M4'})
+    assert rows == [(a, 0, (1, 2, 3, 4), 'Ø6'),
+                    (b, 2, (30 - BUBBLE_BOX, 40 - BUBBLE_BOX, 30 + BUBBLE_BOX,
+                            40 + BUBBLE_BOX), 'R2')]
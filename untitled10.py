@@ -7,19 +7,81 @@ Created on Sun Feb  9 13:08:32 2025
 
 import sys
 import os
-import fitz  # PyMuPDF
+import time
+import multiprocessing
 from PyQt5.QtWidgets import (QApplication, QMainWindow, QVBoxLayout, QHBoxLayout, 
                              QLabel, QPushButton, QFileDialog, QWidget, QScrollArea,
-                             QMessageBox)
-from PyQt5.QtGui import QImage, QPixmap, QPainter, QPen, QColor, QFont
-from PyQt5.QtCore import Qt, QPoint, QRect, QRectF
-import numpy as np
-from PIL import Image
-import PyPDF2
-from reportlab.pdfgen import canvas
-from reportlab.lib.units import inch
-from reportlab.pdfbase import pdfmetrics
-import io
+                             QMessageBox, QSpinBox, QMenu, QInputDialog, QComboBox)
+from PyQt5.QtGui import QPainter, QPen, QColor, QFont
+from PyQt5.QtCore import Qt, QPoint, QRect, QRectF, QTimer, pyqtSignal
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import instrumentation
+from instrumentation import timed
+from ocr_worker import OCRWorkerPool
+from perf_panel import PerfPanel
+from search_panel import SearchPanel
+from raster_cache import RasterCache, PagePrefetcher, render_page
+from bubble_store import BubbleStore
+from bubble_table import BubbleTableModel, BubbleTableView
+from pdf_regions import (DEFAULT_OCR_DPI, RegionSource, TextLayerIndex, is_usable_text,
+                         to_fitz_rect)
+from project_file import (BACKUP_SUFFIX, PROJECT_SUFFIX, ProjectFile, file_sha256,
+                          project_path)
+from search_index import SearchIndex, bubble_hits, document_key
+
+
+# Zoom steps offered by Zoom In/Out and Ctrl+wheel (display px per PDF point)
+ZOOM_LEVELS = (0.5, 0.75, 1, 1.5, 2, 3, 4, 6, 8)
+TILE_SIZE = 512
+PREVIEW_ZOOM = 0.5
+# How close (display px) a click must be to a bubble centre to grab it
+BUBBLE_HIT_RADIUS = 8
+# OCR preprocessing choices offered next to the OCR DPI
+# (preprocess.PIPELINES names, so numpy isn't needed to build the window)
+OCR_PREPROCESSING = (('Plain', 'default'), ('Scan cleanup', 'scan'))
+AUTOSAVE_INTERVAL_MS = 15000
+# Heavy imports start this long after the window is shown, past its first paint
+WARM_UP_DELAY_MS = 200
+# Region previews: longest side in px, and the memory they may use
+THUMBNAIL_SIZE = 160
+THUMBNAIL_CACHE_BYTES = 8 * 1024 * 1024
+
+
+class OverlayLayer(QWidget):
+    """Transparent layer over the page for bubbles and the selection band"""
+    def __init__(self, viewer, parent):
+        super().__init__(parent)
+        self.viewer = viewer
+        self.setAttribute(Qt.WA_TransparentForMouseEvents)
+
+    def paintEvent(self, event):
+        painter = QPainter(self)
+        self.viewer.paint_overlay(painter, event.rect())
+        painter.end()
+
+
+class PageCanvas(QWidget):
+    """
+    Page-sized widget inside the scroll area. The page raster is painted
+    tile by tile and never drawn on; annotations live on the overlay.
+    """
+    def __init__(self, viewer):
+        super().__init__()
+        self.viewer = viewer
+        self.setMouseTracking(True)
+        self.setFocusPolicy(Qt.ClickFocus)
+        self.overlay = OverlayLayer(viewer, self)
+
+    def resizeEvent(self, event):
+        self.overlay.resize(event.size())
+        super().resizeEvent(event)
+
+    def paintEvent(self, event):
+        painter = QPainter(self)
+        self.viewer.paint_page(painter, event.rect())
+        painter.end()
 
 
 class PDFViewer(QScrollArea):
@@ -27,115 +89,416 @@ class PDFViewer(QScrollArea):
         super().__init__(parent)
         self.parent = parent
         self.document = None
+        self.pdf_path = None
         self.total_pages = 0
+        self.text_index = None
         self.current_page = None
+        self.current_page_number = 0
         self.page_width = 0
         self.page_height = 0
         self.display_width = 0
         self.display_height = 0
         self.zoom = 2
         self.scale_factor = 1
+        self.ocr_dpi = DEFAULT_OCR_DPI
+
+        # Rendered tiles keyed (page, zoom, col, row), plus one low-res
+        # preview per page keyed (page, PREVIEW_ZOOM) that stands in for
+        # tiles still being rendered. Bounded by memory, not page count.
+        self.page_cache = RasterCache(max_bytes=256 * 1024 * 1024)
+        self.prefetcher = PagePrefetcher(self.page_cache, self)
+        self.prefetcher.prefetched.connect(self.on_prefetched)
+        self.prefetch_distance = 1
+        # Region previews keyed (bubble_id, rect); regions themselves only
+        # keep their PDF rect and are re-rendered when pixels are needed
+        self.thumbnails = RasterCache(max_bytes=THUMBNAIL_CACHE_BYTES)
         
         # Selection variables
         self.selecting = False
         self.selection_start = None
         self.selection_end = None
         self.current_bubble = None
+        self.band_select = False   # rubber band selects bubbles, not a region
+
+        # Bubble editing
+        self.selected_bubbles = set()
+        self.dragging_bubble = None
+        # (page, (x0, y0, x1, y1)) of the search hit last jumped to
+        self.highlight = None
         
-        self.image_label = QLabel()
-        self.image_label.setAlignment(Qt.AlignCenter)
-        self.setWidget(self.image_label)
-        self.setWidgetResizable(True)
-        self.image_label.setMouseTracking(True)
+        self.canvas = PageCanvas(self)
+        self.setWidget(self.canvas)
+        self.setWidgetResizable(False)
+        self.setAlignment(Qt.AlignCenter)
         
         # Override mouse events
-        self.image_label.mousePressEvent = self.on_mouse_press
-        self.image_label.mouseMoveEvent = self.on_mouse_move
-        self.image_label.mouseReleaseEvent = self.on_mouse_release
+        self.canvas.mousePressEvent = self.on_mouse_press
+        self.canvas.mouseMoveEvent = self.on_mouse_move
+        self.canvas.mouseReleaseEvent = self.on_mouse_release
+        self.canvas.keyPressEvent = self.on_key_press
+
+        self.horizontalScrollBar().valueChanged.connect(self.schedule_prefetch)
+        self.verticalScrollBar().valueChanged.connect(self.schedule_prefetch)
     
-    def draw_bubbles_on_pixmap(self, painter):
-        """Draw all bubbles for the current page on the pixmap"""
-        current_page_bubbles = self.parent.get_bubbles_for_page(self.parent.current_page_number)
-        previous_bubbles_count = self.parent.get_bubble_count_before_page(self.parent.current_page_number)
+    def draw_bubbles_on_pixmap(self, painter, dirty_rect=None):
+        """Draw the bubbles for the current page that intersect dirty_rect"""
+        bubbles = self.parent.bubbles
+        page = self.parent.current_page_number
+        if dirty_rect is None:
+            bubble_ids = bubbles.page_ids(page)
+        else:
+            # Centres that can reach into dirty_rect, from the spatial index
+            reach = dirty_rect.adjusted(-40, -22, 7, 14)
+            bubble_ids = bubbles.bubbles_in_rect(page, (
+                reach.left() / self.scale_factor, reach.top() / self.scale_factor,
+                reach.right() / self.scale_factor, reach.bottom() / self.scale_factor))
+        previous_bubbles_count = bubbles.count_before_page(page)
         
         pen = QPen(QColor(255, 0, 0))
         pen.setWidth(1)
-        painter.setPen(pen)
+        selected_pen = QPen(QColor(0, 120, 255))
+        selected_pen.setWidth(2)
         
         font = QFont()
         font.setPointSize(8)
         painter.setFont(font)
         
-        for idx, (x, y) in enumerate(current_page_bubbles, previous_bubbles_count + 1):
+        for bubble_id in bubble_ids:
+            x, y = bubbles.position(bubble_id)
+            idx = previous_bubbles_count + bubbles.index_on_page(bubble_id) + 1
             # Convert PDF coordinates to display coordinates
             display_x = x * self.scale_factor
             display_y = y * self.scale_factor
             
             # Draw bubble
+            painter.setPen(selected_pen if bubble_id in self.selected_bubbles else pen)
             painter.drawEllipse(QPoint(int(display_x), int(display_y)), 5, 5)
             painter.drawText(QPoint(int(display_x-3), int(display_y+3)), str(idx))
 
-    def display_pixmap_with_bubbles(self, pixmap):
-        """Display the pixmap with bubbles and current selection"""
-        display_pixmap = pixmap.copy()
-        painter = QPainter(display_pixmap)
-        
+    def bubble_rect(self, display_x, display_y):
+        """Display area covered by a bubble and its number"""
+        return QRect(int(display_x) - 7, int(display_y) - 14, 40, 22)
+
+    def highlight_rect(self):
+        """Display rect of the search highlight"""
+        x0, y0, x1, y1 = (v * self.scale_factor for v in self.highlight[1])
+        return QRect(int(x0) - 3, int(y0) - 3, int(x1 - x0) + 6, int(y1 - y0) + 6)
+
+    def set_highlight(self, page, rect):
+        """Outline rect (PDF points) on page, None to clear"""
+        if self.highlight is not None:
+            self.canvas.overlay.update(self.highlight_rect().adjusted(-2, -2, 2, 2))
+        self.highlight = (page, tuple(rect)) if rect is not None else None
+        if self.highlight is not None:
+            self.canvas.overlay.update(self.highlight_rect().adjusted(-2, -2, 2, 2))
+
+    def repaint_bubble(self, x, y):
+        """Repaint one bubble given in PDF coordinates"""
+        self.canvas.overlay.update(self.bubble_rect(x * self.scale_factor, y * self.scale_factor))
+
+    def selection_rect(self):
+        if self.selecting and self.selection_start and self.selection_end:
+            return QRect(self.selection_start, self.selection_end).normalized()
+        return QRect()
+
+    def tile_key(self, page_number, col, row, zoom=None):
+        return (page_number, self.zoom if zoom is None else zoom, col, row)
+
+    def tile_rect(self, col, row):
+        """Display rect of a tile, clipped to the page"""
+        return QRect(col * TILE_SIZE, row * TILE_SIZE, TILE_SIZE, TILE_SIZE).intersected(
+            QRect(0, 0, self.display_width, self.display_height))
+
+    def tile_clip(self, col, row):
+        """PDF-space clip (x0, y0, x1, y1) of a tile"""
+        rect = self.tile_rect(col, row)
+        return (rect.x() / self.scale_factor, rect.y() / self.scale_factor,
+                (rect.x() + rect.width()) / self.scale_factor,
+                (rect.y() + rect.height()) / self.scale_factor)
+
+    def tiles_in(self, rect):
+        """(col, row) of every tile intersecting a display rect"""
+        rect = rect.intersected(QRect(0, 0, self.display_width, self.display_height))
+        if rect.isEmpty():
+            return []
+        return [(col, row)
+                for row in range(rect.top() // TILE_SIZE, rect.bottom() // TILE_SIZE + 1)
+                for col in range(rect.left() // TILE_SIZE, rect.right() // TILE_SIZE + 1)]
+
+    def visible_rect(self):
+        """Part of the canvas currently shown in the viewport"""
+        return QRect(self.horizontalScrollBar().value(), self.verticalScrollBar().value(),
+                     self.viewport().width(), self.viewport().height())
+
+    def render_tile(self, col, row):
+        clip = to_fitz_rect(self.tile_clip(col, row))
+        with timed('render.tile_sync'):
+            pixmap = render_page(self.current_page, self.zoom, clip)
+        self.page_cache.put(self.tile_key(self.current_page_number, col, row), pixmap)
+        return pixmap
+
+    def paint_page(self, painter, dirty_rect):
+        """Paint the page tiles intersecting dirty_rect"""
+        if not self.document:
+            return
+        start = time.perf_counter()
+        painter.fillRect(dirty_rect, Qt.white)
+        preview = self.page_cache.get((self.current_page_number, PREVIEW_ZOOM))
+        missing = []
+        tiles = 0
+        for col, row in self.tiles_in(dirty_rect):
+            target = self.tile_rect(col, row)
+            pixmap = self.page_cache.get(self.tile_key(self.current_page_number, col, row))
+            if pixmap is None and preview is not None:
+                # Stretch the preview while the sharp tile renders in the
+                # background, so zooming never blocks on rasterization
+                ratio = PREVIEW_ZOOM / self.scale_factor
+                source = QRectF(target.x() * ratio, target.y() * ratio,
+                                target.width() * ratio, target.height() * ratio)
+                painter.drawPixmap(QRectF(target), preview, source)
+                missing.append((col, row))
+                continue
+            if pixmap is None:
+                pixmap = self.render_tile(col, row)
+            painter.drawPixmap(target, pixmap)
+            tiles += 1
+
+        instrumentation.count('paint.tiles', tiles)
+        instrumentation.count('paint.preview_stretched', len(missing))
+        instrumentation.record('paint.page', time.perf_counter() - start)
+        if missing:
+            self.schedule_prefetch(missing)
+
+    def paint_overlay(self, painter, dirty_rect):
+        """Paint bubbles and the selection band intersecting dirty_rect"""
+        if not self.document:
+            return
+        start = time.perf_counter()
         # Draw existing bubbles
-        self.draw_bubbles_on_pixmap(painter)
+        self.draw_bubbles_on_pixmap(painter, dirty_rect)
         
         # Draw current selection if active
-        if self.selecting and self.selection_start and self.selection_end:
+        selection_rect = self.selection_rect()
+        if not selection_rect.isNull():
             painter.setPen(QPen(QColor(0, 0, 255), 0))
-            selection_rect = QRect(self.selection_start, self.selection_end).normalized()
             painter.drawRect(selection_rect)
-        
-        painter.end()
-        self.image_label.setPixmap(display_pixmap)
+
+        if self.highlight is not None and self.highlight[0] == self.parent.current_page_number:
+            painter.setPen(QPen(QColor(255, 140, 0), 2))
+            painter.drawRect(self.highlight_rect())
+        instrumentation.record('paint.overlay', time.perf_counter() - start)
+
+    def schedule_prefetch(self, missing=None):
+        """
+        Queue background renders: tiles waiting on screen first, then a
+        one-tile ring around the viewport, then previews and the same
+        viewport of the neighbouring pages
+        """
+        if not self.document:
+            return
+        page_number = self.current_page_number
+        if not isinstance(missing, list):
+            missing = []
+        visible = self.visible_rect()
+        ring = visible.adjusted(-TILE_SIZE, -TILE_SIZE, TILE_SIZE, TILE_SIZE)
+
+        jobs = [(page_number, PREVIEW_ZOOM)]
+        jobs += [(page_number, col, row) for col, row in missing]
+        jobs += [(page_number, col, row) for col, row in self.tiles_in(ring)]
+        for distance in range(1, self.prefetch_distance + 1):
+            for neighbour in (page_number + distance, page_number - distance):
+                if 0 <= neighbour < self.total_pages:
+                    jobs.append((neighbour, PREVIEW_ZOOM))
+                    jobs += [(neighbour, col, row) for col, row in self.tiles_in(visible)]
+
+        requests = []
+        for job in jobs:
+            if len(job) == 2:
+                requests.append((job, job[0], PREVIEW_ZOOM, None))
+            else:
+                page, col, row = job
+                # Neighbouring sheets are assumed to share the page size,
+                # which holds for drawing packages; a wrong guess only
+                # wastes one render.
+                requests.append((self.tile_key(page, col, row), page, self.zoom,
+                                 self.tile_clip(col, row)))
+        self.prefetcher.request(list(dict((r[0], r) for r in requests).values()))
+
+    def on_prefetched(self, key):
+        if key[0] != self.current_page_number:
+            return
+        if len(key) == 2:
+            self.canvas.update()
+        elif key[1] == self.zoom:
+            self.canvas.update(self.tile_rect(key[2], key[3]))
+
+    def center_on(self, x, y):
+        """Scroll so the PDF point (x, y) is in the middle of the viewport"""
+        self.horizontalScrollBar().setValue(int(x * self.scale_factor - self.viewport().width() / 2))
+        self.verticalScrollBar().setValue(int(y * self.scale_factor - self.viewport().height() / 2))
+
+    def set_zoom(self, zoom, anchor=None):
+        """
+        Change the display zoom, keeping the PDF point under anchor
+        (viewport coordinates, default the viewport centre) in place
+        """
+        if not self.document or zoom == self.zoom:
+            return
+        if anchor is None:
+            anchor = QPoint(self.viewport().width() // 2, self.viewport().height() // 2)
+        canvas_pos = self.canvas.mapFrom(self.viewport(), anchor)
+        pdf_x = canvas_pos.x() / self.scale_factor
+        pdf_y = canvas_pos.y() / self.scale_factor
+
+        self.zoom = zoom
+        self.update_page_geometry()
+        self.horizontalScrollBar().setValue(int(pdf_x * self.scale_factor - anchor.x()))
+        self.verticalScrollBar().setValue(int(pdf_y * self.scale_factor - anchor.y()))
+        self.canvas.update()
+        self.schedule_prefetch()
+
+    def zoom_in(self, anchor=None):
+        larger = [z for z in ZOOM_LEVELS if z > self.zoom]
+        if larger:
+            self.set_zoom(larger[0], anchor)
+
+    def zoom_out(self, anchor=None):
+        smaller = [z for z in ZOOM_LEVELS if z < self.zoom]
+        if smaller:
+            self.set_zoom(smaller[-1], anchor)
+
+    def wheelEvent(self, event):
+        if event.modifiers() & Qt.ControlModifier:
+            if event.angleDelta().y() > 0:
+                self.zoom_in(event.pos())
+            elif event.angleDelta().y() < 0:
+                self.zoom_out(event.pos())
+            event.accept()
+        else:
+            super().wheelEvent(event)
     
+    def bubble_at(self, pos):
+        """ID of the bubble under a display position, or None"""
+        radius = BUBBLE_HIT_RADIUS / self.scale_factor
+        return self.parent.bubbles.hit_test(self.parent.current_page_number,
+                                            pos.x() / self.scale_factor,
+                                            pos.y() / self.scale_factor, radius)
+
+    def set_selected_bubbles(self, bubble_ids):
+        changed = self.selected_bubbles ^ set(bubble_ids)
+        self.selected_bubbles = set(bubble_ids)
+        bubbles = self.parent.bubbles
+        for bubble_id in changed:
+            if bubble_id in bubbles and bubbles.page_of(bubble_id) == self.parent.current_page_number:
+                self.repaint_bubble(*bubbles.position(bubble_id))
+
     def on_mouse_press(self, event):
+        if event.button() == Qt.RightButton:
+            bubble_id = self.bubble_at(event.pos())
+            if bubble_id is not None:
+                self.set_selected_bubbles({bubble_id})
+                self.show_bubble_menu(bubble_id, event.globalPos())
+            return
         if event.button() == Qt.LeftButton:
             if self.parent.selection_mode:
                 # Start selection
                 self.selecting = True
-                self.release_flag = False
+                self.band_select = False
                 self.selection_start = event.pos()
                 self.selection_end = event.pos()
                 self.current_bubble = self.parent.get_current_bubble()
+                return
+            bubble_id = self.bubble_at(event.pos())
+            if bubble_id is not None:
+                # Select (Ctrl toggles) and start dragging
+                if event.modifiers() & Qt.ControlModifier:
+                    self.set_selected_bubbles(self.selected_bubbles ^ {bubble_id})
+                else:
+                    self.set_selected_bubbles({bubble_id})
+                    self.dragging_bubble = bubble_id
+            elif event.modifiers() & Qt.ShiftModifier:
+                # Rubber band selection of bubbles
+                self.selecting = True
+                self.band_select = True
+                self.selection_start = event.pos()
+                self.selection_end = event.pos()
             else:
                 # Add bubble
+                self.set_selected_bubbles(())
                 self.add_bubble(event.pos())
         
     def on_mouse_move(self, event):
-        if self.selecting and self.selection_start:
+        if self.dragging_bubble is not None:
+            bubbles = self.parent.bubbles
+            self.repaint_bubble(*bubbles.position(self.dragging_bubble))
+            x = event.pos().x() / self.scale_factor
+            y = event.pos().y() / self.scale_factor
+            bubbles.move(self.dragging_bubble, x, y)
+            self.repaint_bubble(x, y)
+        elif self.selecting and self.selection_start:
+            old_rect = self.selection_rect()
             self.selection_end = event.pos()
-            if self.release_flag:
-                self.update_selection()
+            self.update_selection(old_rect)
 
     def on_mouse_release(self, event):
-        if self.selecting and self.selection_start and self.selection_end:
-            self.capture_selection()
+        if self.dragging_bubble is not None:
+            self.parent.on_bubble_moved(self.dragging_bubble)
+            self.dragging_bubble = None
+        elif self.selecting and self.selection_start and self.selection_end:
+            self.selection_end = event.pos()
+            old_rect = self.selection_rect()
+            if self.band_select:
+                self.select_bubbles_in(old_rect)
+            else:
+                self.capture_selection()
             self.selecting = False
             self.selection_start = None
             self.selection_end = None
-            self.release_flag = True
-            self.update_selection()
-    
-    def update_selection(self):
-        if self.image_label.pixmap():
-            pixmap = self.image_label.pixmap().copy()
-            painter = QPainter(pixmap)
-            
-            if self.selection_start and self.selection_end:
-                # Draw selection rectangle
-                painter.setPen(QPen(QColor(0, 0, 255), 2))
-                selection_rect = QRect(self.selection_start, self.selection_end).normalized()
-                painter.drawRect(selection_rect)
-            
-            # Draw bubbles
-            self.draw_bubbles_on_pixmap(painter)
+            self.update_selection(old_rect)
 
-            painter.end()
-            self.image_label.setPixmap(pixmap)
+    def select_bubbles_in(self, rect):
+        pdf_rect = (rect.left() / self.scale_factor, rect.top() / self.scale_factor,
+                    rect.right() / self.scale_factor, rect.bottom() / self.scale_factor)
+        self.set_selected_bubbles(
+            self.parent.bubbles.bubbles_in_rect(self.parent.current_page_number, pdf_rect))
+
+    def on_key_press(self, event):
+        if event.key() in (Qt.Key_Delete, Qt.Key_Backspace) and self.selected_bubbles:
+            self.parent.delete_bubbles(self.selected_bubbles)
+        elif event.key() == Qt.Key_Escape:
+            self.set_selected_bubbles(())
+        else:
+            QWidget.keyPressEvent(self.canvas, event)
+
+    def show_bubble_menu(self, bubble_id, global_pos):
+        menu = QMenu(self)
+        renumber_action = menu.addAction('Renumber...')
+        link_action = menu.addAction('Link Region...')
+        ocr_action = menu.addAction('Re-run OCR')
+        ocr_action.setEnabled(self.parent.bubbles.region(bubble_id) is not None)
+        delete_action = menu.addAction('Delete')
+        action = menu.exec_(global_pos)
+        if action == renumber_action:
+            self.parent.renumber_bubble(bubble_id)
+        elif action == link_action:
+            self.parent.start_region_link(bubble_id)
+        elif action == ocr_action:
+            self.parent.rerun_ocr(bubble_id)
+        elif action == delete_action:
+            self.parent.delete_bubbles({bubble_id})
+    
+    def update_selection(self, old_rect=None):
+        """Repaint only the band's old and new outline"""
+        overlay = self.canvas.overlay
+        for rect in (old_rect, self.selection_rect()):
+            if rect is None or rect.isNull():
+                continue
+            # Edges only: the band's interior doesn't change
+            grown = rect.adjusted(-1, -1, 2, 2)
+            overlay.update(QRect(grown.left(), grown.top(), grown.width(), 3))
+            overlay.update(QRect(grown.left(), grown.bottom() - 2, grown.width(), 3))
+            overlay.update(QRect(grown.left(), grown.top(), 3, grown.height()))
+            overlay.update(QRect(grown.right() - 2, grown.top(), 3, grown.height()))
 
     def capture_selection(self):
         if not self.selection_start or not self.selection_end or not self.current_bubble:
@@ -143,6 +506,9 @@ class PDFViewer(QScrollArea):
             
         # Get selection rectangle in display coordinates
         rect = QRect(self.selection_start, self.selection_end).normalized()
+        rect = rect.intersected(QRect(0, 0, self.display_width, self.display_height))
+        if rect.isEmpty():
+            return
         
         # Convert to PDF coordinates
         pdf_rect = QRectF(
@@ -152,37 +518,37 @@ class PDFViewer(QScrollArea):
             rect.height() / self.scale_factor
         )
         
-        # Capture the selected region
-        pixmap = self.image_label.pixmap()
-        if pixmap:
-            # Get the selection as a QPixmap
-            selection_image = pixmap.copy(rect)
-            
-            # Convert QPixmap to QImage
-            qimage = selection_image.toImage()
-            
-            # Convert QImage to PIL Image
-            width = qimage.width()
-            height = qimage.height()
-            ptr = qimage.bits()
-            ptr.setsize(height * width * 4)  # 4 bytes per pixel for RGBA
-            arr = np.frombuffer(ptr, np.uint8).reshape((height, width, 4))  # 4 channels (RGBA)
-            
-            # Convert to RGB PIL Image
-            image = Image.fromarray(arr, 'RGBA').convert('RGB')
-            
-            # Save region info and image
+        # Vector drawings carry their own text, no need to OCR it
+        text = self.text_index.text_in(self.current_page_number, pdf_rect)
+        if is_usable_text(text):
             self.parent.add_region_to_bubble(
                 self.current_bubble,
                 {
                     'rect': pdf_rect,
                     'page': self.parent.current_page_number,
-                    'image': image
+                    'source': 'text'
                 }
             )
-            
-            # Process OCR in separate thread
-            self.parent.process_ocr(image, self.current_bubble)
+            self.parent.set_bubble_text(self.current_bubble, text)
+            return
+
+        # The OCR worker renders just the selected region from the page at
+        # OCR resolution in grayscale, free of the bubbles drawn on screen;
+        # decoding a scanned sheet takes too long for the GUI thread
+        image = self.region_source(self.current_page_number, pdf_rect)
+
+        # Only the rect is kept
+        self.parent.add_region_to_bubble(
+            self.current_bubble,
+            {
+                'rect': pdf_rect,
+                'page': self.parent.current_page_number,
+                'source': 'ocr'
+            }
+        )
+        
+        # Queue OCR on the background pool
+        self.parent.process_ocr(image, self.current_bubble)
     
     def add_bubble(self, pos):
         display_x = pos.x()
@@ -194,36 +560,63 @@ class PDFViewer(QScrollArea):
         
         self.parent.add_bubble_position(pdf_x, pdf_y)
 
+    @timed('viewer.load_pdf')
     def load_pdf(self, pdf_path):
+        import fitz  # PyMuPDF
+        self.pdf_path = pdf_path
         self.document = fitz.open(pdf_path)
         self.total_pages = len(self.document)
+        self.text_index = TextLayerIndex(self.document)
+        self.highlight = None
+        self.page_cache.clear()
+        self.thumbnails.clear()
+        self.prefetcher.open(pdf_path)
         self.show_page(0)
 
+    def region_source(self, page_number, rect):
+        """RegionSource of a PDF region at OCR resolution, for the OCR pool"""
+        return RegionSource(self.pdf_path, page_number, tuple(to_fitz_rect(rect)), self.ocr_dpi)
+
+    def region_thumbnail(self, bubble_id, page_number, rect):
+        """Small QPixmap of a region for previews, from a bounded cache"""
+        key = (bubble_id, tuple(rect))
+        pixmap = self.thumbnails.get(key)
+        if pixmap is None:
+            x0, y0, x1, y1 = rect
+            zoom = THUMBNAIL_SIZE / max(x1 - x0, y1 - y0, 1)
+            pixmap = render_page(self.document[page_number], min(zoom, 4),
+                                 to_fitz_rect(rect))
+            self.thumbnails.put(key, pixmap)
+        return pixmap
+
+    def update_page_geometry(self):
+        """Size the canvas for the current page and zoom"""
+        # Store display dimensions
+        self.display_width = int(round(self.page_width * self.zoom))
+        self.display_height = int(round(self.page_height * self.zoom))
+        
+        # Calculate scale factor between display and PDF
+        self.scale_factor = self.display_width / self.page_width
+        self.canvas.resize(self.display_width, self.display_height)
+
+    @timed('viewer.show_page')
     def show_page(self, page_number):
         if not self.document:
             return
     
-        page = self.document[page_number]
+        self.current_page = self.document[page_number]
+        self.current_page_number = page_number
+        self.selected_bubbles.clear()
+        self.dragging_bubble = None
         
         # Store original PDF dimensions
-        self.page_width = page.rect.width
-        self.page_height = page.rect.height
+        self.page_width = self.current_page.rect.width
+        self.page_height = self.current_page.rect.height
     
-        # Create display image
-        mat = fitz.Matrix(self.zoom, self.zoom)
-        pix = page.get_pixmap(matrix=mat)
-        
-        # Store display dimensions
-        self.display_width = pix.width
-        self.display_height = pix.height
-        
-        # Calculate scale factor between display and PDF
-        self.scale_factor = self.display_width / self.page_width
-        
-        img = QImage(pix.samples, pix.width, pix.height, pix.stride, QImage.Format_RGB888)
-        pixmap = QPixmap.fromImage(img)
-        
-        self.display_pixmap_with_bubbles(pixmap)
+        # Only the visible tiles get rendered, in paint_page
+        self.update_page_geometry()
+        self.canvas.update()
+        self.schedule_prefetch()
 
     def on_click(self, event):
         display_x = event.pos().x()
@@ -237,19 +630,74 @@ class PDFViewer(QScrollArea):
         self.display_current_page_bubbles()
 
     def display_current_page_bubbles(self):
-        if self.image_label.pixmap():
-            self.display_pixmap_with_bubbles(self.image_label.pixmap())
+        self.canvas.overlay.update()
 
 class InteractivePDFBubblePlacer(QMainWindow):
-    def __init__(self):
+    # Emitted from a background thread with the finished auto-balloon future
+    auto_balloon_finished = pyqtSignal(object, object)
+    # Emitted from the pipeline per scanned page: pdf path, pages done, total
+    auto_balloon_progress = pyqtSignal(object, int, int)
+    # Emitted from a background thread with the finished carry-over future
+    carry_over_finished = pyqtSignal(object, object)
+
+    def __init__(self, search_index_path=None):
+        """
+        Args:
+            search_index_path: SQLite file of the Search dock, default
+                $FAI_SEARCH_INDEX or SEARCH_INDEX_PATH
+        """
         super().__init__()
-        self.initUI()
         self.current_pdf_path = None
-        self.bubbles_by_page = {}
+        self.bubbles = BubbleStore()
         self.current_page_number = 0
         self.selection_mode = False
-        self.bubble_regions = {}  # Store selected regions for each bubble
-        self.bubble_text = {}     # Store OCR text for each bubble
+        self.bubble_regions = {}  # Store selected regions for each bubble ID
+        self.bubble_text = {}     # Store OCR text for each bubble ID
+        self.bubble_flags = {}    # {bubble_id: why it needs checking}
+        self.link_target = None   # bubble the next selection is linked to
+        # (output path, source path, mtime, size) of the last export, so
+        # exporting to the same file again only appends the dirty pages
+        self.last_export = None
+        self.initUI()
+
+        # OCR runs in the background so captures don't block the viewer
+        self.ocr_pool = OCRWorkerPool(self)
+        self.ocr_pool.result_ready.connect(self.on_ocr_result)
+        self.ocr_pool.job_failed.connect(self.on_ocr_failed)
+        self.ocr_pool.pending_changed.connect(self.update_ocr_status)
+
+        # Long document jobs (auto-balloon) run here; they fan out to
+        # worker processes themselves
+        self.background = ThreadPoolExecutor(max_workers=1, thread_name_prefix='fai-job')
+        # Jobs that render and correlate pages in-process (carry-over) get a
+        # process of their own: MuPDF and the FFTs hold the GIL for seconds
+        self.job_process = None
+        self.auto_balloon_finished.connect(self.on_auto_balloon_finished)
+        self.auto_balloon_progress.connect(self.on_auto_balloon_progress)
+        self.carry_over_finished.connect(self.on_carry_over_finished)
+
+        # The session is appended to a project file next to the PDF; the
+        # diff runs here, encoding and I/O on the autosave thread
+        self.project = None
+        self.source_hash = None   # future of the loaded PDF's SHA-256
+        self.autosaver = ThreadPoolExecutor(max_workers=1, thread_name_prefix='fai-autosave')
+        self.autosave_future = None
+        self.autosave_timer = QTimer(self)
+        self.autosave_timer.timeout.connect(self.autosave)
+        self.autosave_timer.start(AUTOSAVE_INTERVAL_MS)
+
+        # Text of every drawing opened, and its bubbles, for the Search
+        # dock; opened on first use
+        self.search_index = None
+        self.search_index_path = (search_index_path or os.environ.get(SEARCH_INDEX_ENV)
+                                  or SEARCH_INDEX_PATH)
+
+        viewer = self.pdf_viewer
+        instrumentation.gauge('tiles.cached_mb',
+                              lambda: round(viewer.page_cache.bytes_used / 2**20, 1))
+        instrumentation.gauge('tiles.hits', lambda: viewer.page_cache.hits)
+        instrumentation.gauge('tiles.misses', lambda: viewer.page_cache.misses)
+        instrumentation.gauge('ocr.pending', self.ocr_pool.pending_count)
 
     def initUI(self):
         # [Previous UI setup code remains the same]
@@ -269,6 +717,15 @@ class InteractivePDFBubblePlacer(QMainWindow):
         load_pdf_btn.clicked.connect(self.load_pdf)
         control_layout.addWidget(load_pdf_btn)
 
+        project_layout = QHBoxLayout()
+        open_project_btn = QPushButton('Open Project')
+        save_project_btn = QPushButton('Save Project')
+        open_project_btn.clicked.connect(self.open_project)
+        save_project_btn.clicked.connect(lambda: self.save_project(wait=True))
+        project_layout.addWidget(open_project_btn)
+        project_layout.addWidget(save_project_btn)
+        control_layout.addLayout(project_layout)
+
         nav_layout = QHBoxLayout()
         prev_page_btn = QPushButton('Previous Page')
         next_page_btn = QPushButton('Next Page')
@@ -281,8 +738,40 @@ class InteractivePDFBubblePlacer(QMainWindow):
         self.page_label = QLabel('Page: 0/0')
         control_layout.addWidget(self.page_label)
 
-        self.bubble_list = QLabel('Bubble Positions:')
-        control_layout.addWidget(self.bubble_list)
+        zoom_layout = QHBoxLayout()
+        zoom_out_btn = QPushButton('Zoom Out')
+        zoom_in_btn = QPushButton('Zoom In')
+        zoom_out_btn.clicked.connect(lambda: self.pdf_viewer.zoom_out())
+        zoom_in_btn.clicked.connect(lambda: self.pdf_viewer.zoom_in())
+        zoom_layout.addWidget(zoom_out_btn)
+        zoom_layout.addWidget(zoom_in_btn)
+        control_layout.addLayout(zoom_layout)
+
+        ocr_dpi_layout = QHBoxLayout()
+        ocr_dpi_layout.addWidget(QLabel('OCR DPI:'))
+        self.ocr_dpi_spin = QSpinBox()
+        self.ocr_dpi_spin.setRange(72, 600)
+        self.ocr_dpi_spin.setSingleStep(50)
+        self.ocr_dpi_spin.setValue(self.pdf_viewer.ocr_dpi)
+        self.ocr_dpi_spin.valueChanged.connect(self.set_ocr_dpi)
+        ocr_dpi_layout.addWidget(self.ocr_dpi_spin)
+        self.preprocess_combo = QComboBox()
+        for label, stages in OCR_PREPROCESSING:
+            self.preprocess_combo.addItem(label, stages)
+        self.preprocess_combo.setToolTip('Image preprocessing before OCR')
+        ocr_dpi_layout.addWidget(self.preprocess_combo)
+        control_layout.addLayout(ocr_dpi_layout)
+
+        self.bubble_model = BubbleTableModel(self.bubbles, self.bubble_text, self.bubble_flags,
+                                             self)
+        self.bubble_table = BubbleTableView(self.bubble_model)
+        self.bubble_table.clicked.connect(self.on_bubble_table_clicked)
+        control_layout.addWidget(self.bubble_table)
+
+        self.region_preview = QLabel()
+        self.region_preview.setAlignment(Qt.AlignCenter)
+        self.region_preview.setFixedHeight(THUMBNAIL_SIZE // 2)
+        control_layout.addWidget(self.region_preview)
 
         clear_bubbles_btn = QPushButton('Clear All Bubbles')
         clear_bubbles_btn.clicked.connect(self.clear_bubbles)
@@ -292,6 +781,15 @@ class InteractivePDFBubblePlacer(QMainWindow):
         clear_page_bubbles_btn.clicked.connect(self.clear_page_bubbles)
         control_layout.addWidget(clear_page_bubbles_btn)
 
+        auto_balloon_btn = QPushButton('Auto Balloon')
+        auto_balloon_btn.clicked.connect(self.run_auto_balloon)
+        control_layout.addWidget(auto_balloon_btn)
+
+        carry_over_btn = QPushButton('Carry Over From Revision...')
+        carry_over_btn.setToolTip('Map the bubbles of a previous revision onto this drawing')
+        carry_over_btn.clicked.connect(self.run_carry_over)
+        control_layout.addWidget(carry_over_btn)
+
         generate_btn = QPushButton('Generate Bubble Overlay')
         generate_btn.clicked.connect(self.generate_bubble_overlay)
         control_layout.addWidget(generate_btn)
@@ -306,139 +804,352 @@ class InteractivePDFBubblePlacer(QMainWindow):
         self.select_mode_btn.setCheckable(True)
         self.select_mode_btn.clicked.connect(self.toggle_selection_mode)
         control_layout.addWidget(self.select_mode_btn)
+
+        # Timings for slow-drawing reports, hidden until asked for
+        self.perf_panel = PerfPanel(self)
+        self.addDockWidget(Qt.BottomDockWidgetArea, self.perf_panel)
+        self.perf_panel.hide()
+        debug_menu = self.menuBar().addMenu('&Debug')
+        perf_action = self.perf_panel.toggleViewAction()
+        perf_action.setShortcut('F12')
+        debug_menu.addAction(perf_action)
+
+        self.search_panel = SearchPanel(lambda query, limit: self.search_db().search(query, limit),
+                                        self)
+        self.search_panel.hit_activated.connect(self.go_to_search_hit)
+        self.addDockWidget(Qt.RightDockWidgetArea, self.search_panel)
+        self.search_panel.hide()
+        search_menu = self.menuBar().addMenu('&Search')
+        find_action = search_menu.addAction('Find in Drawings...')
+        find_action.setShortcut('Ctrl+F')
+        find_action.triggered.connect(self.search_panel.focus_query)
         
+    def set_ocr_dpi(self, dpi):
+        self.pdf_viewer.ocr_dpi = dpi
+
     def toggle_selection_mode(self):
         self.selection_mode = self.select_mode_btn.isChecked()
 
     def get_current_bubble(self):
-        """Get the last bubble on the current page"""
-        page_bubbles = self.bubbles_by_page.get(self.current_page_number, [])
-        if page_bubbles:
-            return (self.current_page_number, len(page_bubbles) - 1)
-        return None
+        """
+        Bubble a new region selection belongs to: the one picked through
+        Link Region, else the single selected bubble, else the last bubble
+        on the current page
+        """
+        if self.link_target is not None and self.link_target in self.bubbles:
+            bubble_id, self.link_target = self.link_target, None
+            return bubble_id
+        selected = self.pdf_viewer.selected_bubbles
+        if len(selected) == 1:
+            return next(iter(selected))
+        return self.bubbles.last_on_page(self.current_page_number)
     
     def add_region_to_bubble(self, bubble_id, region_info):
-        if bubble_id:
+        if bubble_id is not None:
             self.bubble_regions[bubble_id] = region_info
+            rect = region_info['rect']
+            self.bubbles.set_region(bubble_id, (rect.left(), rect.top(),
+                                                rect.right(), rect.bottom()))
+
+    def start_region_link(self, bubble_id):
+        """Link the next region selection to bubble_id"""
+        self.link_target = bubble_id
+        self.select_mode_btn.setChecked(True)
+        self.toggle_selection_mode()
+        self.statusBar().showMessage(
+            f'Select the region for bubble {self.bubbles.number(bubble_id)}')
+
+    def on_bubble_moved(self, bubble_id):
+        self.bubble_model.bubble_changed(bubble_id, [BubbleTableModel.X, BubbleTableModel.Y])
+
+    def delete_bubbles(self, bubble_ids):
+        bubble_ids = [b for b in bubble_ids if b in self.bubbles]
+        self.forget_bubbles(bubble_ids)
+        self.bubble_model.remove_bubbles(bubble_ids, self.bubbles.remove)
+        self.pdf_viewer.set_selected_bubbles(())
+        self.pdf_viewer.display_current_page_bubbles()
+
+    def renumber_bubble(self, bubble_id):
+        """Give a bubble another number within its page's range"""
+        page = self.bubbles.page_of(bubble_id)
+        first = self.bubbles.count_before_page(page) + 1
+        last = first + self.bubbles.count(page) - 1
+        number, ok = QInputDialog.getInt(self, 'Renumber Bubble', f'New number ({first}-{last}):',
+                                         self.bubbles.number(bubble_id), first, last)
+        if ok:
+            self.bubbles.reorder(bubble_id, number - first)
+            self.bubble_model.page_changed(page)
+            self.pdf_viewer.display_current_page_bubbles()
 
     def process_ocr(self, image, bubble_id):
-        """Send image to OCR module and store result"""
-        try:
-            from ocr_module import process_image
-            text = process_image(image)
-            self.bubble_text[bubble_id] = text
-            self.update_bubble_list()
-        except Exception as e:
-            QMessageBox.warning(self, 'OCR Error', f'Failed to process text: {str(e)}')
+        """Queue image for background OCR, result arrives in on_ocr_result"""
+        self.bubble_text.pop(bubble_id, None)
+        stages = self.preprocess_combo.currentData()
+        self.ocr_pool.submit(bubble_id, image, None if stages == 'default' else stages)
+
+    def on_ocr_result(self, bubble_id, text):
+        if bubble_id not in self.bubbles:
+            return
+        self.bubble_text[bubble_id] = text
+        self.bubble_model.bubble_changed(bubble_id, [BubbleTableModel.TEXT])
+
+    def set_bubble_text(self, bubble_id, text):
+        """Store text that didn't need OCR, superseding any queued job"""
+        self.ocr_pool.cancel(bubble_id)
+        self.on_ocr_result(bubble_id, text)
+
+    def on_ocr_failed(self, bubble_id, message):
+        QMessageBox.warning(self, 'OCR Error', f'Failed to process text: {message}')
+
+    def update_ocr_status(self, pending):
+        if pending:
+            self.statusBar().showMessage(f'OCR: {pending} region(s) pending')
+        else:
+            from ocr_module import cache_stats
+            stats = cache_stats()
+            self.statusBar().showMessage(
+                f"OCR cache: {stats['hits']} hits, {stats['misses']} misses, "
+                f"~{stats['seconds_saved']:.1f} s saved")
+
+    def forget_bubbles(self, bubble_ids=None):
+        """Cancel OCR and drop regions/text for bubble_ids (default all)"""
+        if bubble_ids is None:
+            self.ocr_pool.cancel_all()
+            self.pdf_viewer.thumbnails.clear()
+            self.bubble_regions.clear()
+            self.bubble_text.clear()
+            self.bubble_flags.clear()
+            return
+        bubble_ids = set(bubble_ids)
+        self.ocr_pool.cancel_where(lambda bubble_id: bubble_id in bubble_ids)
+        self.pdf_viewer.thumbnails.discard_where(lambda key: key[0] in bubble_ids)
+        for bubble_id in bubble_ids:
+            self.bubble_regions.pop(bubble_id, None)
+            self.bubble_text.pop(bubble_id, None)
+            self.bubble_flags.pop(bubble_id, None)
 
     def get_bubbles_for_page(self, page_number):
-        return self.bubbles_by_page.get(page_number, [])
+        return self.bubbles.page_bubbles(page_number)
 
     def get_bubble_count_before_page(self, page_number):
-        count = 0
-        for page in range(page_number):
-            count += len(self.bubbles_by_page.get(page, []))
-        return count
+        return self.bubbles.count_before_page(page_number)
 
     def add_bubble_position(self, x, y):
-        if self.current_page_number not in self.bubbles_by_page:
-            self.bubbles_by_page[self.current_page_number] = []
-        self.bubbles_by_page[self.current_page_number].append((x, y))
-        self.update_bubble_list()
+        page = self.current_page_number
+        self.bubble_model.insert_bubble(page, None, lambda: self.bubbles.add(page, x, y))
+        self.pdf_viewer.repaint_bubble(x, y)
 
     def update_bubble_list(self):
-        bubble_text = 'Bubble Positions and Text:\n'
-        total_count = 0
-        
-        if not self.bubbles_by_page:
-            self.bubble_list.setText(bubble_text)
+        """Refresh the whole characteristics table after bulk changes"""
+        self.bubble_model.reset()
+
+    def on_bubble_table_clicked(self, index):
+        """Jump to the clicked bubble's page and select it"""
+        bubble_id = self.bubble_table.bubble_id_at(index)
+        self.go_to_page(self.bubbles.page_of(bubble_id))
+        self.pdf_viewer.set_selected_bubbles({bubble_id})
+        self.pdf_viewer.center_on(*self.bubbles.position(bubble_id))
+        self.show_region_preview(bubble_id)
+
+    def show_region_preview(self, bubble_id):
+        rect = self.bubbles.region(bubble_id)
+        if rect is None:
+            self.region_preview.clear()
             return
-            
-        max_page = max(self.bubbles_by_page.keys())
-        
-        for page in range(max_page + 1):
-            page_bubbles = self.bubbles_by_page.get(page, [])
-            if page_bubbles:
-                bubble_text += f'\nPage {page + 1}:\n'
-                for i, (x, y) in enumerate(page_bubbles, total_count + 1):
-                    bubble_text += f'{i}: ({x:.2f}, {y:.2f})'
-                    bubble_id = (page, i-total_count-1)
-                    if bubble_id in self.bubble_text:
-                        bubble_text += f' - Text: {self.bubble_text[bubble_id]}'
-                    bubble_text += '\n'
-                total_count += len(page_bubbles)
-                
-        self.bubble_list.setText(bubble_text)
+        pixmap = self.pdf_viewer.region_thumbnail(bubble_id, self.bubbles.page_of(bubble_id), rect)
+        self.region_preview.setPixmap(pixmap.scaled(self.region_preview.width(),
+                                                    self.region_preview.height(),
+                                                    Qt.KeepAspectRatio, Qt.SmoothTransformation))
+
+    def rerun_ocr(self, bubble_id):
+        """Render a bubble's region again and queue it for OCR"""
+        rect = self.bubbles.region(bubble_id)
+        if rect is None:
+            return
+        self.process_ocr(self.pdf_viewer.region_source(self.bubbles.page_of(bubble_id), rect),
+                         bubble_id)
 
     def clear_bubbles(self):
-        self.bubbles_by_page.clear()
+        self.pdf_viewer.set_selected_bubbles(())
+        self.forget_bubbles()
+        self.bubbles.clear()
         self.update_bubble_list()
         self.pdf_viewer.display_current_page_bubbles()
 
     def clear_page_bubbles(self):
-        if self.current_page_number in self.bubbles_by_page:
-            del self.bubbles_by_page[self.current_page_number]
+        self.pdf_viewer.set_selected_bubbles(())
+        self.forget_bubbles(self.bubble_model.remove_page(self.current_page_number,
+                                                          self.bubbles.clear_page))
+        self.pdf_viewer.display_current_page_bubbles()
+
+    def run_auto_balloon(self):
+        """Detect characteristics on every page and propose bubbles for them"""
+        if not self.current_pdf_path:
+            QMessageBox.warning(self, 'Error', 'No PDF loaded')
+            return
+        from auto_balloon import auto_balloon
+        pdf_path = self.current_pdf_path
+        existing = {page: self.bubbles.page_bubbles(page) for page in self.bubbles.pages()}
+        self.statusBar().showMessage('Auto-ballooning...')
+        progress = lambda done, total: self.auto_balloon_progress.emit(pdf_path, done, total)
+        future = self.background.submit(auto_balloon, pdf_path, existing, progress=progress)
+        future.add_done_callback(lambda f: self.auto_balloon_finished.emit(pdf_path, f))
+
+    def on_auto_balloon_progress(self, pdf_path, done, total):
+        if pdf_path == self.current_pdf_path:
+            self.statusBar().showMessage(f'Auto-ballooning: page {done}/{total}')
+
+    def on_auto_balloon_finished(self, pdf_path, future):
+        if pdf_path != self.current_pdf_path:
+            return    # another drawing was loaded meanwhile
+        try:
+            proposals, stats = future.result()
+        except Exception as e:
+            self.statusBar().clearMessage()
+            QMessageBox.critical(self, 'Error', f'Auto-balloon failed: {str(e)}')
+            return
+        self.apply_bubble_proposals(proposals)
+        self.statusBar().showMessage(
+            f"Auto-balloon: {len(proposals)} bubbles on {stats['pages']} pages "
+            f"in {stats['seconds']:.1f} s ({stats['pages_per_second']:.1f} pages/s)")
+
+    def apply_bubble_proposals(self, proposals):
+        """Add auto-balloon proposals as bubbles with their regions and text"""
+        for proposal in proposals:
+            bubble_id = self.bubbles.add(proposal.page, proposal.x, proposal.y)
+            feature = proposal.feature
+            x0, y0, x1, y1 = feature.rect
+            self.bubbles.set_region(bubble_id, feature.rect)
+            self.bubble_regions[bubble_id] = {
+                'rect': QRectF(x0, y0, x1 - x0, y1 - y0),
+                'page': proposal.page,
+                'source': feature.source,
+                'kind': feature.kind
+            }
+            self.bubble_text[bubble_id] = feature.text
         self.update_bubble_list()
         self.pdf_viewer.display_current_page_bubbles()
 
-    def create_bubble_overlay(self, input_pdf, output_pdf):
-        """Create PDF with bubble overlays for all pages"""
+    def run_carry_over(self):
+        """Map the session of a previous revision onto the loaded drawing"""
+        if not self.current_pdf_path:
+            QMessageBox.warning(self, 'Error', 'No PDF loaded')
+            return
+        old_pdf, _ = QFileDialog.getOpenFileName(self, 'Previous Revision',
+                                                 os.path.dirname(self.current_pdf_path),
+                                                 'PDF Files (*.pdf)')
+        if not old_pdf:
+            return
+        if os.path.abspath(old_pdf) == os.path.abspath(self.current_pdf_path):
+            QMessageBox.warning(self, 'Error', 'Pick the previous revision, not this drawing')
+            return
+        try:
+            state = ProjectFile(project_path(old_pdf)).load()
+        except Exception as e:
+            QMessageBox.critical(self, 'Error', f'Failed to open project: {str(e)}')
+            return
+        if state is None or not len(state):
+            QMessageBox.warning(self, 'Error', 'No saved bubbles were found for that drawing')
+            return
+        if len(self.bubbles) and QMessageBox.question(
+                self, 'Carry Over',
+                f'Replace the {len(self.bubbles)} bubbles on this drawing?') != QMessageBox.Yes:
+            return
+        from revision import migrate
+        pdf_path = self.current_pdf_path
+        self.statusBar().showMessage(f'Carrying over {len(state)} bubbles...')
+        future = self.start_job_process().submit(migrate, old_pdf, pdf_path, state)
+        future.add_done_callback(lambda f: self.carry_over_finished.emit(pdf_path, f))
+
+    def start_job_process(self):
+        if self.job_process is None:
+            # Spawned, not forked: other threads may hold import locks
+            self.job_process = ProcessPoolExecutor(
+                max_workers=1, mp_context=multiprocessing.get_context('spawn'))
+        return self.job_process
+
+    def on_carry_over_finished(self, pdf_path, future):
+        if not future.cancelled() and isinstance(future.exception(), BrokenProcessPool):
+            # The process died (out of memory on a huge scan?); start a
+            # fresh one next time
+            self.job_process = None
+        if pdf_path != self.current_pdf_path:
+            return    # another drawing was loaded meanwhile
         try:
-            with open(input_pdf, 'rb') as file:
-                pdf_reader = PyPDF2.PdfReader(file)
-                pdf_writer = PyPDF2.PdfWriter()
-                
-                # Process all pages
-                for page_number in range(len(pdf_reader.pages)):
-                    # Get the original page
-                    original_page = pdf_reader.pages[page_number]
-                    
-                    # If no bubbles on this page, just add the original page
-                    if page_number not in self.bubbles_by_page or not self.bubbles_by_page[page_number]:
-                        pdf_writer.add_page(original_page)
-                        continue
-                    
-                    # Create overlay PDF with same dimensions as input page
-                    packet = io.BytesIO()
-                    can = canvas.Canvas(packet, pagesize=(original_page.mediabox.width, original_page.mediabox.height))
-                    
-                    # Get bubbles for this page
-                    bubbles = self.bubbles_by_page.get(page_number, [])
-                    previous_bubbles = self.get_bubble_count_before_page(page_number)
-                    
-                    # Draw bubbles using PDF coordinates
-                    for idx, (x, y) in enumerate(bubbles, previous_bubbles + 1):
-                        # Flip Y coordinate for PDF
-                        pdf_y = float(original_page.mediabox.height) - float(y)
-                        
-                        can.setStrokeColorRGB(1, 0, 0)  # Pure red
-                        can.circle(float(x), pdf_y, 10, stroke=1, fill=0)
-                        
-                        can.setFillColorRGB(1, 0, 0)
-                        can.setFont('Helvetica', 8)
-                        can.drawCentredString(float(x), pdf_y - 3, str(idx))
-                    
-                    can.save()
-                    packet.seek(0)
-                    overlay_pdf = PyPDF2.PdfReader(packet)
-                    
-                    # Create merged page
-                    merged_page = PyPDF2.PageObject.create_blank_page(
-                        width=original_page.mediabox.width,
-                        height=original_page.mediabox.height
-                    )
-                    merged_page.merge_page(original_page)
-                    if overlay_pdf.pages:  # Check if overlay has pages before merging
-                        merged_page.merge_page(overlay_pdf.pages[0])
-                    
-                    pdf_writer.add_page(merged_page)
-                
-                # Write the complete PDF
-                with open(output_pdf, 'wb') as output_file:
-                    pdf_writer.write(output_file)
-                    
+            migration = future.result()
         except Exception as e:
-            raise Exception(f"PDF Generation Error: {str(e)}")
+            self.statusBar().clearMessage()
+            QMessageBox.critical(self, 'Error', f'Carry-over failed: {str(e)}')
+            return
+        self.apply_migration(migration)
+        stats = migration.stats
+        self.statusBar().showMessage(
+            f"Carried over {len(migration.rows)} bubbles in {stats['seconds']:.1f} s: "
+            f"{stats['pages_matched']} pages matched, {len(migration.changed)} flagged, "
+            f"{len(migration.reocr)} queued for OCR")
+
+    def apply_migration(self, migration):
+        """Replace the session with a revision.Migration and re-OCR its changed regions"""
+        self.pdf_viewer.set_selected_bubbles(())
+        self.forget_bubbles()
+        self.bubbles.load_columns(migration.columns())
+        for bubble_id, (rect, tag) in migration.regions.items():
+            source, _, kind = tag.partition(':')
+            x0, y0, x1, y1 = rect
+            self.bubbles.set_region(bubble_id, rect)
+            self.bubble_regions[bubble_id] = {
+                'rect': QRectF(x0, y0, x1 - x0, y1 - y0),
+                'page': self.bubbles.page_of(bubble_id),
+                'source': source or None,
+                'kind': kind or None
+            }
+        self.bubble_text.update(migration.texts)
+        reasons = {'text': 'Text changed in this revision',
+                   'pixels': 'Region changed in this revision',
+                   'unmatched': 'Page not found in this revision, check the position'}
+        self.bubble_flags.update((bubble_id, reasons[change])
+                                 for bubble_id, change in migration.changed.items())
+        self.update_bubble_list()
+        self.pdf_viewer.display_current_page_bubbles()
+        for bubble_id in migration.reocr:
+            self.rerun_ocr(bubble_id)
+
+    def create_bubble_overlay(self, input_pdf, output_pdf):
+        """
+        Create PDF with bubble overlays for all pages
+
+        Re-exporting to the file of the last export, if nobody touched it
+        since, appends an incremental update for the dirty pages instead
+        of rewriting the whole document.
+
+        Returns:
+            str: 'full' or 'incremental'
+        """
+        from bubble_export import export_bubbles, update_bubbles
+        start = time.perf_counter()
+        mode = 'full'
+        if self.can_update_export(input_pdf, output_pdf):
+            try:
+                update_bubbles(output_pdf, self.bubbles, self.bubbles.dirty_pages)
+                mode = 'incremental'
+            except Exception:
+                mode = 'full'
+        if mode == 'full':
+            export_bubbles(input_pdf, output_pdf, self.bubbles)
+        stat = os.stat(output_pdf)
+        self.last_export = (os.path.abspath(output_pdf), os.path.abspath(input_pdf),
+                            stat.st_mtime_ns, stat.st_size)
+        self.bubbles.mark_clean()
+        instrumentation.record(f'export.{mode}', time.perf_counter() - start)
+        return mode
+
+    def can_update_export(self, input_pdf, output_pdf):
+        """Whether output_pdf is still exactly what the last export wrote"""
+        if self.last_export is None or not os.path.exists(output_pdf):
+            return False
+        stat = os.stat(output_pdf)
+        return self.last_export == (os.path.abspath(output_pdf), os.path.abspath(input_pdf),
+                                    stat.st_mtime_ns, stat.st_size)
 
     def generate_bubble_overlay(self):
         if not self.current_pdf_path:
@@ -450,8 +1161,9 @@ class InteractivePDFBubblePlacer(QMainWindow):
             return
 
         try:
-            self.create_bubble_overlay(self.current_pdf_path, output_path)
-            QMessageBox.information(self, 'Success', f'Bubble overlay saved to {output_path}')
+            mode = self.create_bubble_overlay(self.current_pdf_path, output_path)
+            note = ' (changed pages appended)' if mode == 'incremental' else ''
+            QMessageBox.information(self, 'Success', f'Bubble overlay saved to {output_path}{note}')
         except Exception as e:
             QMessageBox.critical(self, 'Error', f'Failed to create bubble overlay: {str(e)}')
 
@@ -459,34 +1171,239 @@ class InteractivePDFBubblePlacer(QMainWindow):
     def load_pdf(self):
         pdf_path, _ = QFileDialog.getOpenFileName(self, 'Open PDF', '', 'PDF Files (*.pdf)')
         if pdf_path:
-            self.current_pdf_path = pdf_path
-            self.pdf_viewer.load_pdf(pdf_path)
-            self.current_page_number = 0
-            self.bubbles_by_page.clear()
+            self.open_pdf(pdf_path)
+
+    def open_pdf(self, pdf_path, restore=None):
+        """
+        Show a PDF and attach its project file
+
+        Args:
+            restore: restore the saved session; None asks when there is one
+        """
+        self.save_project(wait=True)
+        self.current_pdf_path = pdf_path
+        self.pdf_viewer.load_pdf(pdf_path)
+        self.current_page_number = 0
+        self.forget_bubbles()
+        self.bubbles.clear()
+        self.last_export = None
+        self.source_hash = self.autosaver.submit(file_sha256, pdf_path)
+
+        self.project = ProjectFile(project_path(pdf_path))
+        try:
+            state = self.project.load()
+        except Exception as e:
+            QMessageBox.warning(self, 'Project', f'Could not read {self.project.path}: {str(e)}')
+            state = None
+        if state is not None and len(state) and restore is None:
+            restore = QMessageBox.question(
+                self, 'Restore Session',
+                f'Restore the {len(state)} saved bubbles for this drawing?\n\n'
+                f'If not, they are kept in {os.path.basename(self.project.path)}'
+                f'{BACKUP_SUFFIX}.') == QMessageBox.Yes
+        # Text layer indexing waits behind any running document job
+        self.background.submit(self.search_db().index_pdf, pdf_path)
+        if state is not None and len(state) and restore:
+            self.restore_project(state)
+            self.index_bubbles(*self.project_snapshot()[:2])
+        elif state is None or len(state):
+            # Start over, but never on top of a session that wasn't restored
+            try:
+                self.project.start_over()
+            except Exception as e:
+                QMessageBox.warning(self, 'Project', f'Could not set {self.project.path} '
+                                    f'aside: {str(e)}')
+                self.project = None
+        self.update_page_label()
+        self.update_bubble_list()
+        self.pdf_viewer.display_current_page_bubbles()
+
+    def restore_project(self, state):
+        """Load bubbles, regions and text from a ProjectState"""
+        self.bubbles.load_columns(state.bubbles)
+        for bubble_id in state.regions:
+            if bubble_id not in self.bubbles:
+                continue
+            rect, source, kind = state.region(bubble_id)
+            x0, y0, x1, y1 = rect
+            self.bubbles.set_region(bubble_id, rect)
+            self.bubble_regions[bubble_id] = {
+                'rect': QRectF(x0, y0, x1 - x0, y1 - y0),
+                'page': self.bubbles.page_of(bubble_id),
+                'source': source,
+                'kind': kind
+            }
+        self.bubble_text.update((k, v) for k, v in state.texts.items() if k in self.bubbles)
+        saved_hash = state.meta.get('sha256')
+        if saved_hash and saved_hash != self.source_hash.result():
+            QMessageBox.warning(self, 'Project',
+                                'The drawing has changed since this project was saved; '
+                                'check the bubble positions.')
+
+    def open_project(self):
+        path, _ = QFileDialog.getOpenFileName(self, 'Open Project', '',
+                                              f'FAI Projects (*{PROJECT_SUFFIX})')
+        if not path:
+            return
+        try:
+            state = ProjectFile(path).load()
+        except Exception as e:
+            QMessageBox.critical(self, 'Error', f'Failed to open project: {str(e)}')
+            return
+        pdf_path = os.path.join(os.path.dirname(path), state.meta.get('source') or '')
+        if not os.path.isfile(pdf_path) or project_path(pdf_path) != path:
+            QMessageBox.warning(self, 'Error', 'The drawing of this project was not found '
+                                'next to it')
+            return
+        self.open_pdf(pdf_path, restore=True)
+
+    def project_snapshot(self):
+        """(regions, texts, meta) of the session for ProjectFile.changes"""
+        regions = {}
+        for bubble_id, info in self.bubble_regions.items():
+            rect = self.bubbles.region(bubble_id)
+            if rect is None:
+                continue
+            tag = info.get('source') or ''
+            if info.get('kind'):
+                tag += ':' + info['kind']
+            regions[bubble_id] = (rect, tag)
+        meta = {'source': os.path.basename(self.current_pdf_path),
+                'pages': self.pdf_viewer.total_pages}
+        if self.source_hash is not None and self.source_hash.done() \
+                and not self.source_hash.exception():
+            meta['sha256'] = self.source_hash.result()
+        return regions, self.bubble_text, meta
+
+    def save_project(self, wait=False):
+        """Append the session's changes to the project file"""
+        if self.project is None or not self.current_pdf_path:
+            return
+        if self.autosave_future is not None:
+            if not wait and not self.autosave_future.done():
+                return
+            self.report_autosave(self.autosave_future)
+        regions, texts, meta = self.project_snapshot()
+        if self.project.needs_compaction():
+            # Rare, and it reads the live store, so not on the autosave thread
+            try:
+                self.project.rewrite(self.bubbles, regions, texts, meta=meta)
+            except Exception as e:
+                self.statusBar().showMessage(f'Project save failed: {str(e)}')
+            self.index_bubbles(regions, texts)
+            return
+        records = self.project.changes(self.bubbles, regions, texts, meta=meta)
+        self.autosave_future = self.autosaver.submit(self.project.write, records)
+        if records:
+            self.index_bubbles(regions, texts)
+        if wait:
+            self.report_autosave(self.autosave_future)
+
+    def search_db(self):
+        if self.search_index is None:
+            self.search_index = SearchIndex(self.search_index_path)
+        return self.search_index
+
+    def index_bubbles(self, regions, texts):
+        """Queue the session's bubble text for the search index"""
+        rows = bubble_hits(self.bubbles, {k: rect for k, (rect, _) in regions.items()}, texts)
+        self.autosaver.submit(self.search_db().set_bubbles, self.current_pdf_path, rows)
+
+    def go_to_search_hit(self, hit):
+        """Show a search hit, opening its drawing first if needed"""
+        if not self.current_pdf_path or document_key(self.current_pdf_path) != hit.path:
+            if not os.path.isfile(hit.path):
+                QMessageBox.warning(self, 'Search', f'{hit.path} was not found')
+                return
+            self.open_pdf(hit.path, restore=True)
+        if not 0 <= hit.page < self.pdf_viewer.total_pages:
+            return
+        self.go_to_page(hit.page)
+        selected = set()
+        if hit.bubble_id in self.bubbles and self.bubbles.page_of(hit.bubble_id) == hit.page:
+            selected = {hit.bubble_id}
+        elif hit.rect is not None:
+            # Bubbles whose region covers a text layer hit
+            selected = self.bubbles.regions_in_rect(hit.page, hit.rect)
+        self.pdf_viewer.set_selected_bubbles(selected)
+        self.pdf_viewer.set_highlight(hit.page, hit.rect)
+        if hit.rect is not None:
+            x0, y0, x1, y1 = hit.rect
+            self.pdf_viewer.center_on((x0 + x1) / 2, (y0 + y1) / 2)
+        if len(selected) == 1:
+            self.show_region_preview(next(iter(selected)))
+
+    def report_autosave(self, future):
+        try:
+            future.result()
+        except Exception as e:
+            self.statusBar().showMessage(f'Project save failed: {str(e)}')
+        if self.autosave_future is future:
+            self.autosave_future = None
+
+    def autosave(self):
+        self.save_project(wait=False)
+
+    def go_to_page(self, page_number):
+        if self.current_pdf_path and page_number != self.current_page_number \
+                and 0 <= page_number < self.pdf_viewer.total_pages:
+            self.current_page_number = page_number
+            self.pdf_viewer.show_page(self.current_page_number)
             self.update_page_label()
-            self.update_bubble_list()
 
     def prev_page(self):
         if self.current_pdf_path and self.current_page_number > 0:
-            self.current_page_number -= 1
-            self.pdf_viewer.show_page(self.current_page_number)
-            self.update_page_label()
-            self.update_bubble_list()
+            self.go_to_page(self.current_page_number - 1)
 
     def next_page(self):
         if self.current_pdf_path and self.current_page_number < self.pdf_viewer.total_pages - 1:
-            self.current_page_number += 1
-            self.pdf_viewer.show_page(self.current_page_number)
-            self.update_page_label()
-            self.update_bubble_list()
+            self.go_to_page(self.current_page_number + 1)
 
     def update_page_label(self):
         self.page_label.setText(f'Page: {self.current_page_number + 1}/{self.pdf_viewer.total_pages}')
 
+    def warm_up(self):
+        """Load what opening a drawing and the first OCR need, off the GUI thread"""
+        self.background.submit(_warm_up_imports)
+        self.ocr_pool.warm_up(_warm_up_ocr)
+
+    def closeEvent(self, event):
+        self.autosave_timer.stop()
+        self.save_project(wait=True)
+        self.autosaver.shutdown(wait=True)
+        self.ocr_pool.shutdown()
+        self.background.shutdown(wait=False, cancel_futures=True)
+        if self.job_process is not None:
+            self.job_process.shutdown(wait=False, cancel_futures=True)
+        self.pdf_viewer.prefetcher.close()
+        if self.search_index is not None:
+            self.search_index.close()
+        super().closeEvent(event)
+
+OCR_CACHE_PATH = os.path.join(os.path.expanduser('~'), '.fai', 'ocr_cache.sqlite3')
+SEARCH_INDEX_PATH = os.path.join(os.path.expanduser('~'), '.fai', 'search.sqlite3')
+SEARCH_INDEX_ENV = 'FAI_SEARCH_INDEX'
+
+
+def _warm_up_imports():
+    """What opening and capturing from the first drawing imports"""
+    import fitz  # noqa: F401
+    from PIL import Image  # noqa: F401
+
+
+def _warm_up_ocr():
+    """Open the OCR cache and load the engine, on an OCR worker thread"""
+    from ocr_module import configure_cache, warm_up
+    configure_cache(db_path=OCR_CACHE_PATH)
+    warm_up()
+
+
 def main():
     app = QApplication(sys.argv)
     ex = InteractivePDFBubblePlacer()
     ex.show()
+    # fitz, numpy and the OCR engine load once the window is up
+    QTimer.singleShot(WARM_UP_DELAY_MS, ex.warm_up)
     sys.exit(app.exec_())
 
 if __name__ == '__main__':